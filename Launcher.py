@@ -1,18 +1,18 @@
+import functools
+import re
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import numpy as np
 from streamlit_option_menu import option_menu
-from sklearn.ensemble import IsolationForest
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-from xgboost import XGBClassifier
 import financial_statement
+import rendering
+import interactive
+import tracing
+from datasource import store, chains, chain_archive, quotes, providers, intraday
+from analysis import technical, screener, backtest, pricing, probability, jobs, anomaly, models, factors, chips
+
+# sklearn、xgboost、seaborn 等重量級套件只在對應頁面／模型第一次使用時才載入，
+# 首頁冷啟動不需付出這些 import 成本（見 importtime_report.py）
 
 
 # ====================================
@@ -20,106 +20,201 @@ import financial_statement
 # ====================================
 
 #   模型一：PCA MODEL
-def run_PCA_analysis(symbol):
-        # 下載股票資料
-        data = yf.download(symbol, period="180d", interval="1d", progress=False)
-
-        # 計算技術指標
-        data["RSI"] = data["Close"].pct_change().rolling(14).apply(
-            lambda x: (x[x>0].sum()/abs(x).sum()*100) if abs(x).sum()>0 else 0)
-        data["MA5"] = data["Close"].rolling(5).mean()
-        data["MA10"] = data["Close"].rolling(10).mean()
-        data["MA20"] = data["Close"].rolling(20).mean()
-        data["MACD"] = data["Close"].ewm(span=12).mean() - data["Close"].ewm(span=26).mean()
-        data["STD20"] = data["Close"].rolling(20).std()
-        data["Volume"] = data["Volume"]
-
-        # KD 指標
-        low_min = data["Low"].rolling(9).min()
-        high_max = data["High"].rolling(9).max()
-        rsv = (data["Close"] - low_min) / (high_max - low_min) * 100
-        data["K"] = rsv.ewm(com=2).mean()
-        data["D"] = data["K"].ewm(com=2).mean()
-
-        features = ["RSI","MA5","MA10","MA20","MACD","STD20","Volume","K","D"]
-        df = data[features].dropna()
-
-        # 標準化
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(df)
-
-        # PCA
-        pca = PCA(n_components=2)
-        X_pca = pca.fit_transform(X_scaled)
+# K 棒週期：日線取本機 OHLCV 快取，分 K 取盤中環狀緩衝區（見 datasource/intraday.py）
+PCA_RESOLUTIONS = {"日線": None, "1 分": 1, "5 分": 5, "15 分": 15, "60 分": 60}
 
-        # 圖一：PCA 投影圖
-        fig1, ax1 = plt.subplots(figsize=(10,6))
-        sc = ax1.scatter(X_pca[:,0], X_pca[:,1], c=range(len(X_pca)), cmap='viridis', alpha=0.6)
-        ax1.set_xlabel("Principal Component 1")
-        ax1.set_ylabel("Principal Component 2")
-        ax1.set_title(f"PCA Projection of Technical Indicators for {symbol}")
-        plt.colorbar(sc, label="Time Progression")
-        ax1.grid(True)
-        st.pyplot(fig1)
+@tracing.traced()
+def run_PCA_analysis(symbol, minutes=None):
+        from sklearn.decomposition import PCA
+        from sklearn.preprocessing import StandardScaler
 
-        # 圖二：Biplot
-        fig2, ax2 = plt.subplots(figsize=(10,6))
-        for i, feature in enumerate(features):
-            ax2.arrow(0,0, pca.components_[0,i]*3, pca.components_[1,i]*3, color='red', alpha=0.5)
-            ax2.text(pca.components_[0,i]*3.2, pca.components_[1,i]*3.2, feature,
-                    color='black', fontsize=12, ha='center', va='center')
-        ax2.scatter(X_pca[:,0], X_pca[:,1], alpha=0.3)
-        ax2.axhline(0, color='gray', linestyle='--')
-        ax2.axvline(0, color='gray', linestyle='--')
-        ax2.set_xlabel("PC1")
-        ax2.set_ylabel("PC2")
-        ax2.set_title("Biplot of Technical Indicators")
-        ax2.grid(True)
-        st.pyplot(fig2)
+        # 下載股票資料
+        if minutes:
+            with tracing.span("pca.intraday", "fetch", minutes=minutes) as s:
+                data = s.record(intraday.get_feed().frame(symbol.upper(), minutes))
+        else:
+            data = store.fetch(symbol, period="180d", interval="1d")
 
-#   模型二：XGBOOST MODEL
-def run_xgboost_analysis(symbol):
-    data = yf.download(symbol, period="720d", interval="1d", progress=False)
+        with tracing.span("pca.compute", "compute") as s:
+            # 計算技術指標（RSI、均線、MACD、STD20、KD）
+            features = technical.PCA_FEATURES
+            df = s.record(technical.pca_feature_frame(data).dropna())
+            if len(df) < 2:
+                st.warning(f"{symbol} 的資料不足以計算指標（{len(data)} 根 K 棒），請改用較短的週期或稍後再試")
+                return
 
-    # 均線計算
-    data["ma20"] = data["Close"].rolling(window=20).mean()
-    data["ma60"] = data["Close"].rolling(window=50).mean()
+            # 標準化
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(df)
 
-    # MACD計算
-    ema12 = data["Close"].ewm(span=12, adjust=False).mean()
-    ema26 = data["Close"].ewm(span=26, adjust=False).mean()
-    data["macd"] = ema12 - ema26
-    data["macd_signal"] = data["macd"].ewm(span=9, adjust=False).mean()
+            # PCA
+            pca = PCA(n_components=2)
+            X_pca = pca.fit_transform(X_scaled)
 
+        # 圖一：PCA 投影圖
+        rendering.show(_draw_pca_projection, X_pca, symbol, figsize=(10,6))
 
-    # 建立 target：未來 5 天的平均收盤價 > 今天收盤價 → 1，否則 0
-    future_avg_5 = data["Close"].shift(-4).rolling(window=5).mean()
-    data["target"] = (future_avg_5 > data["Close"]).astype(int)
+        # 圖二：Biplot
+        rendering.show(_draw_pca_biplot, X_pca, pca.components_, list(features), figsize=(10,6))
+
+def _draw_pca_projection(fig1, X_pca, symbol):
+    ax1 = fig1.subplots()
+    sc = ax1.scatter(X_pca[:,0], X_pca[:,1], c=range(len(X_pca)), cmap='viridis', alpha=0.6)
+    ax1.set_xlabel("Principal Component 1")
+    ax1.set_ylabel("Principal Component 2")
+    ax1.set_title(f"PCA Projection of Technical Indicators for {symbol}")
+    fig1.colorbar(sc, ax=ax1, label="Time Progression")
+    ax1.grid(True)
+
+def _draw_pca_biplot(fig2, X_pca, components, features):
+    ax2 = fig2.subplots()
+    for i, feature in enumerate(features):
+        ax2.arrow(0,0, components[0,i]*3, components[1,i]*3, color='red', alpha=0.5)
+        ax2.text(components[0,i]*3.2, components[1,i]*3.2, feature,
+                color='black', fontsize=12, ha='center', va='center')
+    ax2.scatter(X_pca[:,0], X_pca[:,1], alpha=0.3)
+    ax2.axhline(0, color='gray', linestyle='--')
+    ax2.axvline(0, color='gray', linestyle='--')
+    ax2.set_xlabel("PC1")
+    ax2.set_ylabel("PC2")
+    ax2.set_title("Biplot of Technical Indicators")
+    ax2.grid(True)
 
-    df = data[["Volume", "ma20", "ma60", "macd", "macd_signal", "target"]].copy()
-    df.dropna(inplace=True)
+#   模型二：XGBOOST MODEL
+XGB_DISPLAY_NAMES = ["Volume", "Ma20", "Ma60","Macd-DIF","Macd-SHORT"]
 
-    X = df[["Volume", "ma20", "ma60","macd","macd_signal"]]
-    y = df["target"]
+def prepare_xgboost_data(symbol):
+    data = store.fetch(symbol, period="720d", interval="1d")
 
+    with tracing.span("xgboost.features", "compute") as s:
+        # 均線與 MACD 計算
+        df = technical.xgb_feature_frame(data)
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
 
-    # 模型訓練
-    model = XGBClassifier(use_label_encoder=False, eval_metric='logloss')
-    model.fit(X_train, y_train)
+        # 建立 target：未來 5 天的平均收盤價 > 今天收盤價 → 1，否則 0
+        future_avg_5 = data["Close"].shift(-4).rolling(window=5).mean()
+        df["target"] = (future_avg_5 > data["Close"]).astype(int)
+        df.dropna(inplace=True)
+        s.record(df)
 
-    # 預測與評估
-    y_pred = model.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
+    return df[technical.XGB_FEATURES], df["target"]
 
-    x_name = ["Volume", "Ma20", "Ma60","Macd-DIF","Macd-SHORT"]
-    st.title(f"XGBoost Accuracy: {acc:.2%}")
-    for name, imp in zip(x_name, model.feature_importances_):
+# 模型訓練在背景工作佇列執行（見 analysis/jobs.py），頁面只負責送出與顯示結果
+# 模型登錄（analysis/models.py）已有相同資料訓練的模型時直接取用，有新 K 棒時在舊模型上續訓
+@tracing.traced()
+def run_xgboost_analysis(symbol):
+    X, y = prepare_xgboost_data(symbol)
+    version = jobs.data_version(X, y)
+    cached = models.lookup(symbol, X, y, test_size=0.2)
+    if cached is not None:
+        job = jobs.put("xgboost", symbol, cached, params={"test_size": 0.2}, version=version)
+    else:
+        job = jobs.submit("xgboost", symbol, models.train, symbol, X, y, test_size=0.2, version=version)
+    return jobs.track("xgboost_job", job, _show_xgboost)
+
+XGB_FIT_MODES = {"full": "完整訓練", "continued": "續訓"}
+
+def _show_xgboost(result):
+    st.title(f"XGBoost Accuracy: {result['accuracy']:.2%}")
+    st.caption(f"模型：{XGB_FIT_MODES[result['mode']]}，共 {result['rounds']} 棵樹，"
+               f"訓練資料截至 {result['cutoff']}，訓練耗時 {result['fit_seconds']:.2f} 秒")
+    for name, imp in zip(XGB_DISPLAY_NAMES, result["importances"]):
         st.markdown(
         f"<p style='font-size:20px; font-weight:bold; color:#2E86C1;'>{name} : {imp:.2%}</p>",
         unsafe_allow_html=True)
 
+# Walk-forward 驗證：每個擴張視窗 fold 各自訓練，平行執行（由背景執行緒協調 backtest 的行程池）
+@tracing.traced()
+def run_xgboost_walk_forward(symbol, n_splits=10):
+    X, y = prepare_xgboost_data(symbol)
+    job = jobs.submit("xgboost_walk_forward", symbol, backtest.walk_forward, X, y, n_splits=n_splits,
+                      inline=True, version=jobs.data_version(X, y))
+    return jobs.track("xgboost_job", job, _show_xgboost_walk_forward)
+
+def _show_xgboost_walk_forward(result):
+    folds, importances, elapsed = result
+    importances = importances.copy()
+    acc = folds["Accuracy"]
+    st.title(f"Walk-forward Accuracy: {acc.mean():.2%} ± {acc.std():.2%}")
+    st.write(f"{len(folds)} folds，總耗時 {elapsed:.2f} 秒（單 fold 訓練合計 {folds['Fit Seconds'].sum():.2f} 秒）")
+    st.dataframe(folds)
+
+    importances.index = importances.index.map(dict(zip(technical.XGB_FEATURES, XGB_DISPLAY_NAMES)))
+    st.subheader("Feature Importances（各 fold 平均）")
+    st.bar_chart(importances["Mean"])
+    st.dataframe(importances.style.format("{:.2%}"))
+
+#   模型三：PCA Screener（整份觀察清單一次計算）
+@tracing.traced()
+def run_PCA_screener(symbols):
+    with tracing.span("screener.screen", "compute", symbols=len(symbols)):
+        table, pca, _ = screener.screen(symbols, period="180d")
+    if table.empty:
+        st.warning("找不到觀察清單的股價資料")
+        return
+
+    ratio = pca.explained_variance_ratio_
+    st.markdown(f"PC1 解釋變異 {ratio[0]:.1%}，PC2 解釋變異 {ratio[1]:.1%}（共 {len(table)} 檔）")
+    st.dataframe(table)
+
+    # 最新一日的共用 PCA 投影
+    rendering.show(_draw_screener, table[["Symbol", "PC1", "PC2", "ΔPC1 (5d)"]], figsize=(10,6))
+
+def _draw_screener(fig, table):
+    ax = fig.subplots()
+    sc = ax.scatter(table["PC1"], table["PC2"], c=table["ΔPC1 (5d)"], cmap='coolwarm', alpha=0.8)
+    for sym, x, y in zip(table["Symbol"], table["PC1"], table["PC2"]):
+        ax.annotate(sym, (x, y), fontsize=8, xytext=(3, 3), textcoords="offset points")
+    ax.axhline(0, color='gray', linestyle='--')
+    ax.axvline(0, color='gray', linestyle='--')
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_title("Latest PCA Projection of Watchlist")
+    fig.colorbar(sc, ax=ax, label="ΔPC1 (5d)")
+    ax.grid(True)
+
+#   模型三之二：全市場因子模型（out-of-core IncrementalPCA，見 analysis/factors.py）
+#   以長歷史建立一次後存檔，之後只把觀察清單的最新特徵投影上去，不必重新 fit
+FACTOR_MODEL = "market"
+
+def build_factor_model(symbols, period):
+    version = jobs.data_version(sorted(symbols), str(pd.Timestamp.today().date()))
+    job = jobs.submit("factors", FACTOR_MODEL, factors.build, symbols, name=FACTOR_MODEL, period=period,
+                      version=version)
+    return jobs.track("factor_job", job, _show_factor_build)
+
+def _show_factor_build(summary):
+    ratio = "、".join(f"{r:.1%}" for r in summary["explained"])
+    st.success(f"因子模型已建立：{summary['symbols']} 檔、{summary['rows']:,} 列，各主成分解釋變異 {ratio}")
+
+@tracing.traced()
+def run_factor_projection(symbols, model):
+    frames = store.fetch_many(symbols, period="180d")
+    with tracing.span("factors.project", "compute") as s:
+        rows = []
+        for symbol, df in frames.items():
+            features = technical.pca_feature_frame(df).dropna() if not df.empty else df
+            if features.empty:
+                continue
+            projection = model.project(features, symbol)
+            latest, prev = projection[-1], projection[max(len(features) - 6, 0)]
+            rows.append({"Symbol": symbol, "Date": features.index[-1], "Close": df["Close"].iloc[-1],
+                         "PC1": latest[0], "PC2": latest[1] if len(latest) > 1 else np.nan,
+                         "ΔPC1 (5d)": latest[0] - prev[0]})
+        table = s.record(pd.DataFrame(rows))
+    if table.empty:
+        st.warning("找不到觀察清單的股價資料")
+        return
+    table = table.sort_values("PC1", ascending=False).reset_index(drop=True)
+    table.index += 1
+
+    ratio = model.pca.explained_variance_ratio_
+    fitted = pd.Timestamp(model.fitted, unit="s").strftime("%Y-%m-%d %H:%M")
+    st.markdown(f"因子模型：{model.n_symbols} 檔、{model.rows:,} 列（{fitted} 建立），"
+                f"PC1 解釋變異 {ratio[0]:.1%}" + (f"，PC2 解釋變異 {ratio[1]:.1%}" if len(ratio) > 1 else ""))
+    st.dataframe(table)
+    rendering.show(_draw_screener, table[["Symbol", "PC1", "PC2", "ΔPC1 (5d)"]], figsize=(10,6))
+
 
 
 # ====================================
@@ -127,111 +222,134 @@ def run_xgboost_analysis(symbol):
 # ====================================
 
 #   模型一：Options Analysis Model
+@tracing.traced()
 def run_options_analysis(symbol, expiry):
-    ticker = yf.Ticker(symbol)
-    spot_price = ticker.history(period="1d")['Close'][-1]
-    options = ticker.option_chain(expiry)
+    with tracing.span("options.spot", "fetch"):
+        spot_price = providers.yahoo().history(symbol, period="1d")['Close'].iloc[-1]
+    options = chains.fetch_chain(symbol, expiry)
 
-    options_df = pd.concat([
-        options.calls.assign(type='call'),
-        options.puts.assign(type='put')
-    ])
-    data = options_df[['strike', 'volume', 'impliedVolatility', 'type', 'lastPrice']].dropna()
+    with tracing.span("options.price_chain", "compute") as s:
+        options_df = pd.concat([
+            options.calls.assign(type='call'),
+            options.puts.assign(type='put')
+        ]).assign(expiry=expiry)
+
+        # 以 Black-Scholes 從中價／成交價求解 IV，補上供應商缺漏的 IV 並計算 Greeks
+        priced = s.record(pricing.price_chain(options_df, spot_price))
+        data = priced[['strike', 'volume', 'impliedVolatility', 'type', 'lastPrice']].dropna()
 
     # 📊 成交量熱力圖
     st.subheader("成交量熱力圖")
-    pivot_vol = data.pivot_table(index='strike', columns='type', values='volume', aggfunc='sum', fill_value=0)
-    fig, ax = plt.subplots(figsize=(10, 5))
-    sns.heatmap(pivot_vol, cmap="YlGnBu", cbar_kws={'label': 'Volume'}, ax=ax)
-    ax.set_title(f"{symbol} Options Volume Heatmap ({expiry})")
-    st.pyplot(fig)
+    with tracing.span("options.pivot", "compute"):
+        pivot_vol = data.pivot_table(index='strike', columns='type', values='volume', aggfunc='sum', fill_value=0)
+    rendering.show(chips.draw_volume_heatmap, pivot_vol, f"{symbol} Options Volume Heatmap ({expiry})")
 
     # 📌 Volume vs IV
     st.subheader("Volume vs Implied Volatility")
-    fig, ax = plt.subplots(figsize=(10, 5))
-    sns.scatterplot(data=data, x='volume', y='impliedVolatility', hue='type', alpha=0.7, s=100, ax=ax)
-    ax.grid(True)
-    st.pyplot(fig)
+    interactive.show(interactive.volume_iv, data)
 
     # 📈 IV 分布
     st.subheader("Implied Volatility Distribution")
-    iv = data['impliedVolatility']
-    mean_iv, std_iv = iv.mean(), iv.std()
-    fig, ax = plt.subplots(figsize=(10, 5))
-    sns.histplot(iv, bins=30, kde=True, color='purple', ax=ax)
-    ax.axvline(mean_iv, color='red', linestyle='--', label=f"Mean={mean_iv:.3f}")
-    ax.axvline(mean_iv + std_iv, color='green', linestyle='--', label=f"+1 Std={mean_iv+std_iv:.3f}")
-    ax.axvline(mean_iv - std_iv, color='green', linestyle='--', label=f"-1 Std={mean_iv-std_iv:.3f}")
-    ax.legend()
-    st.pyplot(fig)
+    rendering.show(chips.draw_iv_distribution, data['impliedVolatility'])
 
     # 📉 IV vs Strike
     st.subheader("IV vs Strike Price (Filtered by Volume)")
     filtered_data = data[data['volume'] > 0]
-    fig, ax = plt.subplots(figsize=(10, 5))
-    sns.lineplot(data=filtered_data, x='strike', y='impliedVolatility', hue='type', marker='o', ax=ax)
+    rendering.show(chips.draw_iv_vs_strike, filtered_data, float(spot_price))
+
+    # 🧮 Gamma Exposure
+    st.subheader("Gamma Exposure by Strike")
+    gex = pricing.gamma_exposure(priced, spot_price)
+    rendering.show(_draw_gamma_exposure, gex, float(spot_price), f"{symbol} Net GEX {gex.sum():,.0f} ({expiry})")
+
+    # 📅 與歷史快照比較：IV 百分位、成交量 Z 分數
+    st.subheader("IV Percentile & Volume Z-Score (vs Archived Snapshots)")
+    history = chain_archive.load(symbol, expiry=expiry, start=pd.Timestamp.today() - pd.Timedelta(days=180))
+    if history['date'].nunique() < 2:
+        st.info("歷史快照不足兩天，累積更多天數後即可顯示比較結果")
+    else:
+        overlay = chain_archive.overlay(data, history)
+        rendering.show(_draw_archive_overlay, overlay, float(spot_price),
+                       f"{symbol} vs {history['date'].nunique()} days of snapshots ({expiry})", figsize=(10, 8))
+
+def _draw_gamma_exposure(fig, gex, spot_price, title):
+    width = np.diff(gex.index.to_numpy()).min() * 0.8 if len(gex) > 1 else 1
+    ax = fig.subplots()
+    ax.bar(gex.index, gex.values, width=width, color=np.where(gex.values >= 0, 'seagreen', 'indianred'))
     ax.axvline(spot_price, color='red', linestyle='--', label=f"Spot={spot_price:.2f}")
+    ax.set_xlabel("Strike")
+    ax.set_ylabel("Gamma Exposure ($ per 1% move)")
+    ax.set_title(title)
     ax.legend()
-    st.pyplot(fig)
+
+def _draw_archive_overlay(fig, overlay, spot_price, title):
+    import seaborn as sns
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
+    sns.lineplot(data=overlay, x='strike', y='iv_percentile', hue='type', marker='o', ax=ax1)
+    ax1.set_ylabel("IV Percentile (%)")
+    sns.lineplot(data=overlay, x='strike', y='volume_z', hue='type', marker='o', ax=ax2)
+    ax2.axhline(0, color='gray', linestyle='--')
+    ax2.set_ylabel("Volume Z-Score")
+    for ax in (ax1, ax2):
+        ax.axvline(spot_price, color='red', linestyle='--')
+        ax.grid(True)
+    ax1.set_title(title)
 
 #   模型二：Isolation Forest Model
+def _plot_anomalies_3d(df, title):
+    interactive.show(interactive.anomalies_3d, df, title)
+
+@tracing.traced()
 def run_isolation_forest(symbol, expiry, contamination=0.05, random_state=42):
-    ticker = yf.Ticker(symbol)
-    opt_chain = ticker.option_chain(expiry)
-    calls = opt_chain.calls
-    puts = opt_chain.puts
-
-    calls = calls[(calls['volume'] > 0) & (calls['impliedVolatility'].notna())].copy()
-    puts = puts[(puts['volume'] > 0) & (puts['impliedVolatility'].notna())].copy()
-    calls['type'] = 'Call'
-    puts['type'] = 'Put'
-    df = pd.concat([calls, puts], ignore_index=True)
-
-    features = df[['volume', 'impliedVolatility', 'strike']].copy()
-    model = IsolationForest(n_estimators=100, contamination=contamination, random_state=random_state)
-    model.fit(features)
-    df['anomaly'] = model.predict(features)
+    df = chains.chain_frame(symbol, expiry)
+    df = df[(df['volume'] > 0) & (df['impliedVolatility'].notna())].reset_index(drop=True)
+
+    job = jobs.submit("isolation_forest", symbol, anomaly.isolation_forest, df,
+                      ['volume', 'impliedVolatility', 'strike'],
+                      contamination=contamination, random_state=random_state, version=jobs.data_version(df))
+    return jobs.track("isolation_job", job, functools.partial(_show_isolation_forest, symbol, expiry, random_state))
 
+def _show_isolation_forest(symbol, expiry, random_state, df):
     st.write(f"Random State: {random_state}")
     st.write(f"Total Contracts: {len(df)}")
     st.write(f"Anomalies Found: {(df['anomaly'] == -1).sum()}")
 
     # 📊 3D 異常偵測圖
-    fig = plt.figure(figsize=(10, 7))
-    ax = fig.add_subplot(111, projection='3d')
-    colors, sizes, markers = [], [], []
-    for _, row in df.iterrows():
-        if row['anomaly'] == -1:
-            sizes.append(80)
-            colors.append('red' if row['type'] == 'Call' else 'purple')
-            markers.append('*')
-        else:
-            sizes.append(20)
-            colors.append('lightblue' if row['type'] == 'Call' else 'orange')
-            markers.append('o')
-
-    for marker in ['o', '*']:
-        mask = [m == marker for m in markers]
-        ax.scatter(
-            df.loc[mask, 'volume'],
-            df.loc[mask, 'impliedVolatility'],
-            df.loc[mask, 'strike'],
-            c=[colors[i] for i, m in enumerate(markers) if m == marker],
-            s=[sizes[i] for i, m in enumerate(markers) if m == marker],
-            marker=marker,
-            alpha=0.8 if marker == '*' else 0.4,
-            edgecolors='k'
-        )
-
-    ax.set_xlabel("Volume")
-    ax.set_ylabel("Implied Volatility")
-    ax.set_zlabel("Strike Price")
-    ax.set_title(f"{symbol.upper()} Options Anomaly Detection ({expiry})")
-    st.pyplot(fig)
+    _plot_anomalies_3d(df, f"{symbol.upper()} Options Anomaly Detection ({expiry})")
 
     # 📋 結果表格
     st.dataframe(df[['contractSymbol', 'type', 'strike', 'volume', 'openInterest', 'impliedVolatility', 'anomaly']])
 
+# 全曲面版：同時抓取所有到期日，以到期天數作為額外特徵訓練單一 Isolation Forest
+@tracing.traced()
+def run_isolation_forest_surface(symbol, contamination=0.05, random_state=42):
+    df = chains.fetch_surface(symbol)
+    if df.empty:
+        st.warning(f"找不到 {symbol} 的期權資料")
+        return
+    df = df[(df['volume'] > 0) & (df['impliedVolatility'].notna())].reset_index(drop=True)
+
+    job = jobs.submit("isolation_forest_surface", symbol, anomaly.isolation_forest, df,
+                      ['volume', 'impliedVolatility', 'strike', 'dte'],
+                      contamination=contamination, random_state=random_state, version=jobs.data_version(df))
+    return jobs.track("isolation_job", job, functools.partial(_show_isolation_forest_surface, symbol, random_state))
+
+def _show_isolation_forest_surface(symbol, random_state, df):
+    st.write(f"Random State: {random_state}")
+    st.write(f"Expiries: {df['expiry'].nunique()}")
+    st.write(f"Total Contracts: {len(df)}")
+    st.write(f"Anomalies Found: {(df['anomaly'] == -1).sum()}")
+
+    # 📊 各到期日異常數
+    st.subheader("Anomalies by Expiry")
+    st.bar_chart(df['anomaly'].eq(-1).groupby(df['expiry']).sum())
+
+    _plot_anomalies_3d(df, f"{symbol.upper()} Options Anomaly Detection (All Expiries)")
+
+    # 📋 結果表格（異常合約排前面）
+    st.dataframe(df.sort_values(['anomaly', 'expiry'])[
+        ['contractSymbol', 'expiry', 'dte', 'type', 'strike', 'volume', 'openInterest', 'impliedVolatility', 'anomaly']])
+
 
 
 # ====================================
@@ -239,101 +357,138 @@ def run_isolation_forest(symbol, expiry, contamination=0.05, random_state=42):
 # ====================================
 st.set_page_config(layout="centered")
 
+PAGES = ["首頁", "基本分析", "技術分析", "籌碼分析", "相關資訊"]
+# 網址參數 ?page=技術分析 可直接開啟指定頁面（壓力測試工具也以此切換頁面）
+page_param = st.query_params.get("page")
+
 selected = option_menu(
     menu_title=None,
-    options=["首頁", "基本分析", "技術分析", "籌碼分析", "相關資訊"],
+    options=PAGES,
     icons=["house", "caret-right", "caret-right", "caret-right", "gear"],
     menu_icon="cast",
-    default_index=0,
+    default_index=PAGES.index(page_param) if page_param in PAGES else 0,
     orientation="horizontal"
 )
 
-if selected == "首頁": 
-    st.markdown(
-    "<p style='font-size:18px; color:red;'>*部分功能於台灣時間下午13:00~晚上21:00暫停查詢服務</p>",
-    unsafe_allow_html=True
-    )
-    st.image("https://www.ebc.com/upload/default/20230608/3a77502ab5dfce821f1c64982eccb091.jpg", caption="@ALL INFORMATION FROM YAHOO FINANCE")
-    indices = {
-        "道瓊工業指數": "^DJI",
-        "那斯達克綜合指數": "^IXIC",
-        "標普500指數": "^GSPC"
-    }
-
-    col1, col2, col3 = st.columns(3)
-    cols = [col1, col2, col3]
-
-    for i, (name, symbol) in enumerate(indices.items()):
-        ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d", interval="1m")
-
-        if not data.empty:
-            current_price = data['Close'][-1]
-            previous_price = data['Close'][-2] if len(data) > 1 else current_price
-            change = current_price - previous_price
-            pct_change = (change / previous_price) * 100 if previous_price != 0 else 0
-        else:
-            current_price = change = pct_change = 0
-
-        with cols[i]:
-            st.metric(
-                label=name,
-                value=f"{current_price:.2f}",
-                delta=f"{change:+.2f} ({pct_change:+.2f}%)",
-                border=True
-            )
-
-elif selected == "基本分析":
-    st.markdown(
-    "<p style='font-size:16px; color:red;'>*尚在開發中，功能尚未完全</p>",
-    unsafe_allow_html=True
-    )
-    symbol = st.text_input("輸入股票代碼 (如 AAPL)", value="")
-    selection = st.selectbox("選擇項目",["財務報表","營收狀況"])
-    if selection == "財務報表":
-        financial_statement.launcher_1(symbol)
-    elif selection == "營收狀況":
-        financial_statement.launcher_2(symbol)
-
-elif selected == "技術分析":
-    symbol = st.text_input("輸入股票代碼 (如 AAPL)", value="")
-    model_choice =st.selectbox("選擇模型", ["PCA Model", "XGBOOST Model"])
-    if model_choice == "PCA Model" and symbol:
-        if st.button("開始分析"):
-            run_PCA_analysis(symbol)
-
-    elif model_choice == "XGBOOST Model":
-        st.markdown("<p style='font-size:16px; color:red;'>*此模型仍在開發階段，僅供實驗性質參考使用</p>",unsafe_allow_html=True)
-        if st.button("開始分析"):
-            run_xgboost_analysis(symbol)
-
-elif selected == "籌碼分析":
-    symbol = st.text_input("請輸入股票代碼（如 AAPL）", value="")
-    if symbol:
-        ticker = yf.Ticker(symbol)
-        expirations = ticker.options
-        if expirations:
-            expiry = st.selectbox("選擇到期日", expirations)
-            model_choice =st.selectbox("選擇模型", ["Options Analysis Model", "Isolation Forest Model"])
-            if model_choice == "Options Analysis Model":
-                if st.button("開始分析"):
-                    run_options_analysis(symbol.upper(), expiry)
-
-            if model_choice == "Isolation Forest Model":
-                contamination = st.select_slider("Contamination", options=[0.01, 0.05, 0.10, 0.20], value=0.05)
-                random_choice = st.radio("Random State", ["Fixed 42", "Random"])
-                rs = 42 if random_choice == "Fixed 42" else np.random.randint(0, 1000)
-                if st.button("開始分析"):
-                    run_isolation_forest(symbol.upper(), expiry, contamination=contamination, random_state=rs)
-        else:
-            st.warning(f"找不到 {symbol} 的期權資料")
-
-elif selected == "相關資訊":
-    st.markdown("<p style='font-size:28px; color:white;'>It's all invented by David Lin</p>",unsafe_allow_html=True)
-    st.markdown("<p style='font-size:10px; color:grey;'>The infomation is from YAHOO FINANCE</p>",unsafe_allow_html=True)
-    st.markdown("<p style='font-size:10px; color:grey;'>IDE BY JUPYTER, COLAB, VS CODE</p>",unsafe_allow_html=True)
-    st.markdown(
-    """
+# 本次執行的分段計時（側邊欄面板於頁面最後顯示）；st.stop()、st.rerun() 或例外時也會結束剖析與 span 收集
+with tracing.request(selected) as trace_run:
+    if selected == "首頁": 
+        st.markdown(
+        "<p style='font-size:18px; color:red;'>*部分功能於台灣時間下午13:00~晚上21:00暫停查詢服務</p>",
+        unsafe_allow_html=True
+        )
+        st.image("https://www.ebc.com/upload/default/20230608/3a77502ab5dfce821f1c64982eccb091.jpg", caption="@ALL INFORMATION FROM YAHOO FINANCE")
+        indices = {
+            "道瓊工業指數": "^DJI",
+            "那斯達克綜合指數": "^IXIC",
+            "標普500指數": "^GSPC"
+        }
+
+        col1, col2, col3 = st.columns(3)
+        cols = [col1, col2, col3]
+
+        # 所有 session 共用背景更新的指數快照，不在每次 rerun 時各自下載
+        snapshot, _ = quotes.get_service(indices.values()).snapshot()
+
+        for i, (name, symbol) in enumerate(indices.items()):
+            quote = snapshot.get(symbol)
+            if quote:
+                current_price, change, pct_change = quote["price"], quote["change"], quote["pct_change"]
+            else:
+                current_price = change = pct_change = 0
+
+            with cols[i]:
+                st.metric(
+                    label=name,
+                    value=f"{current_price:.2f}",
+                    delta=f"{change:+.2f} ({pct_change:+.2f}%)",
+                    border=True
+                )
+
+    elif selected == "基本分析":
+        st.markdown(
+        "<p style='font-size:16px; color:red;'>*尚在開發中，功能尚未完全</p>",
+        unsafe_allow_html=True
+        )
+        symbol = st.text_input("輸入股票代碼 (如 AAPL)", value="")
+        selection = st.selectbox("選擇項目",["財務報表","營收狀況"])
+        if selection == "財務報表":
+            financial_statement.launcher_1(symbol)
+        elif selection == "營收狀況":
+            financial_statement.launcher_2(symbol)
+
+    elif selected == "技術分析":
+        symbol = st.text_input("輸入股票代碼 (如 AAPL)", value="")
+        model_choice =st.selectbox("選擇模型", ["PCA Model", "XGBOOST Model", "PCA Screener", "Monte Carlo"])
+        if model_choice == "PCA Model" and symbol:
+            resolution = st.selectbox("K 棒週期", list(PCA_RESOLUTIONS))
+            if st.button("開始分析"):
+                run_PCA_analysis(symbol, PCA_RESOLUTIONS[resolution])
+
+        elif model_choice == "XGBOOST Model":
+            st.markdown("<p style='font-size:16px; color:red;'>*此模型仍在開發階段，僅供實驗性質參考使用</p>",unsafe_allow_html=True)
+            mode = st.radio("評估方式", ["單次切分 (80/20)", "Walk-forward"], horizontal=True)
+            n_splits = st.slider("Fold 數", 3, 20, 10) if mode == "Walk-forward" else None
+            if st.button("開始分析"):
+                if n_splits:
+                    run_xgboost_walk_forward(symbol, n_splits=n_splits)
+                else:
+                    run_xgboost_analysis(symbol)
+            # 訓練中顯示進度，完成後顯示結果；切換其他元件也不會中斷或重算
+            jobs.follow("xgboost_job", symbol)
+
+        elif model_choice == "PCA Screener":
+            watchlist = st.text_area("觀察清單（以逗號或空白分隔）", value="AAPL, MSFT, NVDA, AMZN, GOOGL, META, TSLA")
+            symbols = [s for s in re.split(r"[,\s]+", watchlist.upper()) if s]
+            pca_mode = st.radio("PCA 模式", ["觀察清單 PCA", "全市場因子模型"], horizontal=True)
+            if pca_mode == "觀察清單 PCA":
+                if symbols and st.button("開始分析"):
+                    run_PCA_screener(symbols)
+            else:
+                factor_period = st.selectbox("因子模型歷史長度", ["2y", "5y", "10y", "max"], index=2)
+                if symbols and st.button("以觀察清單建立因子模型"):
+                    build_factor_model(symbols, factor_period)
+                jobs.follow("factor_job")
+                factor_model = factors.load(FACTOR_MODEL)
+                if factor_model is None:
+                    st.info("尚未建立因子模型：以上方清單建立，或執行 python -m analysis.factors <標的…> --period 10y")
+                elif symbols and st.button("開始分析"):
+                    run_factor_projection(symbols, factor_model)
+
+        elif model_choice == "Monte Carlo" and symbol:
+            probability.run(symbol)
+
+    elif selected == "籌碼分析":
+        symbol = st.text_input("請輸入股票代碼（如 AAPL）", value="")
+        if symbol:
+            expirations = chains.expirations(symbol)
+            if expirations:
+                expiry = st.selectbox("選擇到期日", expirations)
+                model_choice =st.selectbox("選擇模型", ["Options Analysis Model", "Isolation Forest Model"])
+                if model_choice == "Options Analysis Model":
+                    if st.button("開始分析"):
+                        run_options_analysis(symbol.upper(), expiry)
+
+                if model_choice == "Isolation Forest Model":
+                    contamination = st.select_slider("Contamination", options=[0.01, 0.05, 0.10, 0.20], value=0.05)
+                    random_choice = st.radio("Random State", ["Fixed 42", "Random"])
+                    rs = 42 if random_choice == "Fixed 42" else np.random.randint(0, 1000)
+                    scope = st.radio("分析範圍", ["選定到期日", "全部到期日"], horizontal=True)
+                    if st.button("開始分析"):
+                        if scope == "全部到期日":
+                            run_isolation_forest_surface(symbol.upper(), contamination=contamination, random_state=rs)
+                        else:
+                            run_isolation_forest(symbol.upper(), expiry, contamination=contamination, random_state=rs)
+                    jobs.follow("isolation_job", symbol.upper())
+            else:
+                st.warning(f"找不到 {symbol} 的期權資料")
+
+    elif selected == "相關資訊":
+        st.markdown("<p style='font-size:28px; color:white;'>It's all invented by David Lin</p>",unsafe_allow_html=True)
+        st.markdown("<p style='font-size:10px; color:grey;'>The infomation is from YAHOO FINANCE</p>",unsafe_allow_html=True)
+        st.markdown("<p style='font-size:10px; color:grey;'>IDE BY JUPYTER, COLAB, VS CODE</p>",unsafe_allow_html=True)
+        st.markdown(
+        """
     <style>
     h1, h2, h3, p  {
         font-family: "Microsoft JhengHei", sans-serif;
@@ -342,8 +497,10 @@ elif selected == "相關資訊":
     }
     </style>
     """,
-    unsafe_allow_html=True)
-    st.markdown("基本分析  --  ※維修中")
-    st.markdown("技術分析  --  PCA、XGBOOST(DEMO)")
-    st.markdown("籌碼分析  --  OPTION ANALYSIS、ISOLATION FOREST")
+        unsafe_allow_html=True)
+        st.markdown("基本分析  --  ※維修中")
+        st.markdown("技術分析  --  PCA、XGBOOST(DEMO)")
+        st.markdown("籌碼分析  --  OPTION ANALYSIS、ISOLATION FOREST")
+
+    tracing.sidebar(trace_run)
     
\ No newline at end of file
@@ -0,0 +1,14 @@
+from analysis import jobs
+
+
+# Isolation Forest 異常偵測：回傳加上 anomaly 欄（-1 為異常、1 為正常）的副本
+def isolation_forest(df, features, contamination=0.05, random_state=42, n_estimators=100):
+    from sklearn.ensemble import IsolationForest
+
+    jobs.report(0.1, f"訓練 Isolation Forest（{len(df)} 筆合約）")
+    model = IsolationForest(n_estimators=n_estimators, contamination=contamination, random_state=random_state)
+    model.fit(df[features])
+    jobs.report(0.9, "標記異常合約")
+    out = df.copy()
+    out["anomaly"] = model.predict(df[features])
+    return out
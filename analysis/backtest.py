@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import jobs, pools
+
+
+def _fit_fold(fold, X_train, y_train, X_test, y_test, params, n_threads):
+    from xgboost import XGBClassifier
+
+    start = time.perf_counter()
+    # 訓練期只有單一類別時無法訓練分類器，直接以該類別作為預測
+    if np.unique(y_train).size < 2:
+        y_pred = np.full_like(y_test, y_train[0])
+        importances = np.zeros(X_train.shape[1])
+    else:
+        model = XGBClassifier(eval_metric="logloss", n_jobs=n_threads, **params)
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+        importances = model.feature_importances_
+    fit_seconds = time.perf_counter() - start
+    return fold, float((y_pred == y_test).mean()), fit_seconds, importances
+
+
+# Walk-forward 驗證：TimeSeriesSplit 擴張視窗逐段訓練，各 fold 平行執行
+def walk_forward(X, y, n_splits=10, max_workers=None, params=None):
+    from sklearn.model_selection import TimeSeriesSplit
+
+    params = params or {}
+    index = X.index
+    features = list(X.columns)
+    X_values, y_values = X.to_numpy(dtype=float), y.to_numpy()
+
+    splits = list(TimeSeriesSplit(n_splits=n_splits).split(X_values))
+    workers, n_threads = pools.plan(len(splits), max_workers)
+
+    tasks = [(fold, X_values[tr], y_values[tr], X_values[te], y_values[te], params, n_threads)
+             for fold, (tr, te) in enumerate(splits, start=1)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        fitted = (_fit_fold(*task) for task in tasks)
+    else:
+        pool = pools.get_pool("backtest", workers, n_threads)
+        fitted = pool.map(_fit_fold, *zip(*tasks))
+    results = []
+    for result in fitted:
+        results.append(result)
+        jobs.report(len(results) / len(tasks), f"fold {len(results)}/{len(tasks)}")
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for (fold, acc, fit_seconds, _), (tr, te) in zip(results, splits):
+        rows.append({
+            "Fold": fold,
+            "Train Start": index[tr[0]],
+            "Train End": index[tr[-1]],
+            "Test Start": index[te[0]],
+            "Test End": index[te[-1]],
+            "Train Size": len(tr),
+            "Test Size": len(te),
+            "Accuracy": acc,
+            "Fit Seconds": fit_seconds,
+        })
+    folds = pd.DataFrame(rows).set_index("Fold")
+
+    stacked = np.vstack([r[3] for r in results])
+    importances = pd.DataFrame({
+        "Mean": stacked.mean(axis=0),
+        "Std": stacked.std(axis=0),
+    }, index=features).sort_values("Mean", ascending=False)
+
+    return folds, importances, elapsed
+
+
+# 訓練 XGBClassifier 並逐棵樹回報進度；xgb_model 為既有 booster 時在其上再增加 n_estimators 棵樹
+def fit_classifier(X_train, y_train, params=None, xgb_model=None):
+    from xgboost import XGBClassifier
+    from xgboost.callback import TrainingCallback
+
+    class Progress(TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            jobs.report((epoch + 1) / n_estimators, f"第 {epoch + 1}/{n_estimators} 棵樹")
+            return False
+
+    params = params or {}
+    n_estimators = params.get("n_estimators", 100)
+    model = XGBClassifier(eval_metric="logloss", n_estimators=n_estimators, callbacks=[Progress()],
+                          **{k: v for k, v in params.items() if k != "n_estimators"})
+    return model.fit(X_train, y_train, xgb_model=xgb_model)
+
+
+def evaluate(model, X_train, X_test, y_test):
+    y_pred = model.predict(X_test)
+    return {"accuracy": float((y_pred == np.asarray(y_test)).mean()), "importances": model.feature_importances_,
+            "train_size": len(X_train), "test_size": len(X_test)}
+
+
+def split(X, y, test_size=0.2):
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, y, test_size=test_size, shuffle=False)
+
+
+# 單次時間序列切分（前 80% 訓練、後 20% 測試）；訓練過程逐棵樹回報進度
+def holdout(X, y, test_size=0.2, params=None):
+    X_train, X_test, y_train, y_test = split(X, y, test_size)
+    model = fit_classifier(X_train, y_train, params)
+    return evaluate(model, X_train, X_test, y_test)
@@ -1,27 +1,86 @@
+import logging
+
 import streamlit as st
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from finnhub import Client
-import os
-
-print(type(os.environ))
-
-# 初始化 API client
-finnhub_client = Client(api_key=os.environ.get("FINNHUB_API_KEY"))
-
-
+from datasource import chain_archive, providers
+from analysis import pricing
+import rendering
+import interactive
+import tracing
+
+log = logging.getLogger(__name__)
+
+
+# Finnhub 期權鏈依到期日分組（data[].options.CALL / PUT），展開成每列一個合約
+def _flatten(res):
+    rows = []
+    for group in res.get("data", []):
+        expiry = group.get("expirationDate")
+        for side, contracts in (group.get("options") or {}).items():
+            for contract in contracts:
+                rows.append({**contract, "expiry": expiry, "type": side.capitalize()})
+    df = pd.DataFrame(rows)
+    if "impliedVolatility" in df:
+        # Finnhub 的 IV 以百分比表示
+        df["impliedVolatility"] = pd.to_numeric(df["impliedVolatility"], errors="coerce") / 100
+    return df
+
+
+# 封存供應商原始的期權鏈（自行求解 IV 之前），與 Yahoo 快照分開存放
+def _archive(symbol, df):
+    try:
+        raw = df.rename(columns={'contractName': 'contractSymbol', 'strikePrice': 'strike'})
+        for expiry, chain in raw.groupby('expiry'):
+            chain_archive.record(symbol, expiry, chain, provider="finnhub")
+    except Exception:
+        # 封存失敗不影響頁面，但要留下紀錄
+        log.exception("期權鏈快照封存失敗：%s", symbol)
+
+
+# 期權圖表繪製函數，Launcher 的期權分析頁共用
+def draw_volume_heatmap(fig, pivot_vol, title):
+    import seaborn as sns
+    ax = fig.subplots()
+    sns.heatmap(pivot_vol, cmap="YlGnBu", cbar_kws={'label': 'Volume'}, ax=ax)
+    ax.set_title(title)
+
+
+def draw_iv_distribution(fig, iv):
+    import seaborn as sns
+    mean_iv = iv.mean()
+    std_iv = iv.std()
+    ax = fig.subplots()
+    sns.histplot(iv, bins=30, kde=True, color='purple', ax=ax)
+    ax.axvline(mean_iv, color='red', linestyle='--', label=f"Mean = {mean_iv:.3f}")
+    ax.axvline(mean_iv + std_iv, color='green', linestyle='--', label=f"+1 Std = {mean_iv + std_iv:.3f}")
+    ax.axvline(mean_iv - std_iv, color='green', linestyle='--', label=f"-1 Std = {mean_iv - std_iv:.3f}")
+    ax.legend()
+
+
+def draw_iv_vs_strike(fig, filtered_data, spot_price):
+    import seaborn as sns
+    ax = fig.subplots()
+    sns.lineplot(data=filtered_data, x='strike', y='impliedVolatility', hue='type', marker='o', ax=ax)
+    if spot_price:
+        ax.axvline(spot_price, color='red', linestyle='--', label=f"Spot = {spot_price:.2f}")
+        ax.legend()
+
+
+@tracing.traced()
 def run(symbol):
     try:
-        # 取得整份期權資料
-        res = finnhub_client.option_chain(symbol=symbol)
-        raw_data = res.get("data", [])
-
-        if not raw_data:
+        # 期權鏈與現價同時抓取
+        with tracing.span("chips.fetch", "fetch") as s:
+            finnhub = providers.finnhub()
+            res, quote = finnhub.gather([finnhub.option_chain_async(symbol), finnhub.quote_async(symbol)])
+            if isinstance(res, Exception):
+                raise res
+            df = s.record(_flatten(res))
+
+        if df.empty:
             st.warning(f"⚠️ 找不到 {symbol} 的期權資料")
             return
-
-        df = pd.DataFrame(raw_data)
+        _archive(symbol, df)
 
         # 找出所有可選到期日
         expirations = sorted(df['expiry'].dropna().unique())
@@ -34,7 +93,7 @@ def run(symbol):
             st.warning("該到期日無期權資料")
             return
 
-        spot_price = res.get("quote", {}).get("c")  # 嘗試抓現價 (若無回傳則跳過)
+        spot_price = quote.get("c") if isinstance(quote, dict) else None  # 抓不到現價則跳過
         
         # 處理資料欄位一致性
         filtered = filtered.rename(columns={
@@ -45,45 +104,26 @@ def run(symbol):
             'lastPrice': 'lastPrice'
         })
 
+        # 供應商缺漏的 IV 以 Black-Scholes 自行求解補上，避免 dropna 丟掉合約
+        if spot_price:
+            with tracing.span("chips.price_chain", "compute") as s:
+                filtered = s.record(pricing.price_chain(filtered.assign(expiry=expiry), spot_price))
+
         filtered = filtered[['strike', 'volume', 'impliedVolatility', 'type', 'lastPrice']].dropna()
 
         st.subheader("📊 成交量熱力圖")
         pivot_vol = filtered.pivot_table(index='strike', columns='type', values='volume', aggfunc='sum', fill_value=0)
-        fig1, ax1 = plt.subplots(figsize=(10, 5))
-        sns.heatmap(pivot_vol, cmap="YlGnBu", cbar_kws={'label': 'Volume'}, ax=ax1)
-        ax1.set_title(f"{symbol} Options Volume Heatmap ({expiry})")
-        st.pyplot(fig1)
+        rendering.show(draw_volume_heatmap, pivot_vol, f"{symbol} Options Volume Heatmap ({expiry})")
 
         st.subheader("📌 市場情緒圖")
-        fig2, ax2 = plt.subplots(figsize=(10, 5))
-        sns.scatterplot(data=filtered, x='volume', y='impliedVolatility', hue='type', alpha=0.7, s=100, ax=ax2)
-        ax2.set_title("Volume vs Implied Volatility")
-        st.pyplot(fig2)
+        interactive.show(interactive.volume_iv, filtered, "Volume vs Implied Volatility")
 
         st.subheader("📈 IV 分布圖")
-        iv = filtered['impliedVolatility']
-        mean_iv = iv.mean()
-        std_iv = iv.std()
-        fig3, ax3 = plt.subplots(figsize=(10, 5))
-        sns.histplot(iv, bins=30, kde=True, color='purple', ax=ax3)
-        ax3.axvline(mean_iv, color='red', linestyle='--', label=f"Mean = {mean_iv:.3f}")
-        ax3.axvline(mean_iv + std_iv, color='green', linestyle='--', label=f"+1 Std = {mean_iv + std_iv:.3f}")
-        ax3.axvline(mean_iv - std_iv, color='green', linestyle='--', label=f"-1 Std = {mean_iv - std_iv:.3f}")
-        ax3.legend()
-        st.pyplot(fig3)
+        rendering.show(draw_iv_distribution, filtered['impliedVolatility'])
 
         st.subheader("📉 IV vs Strike（有成交量）")
         filtered_data = filtered[filtered['volume'] > 0]
-        fig4, ax4 = plt.subplots(figsize=(10, 5))
-        sns.lineplot(data=filtered_data, x='strike', y='impliedVolatility', hue='type', marker='o', ax=ax4)
-        if spot_price:
-            ax4.axvline(spot_price, color='red', linestyle='--', label=f"Spot = {spot_price:.2f}")
-            ax4.legend()
-        st.pyplot(fig4)
+        rendering.show(draw_iv_vs_strike, filtered_data, spot_price)
 
     except Exception as e:
         st.error(f"錯誤：{e}")
-        
-        
-print("res type:", type(res))
-print("res content:", res)
\ No newline at end of file
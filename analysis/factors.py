@@ -0,0 +1,197 @@
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import jobs, technical
+from datasource import store
+from settings import cache_path
+
+# ====================================
+#     Out-of-core 因子模型（IncrementalPCA）
+# ====================================
+# 長歷史、大量標的的 PCA 特徵不一次載入記憶體：
+#   1. write_features 逐批（OIAST_FACTOR_FETCH_CHUNK 檔）取得 OHLCV、計算特徵，各標的以自身歷史標準化
+#      （與 screener 相同，不同價位的股票落在同一座標系）後以 Parquet row group 追加寫入磁碟
+#   2. fit 串流讀取（Parquet row group 或 .npy memmap）已標準化的特徵做 IncrementalPCA.partial_fit；
+#      記憶體用量只與批次大小（OIAST_FACTOR_BATCH_ROWS）有關
+#   3. 模型連同各標的的平均數與標準差存於 .cache/factors/<名稱>.pkl，之後以 project 投影新資料，不必重新 fit
+#   python -m analysis.factors AAPL MSFT NVDA ... --period 10y --name market
+
+BATCH_ROWS = int(os.environ.get("OIAST_FACTOR_BATCH_ROWS", 50_000))
+FETCH_CHUNK = int(os.environ.get("OIAST_FACTOR_FETCH_CHUNK", 50))
+
+
+class FactorModel:
+    def __init__(self, pca, stats, rows, n_symbols, features=technical.PCA_FEATURES):
+        self.pca = pca
+        self.stats = stats
+        self.rows = rows
+        self.n_symbols = n_symbols
+        self.features = list(features)
+        self.fitted = time.time()
+
+    # 將某一標的的特徵序列（DataFrame 依 features 取欄，或同順序的陣列）投影到主成分，含 NaN 的列輸出 NaN；
+    # 建模時見過的標的沿用其平均數與標準差，其餘以傳入序列本身標準化
+    def project(self, X, symbol=None):
+        values = X[self.features].to_numpy(dtype=float) if isinstance(X, pd.DataFrame) else np.asarray(X, float)
+        mean, std = self.stats.get(symbol) or _moments(values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = (values - mean) / std
+        out = np.full((len(values), self.pca.n_components_), np.nan)
+        valid = np.isfinite(values).all(axis=1)
+        if valid.any():
+            out[valid] = self.pca.transform(values[valid])
+        return out
+
+
+# 各特徵的平均數與標準差；標準差為 0 的特徵設為 NaN，標準化後該列會被略過
+def _moments(values):
+    mean = np.nanmean(values, axis=0)
+    std = np.nanstd(values, axis=0)
+    return mean, np.where(std > 0, std, np.nan)
+
+
+def _path(name, ext):
+    return cache_path("factors", f"{name}.{ext}")
+
+
+# 逐批取得 OHLCV：每次只有 chunk 檔標的的資料在記憶體中
+def market_frames(symbols, period="10y", interval="1d", chunk=FETCH_CHUNK):
+    for start in range(0, len(symbols), chunk):
+        yield from store.fetch_many(symbols[start:start + chunk], period=period, interval=interval).items()
+
+
+# 將 (symbol, OHLCV) 逐檔計算 PCA 特徵、以該標的自身的平均數與標準差標準化後追加寫入 Parquet；
+# 回傳 (列數, 標的數, {標的: (平均數, 標準差)})
+def write_features(frames, path, total=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("symbol", pa.string()), ("date", pa.timestamp("ns"))] +
+                       [(name, pa.float64()) for name in technical.PCA_FEATURES])
+    rows = symbols = 0
+    stats = {}
+    with pq.ParquetWriter(path + ".tmp", schema) as writer:
+        for symbol, df in frames:
+            features = technical.pca_feature_frame(df).dropna() if not df.empty else df
+            if not features.empty:
+                values = features[technical.PCA_FEATURES].to_numpy(dtype=float)
+                stats[symbol] = mean, std = _moments(values)
+                values = (values - mean) / std
+                index = features.index.tz_localize(None) if features.index.tz is not None else features.index
+                table = pa.table({"symbol": np.full(len(features), symbol), "date": index.as_unit("ns"),
+                                  **{name: values[:, i] for i, name in enumerate(technical.PCA_FEATURES)}},
+                                 schema=schema)
+                writer.write_table(table, row_group_size=BATCH_ROWS)
+                rows += len(features)
+                symbols += 1
+            if total:
+                jobs.report(0.5 * symbols / total, f"特徵 {symbols}/{total} 檔")
+    os.replace(path + ".tmp", path)
+    return rows, symbols, stats
+
+
+# 依序讀出特徵批次（float 二維陣列，已去除含 NaN 的列）；source 為 Parquet 檔或 .npy（以 memmap 開啟）
+def batches(source, batch_rows=BATCH_ROWS, columns=technical.PCA_FEATURES):
+    if source.endswith(".npy"):
+        data = np.load(source, mmap_mode="r")
+        chunks = (data[start:start + batch_rows] for start in range(0, len(data), batch_rows))
+    else:
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source, memory_map=True)
+        chunks = (np.column_stack([batch.column(c).to_numpy(zero_copy_only=False) for c in columns])
+                  for batch in parquet.iter_batches(batch_size=batch_rows, columns=list(columns)))
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        yield chunk[np.isfinite(chunk).all(axis=1)]
+
+
+def _count(source):
+    if source.endswith(".npy"):
+        return len(np.load(source, mmap_mode="r"))
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+# source 的特徵須已依標的標準化（write_features 寫出的檔案即是）；stats 為各標的的標準化參數，供 project 使用
+def fit(source, n_components=2, batch_rows=BATCH_ROWS, n_symbols=None, stats=None):
+    from sklearn.decomposition import IncrementalPCA
+
+    total = _count(source)
+    pca = IncrementalPCA(n_components=n_components)
+    seen, carry = 0, None
+    for batch in batches(source, batch_rows):
+        # IncrementalPCA 每批至少要有 n_components 列，不足的併入下一批
+        if carry is not None:
+            batch, carry = np.vstack([carry, batch]), None
+        if len(batch) < n_components:
+            carry = batch
+            continue
+        pca.partial_fit(batch)
+        seen += len(batch)
+        jobs.report(0.5 + 0.5 * min(seen / total, 1), f"IncrementalPCA {seen:,}/{total:,} 列")
+    if seen < n_components:
+        raise ValueError(f"特徵資料只有 {seen} 列，不足以計算 {n_components} 個主成分")
+
+    # 主成分方向取 RSI 載荷為正，與 screener 相同
+    sign = np.where(pca.components_[:, 0] < 0, -1.0, 1.0)
+    pca.components_ *= sign[:, None]
+    return FactorModel(pca, stats or {}, seen, n_symbols)
+
+
+def save(model, name="market"):
+    path = _path(name, "pkl")
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load(name="market"):
+    path = _path(name, "pkl")
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    # 舊版模型以全體共用的 StandardScaler 標準化，與現在的特徵不相容，視為尚未建立
+    return model if hasattr(model, "stats") else None
+
+
+# 下載、寫出特徵、串流 fit 並存檔；可作為背景工作執行
+def build(symbols, name="market", period="10y", interval="1d", n_components=2):
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    source = _path(name, "parquet")
+    rows, count, stats = write_features(market_frames(symbols, period, interval), source, total=len(symbols))
+    model = fit(source, n_components, n_symbols=count, stats=stats)
+    save(model, name)
+    return {"name": name, "rows": rows, "symbols": count,
+            "explained": model.pca.explained_variance_ratio_.tolist()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以 IncrementalPCA 建立全市場因子模型")
+    parser.add_argument("symbols", nargs="*", help="標的代碼；也可用 --file 指定每行一檔的清單")
+    parser.add_argument("--file", help="標的清單檔")
+    parser.add_argument("--name", default="market")
+    parser.add_argument("--period", default="10y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--components", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    symbols = list(args.symbols)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            symbols += [line.strip() for line in f if line.strip()]
+    if not symbols:
+        parser.error("請指定標的")
+    summary = build(symbols, args.name, args.period, args.interval, args.components)
+    ratio = "、".join(f"{r:.1%}" for r in summary["explained"])
+    print(f"{summary['symbols']} 檔、{summary['rows']:,} 列；各主成分解釋變異 {ratio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from settings import cache_path
+
+# 常用財報科目的標準名稱與別名（依優先順序；yfinance 目前名稱在前，舊版名稱在後）
+BALANCE_FIELDS = {
+    "Total Assets": ["Total Assets"],
+    "Total Liabilities": ["Total Liabilities Net Minority Interest", "Total Liabilities", "Total Liab"],
+    "Equity": ["Stockholders Equity", "Total Stockholder Equity", "Common Stock Equity",
+               "Total Equity Gross Minority Interest", "Shareholders Equity"],
+    "Current Assets": ["Current Assets", "Total Current Assets"],
+    "Current Liabilities": ["Current Liabilities", "Total Current Liabilities"],
+}
+
+# rapidfuzz 相似度門檻（0–100），低於此分數視為找不到
+SCORE_CUTOFF = 85
+# 持久化的對應結果上限，超過時丟棄最舊的
+MAX_MAPPINGS = 2048
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+# 統一大小寫、駝峰與標點：「TotalAssets」、「total_assets」、「Total Assets」皆視為相同
+def normalize(name):
+    name = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", str(name))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name.lower()).split())
+
+
+# 比對規則改變時遞增，磁碟上以舊規則記錄的對應自動失效
+_MATCH_VERSION = 2
+
+
+def _signature(columns, fields):
+    payload = json.dumps([_MATCH_VERSION, sorted(columns), fields], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _memo_path():
+    return cache_path("fields", "mappings.json")
+
+
+def _load_memo():
+    global _memo
+    if _memo is None:
+        try:
+            with open(_memo_path(), encoding="utf-8") as f:
+                _memo = json.load(f)
+        except (OSError, ValueError):
+            _memo = {}
+    return _memo
+
+
+def _save_memo(memo):
+    while len(memo) > MAX_MAPPINGS:
+        memo.pop(next(iter(memo)))
+    path = _memo_path()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(memo, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def _match(columns, fields):
+    from rapidfuzz import fuzz, process
+
+    normalized = [normalize(c) for c in columns]
+    exact = {}
+    for column, norm in zip(columns, normalized):
+        exact.setdefault(norm, column)
+
+    aliases = [(key, normalize(alias)) for key, alias_list in fields.items() for alias in alias_list]
+    # 所有別名 × 所有欄位一次算出相似度矩陣
+    scores = process.cdist([a for _, a in aliases], normalized, scorer=fuzz.ratio,
+                           score_cutoff=SCORE_CUTOFF, workers=-1) if normalized else None
+
+    # 先比對該科目所有別名的完全相符，都沒有時才取所有別名中相似度最高的欄位
+    found = {key: None for key in fields}
+    rows = {}
+    for row, (key, alias) in enumerate(aliases):
+        rows.setdefault(key, []).append(row)
+        if found[key] is None and alias in exact:
+            found[key] = exact[alias]
+    if scores is not None:
+        for key, key_rows in rows.items():
+            block = scores[key_rows]
+            if found[key] is None and block.max() > 0:
+                found[key] = columns[int(np.unravel_index(np.argmax(block), block.shape)[1])]
+    return found
+
+
+# 將報表欄位對應到標準科目，回傳 {標準名稱: 欄位名稱或 None}
+# 同一組欄位與別名表的結果會記錄在磁碟上，重啟後直接沿用
+def resolve(columns, fields=BALANCE_FIELDS):
+    columns = [str(c) for c in columns]
+    signature = _signature(columns, fields)
+    with _memo_lock:
+        memo = _load_memo()
+        if signature in memo:
+            return dict(memo[signature])
+
+    found = _match(columns, fields)
+    with _memo_lock:
+        memo[signature] = found
+        try:
+            _save_memo(memo)
+        except OSError:
+            pass
+    return found
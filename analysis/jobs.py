@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis import pools
+
+# ====================================
+#     背景模型工作佇列
+# ====================================
+# 耗時的模型訓練交給背景行程池執行，Streamlit 腳本只送出工作並輪詢進度；
+# 使用者操作其他元件造成的 rerun 不會中斷工作，也不會重新計算。
+#   job = jobs.submit("xgboost", symbol, backtest.holdout, X, y, test_size=0.2,
+#                     version=jobs.data_version(X, y))
+#   jobs.track("xgboost_job", job, render)   # 記在 session 中，之後每次 rerun 以 jobs.follow 顯示
+# 工作以 (模型, 標的, 參數, 資料版本) 為鍵：相同工作執行中時直接共用同一個，
+# 完成的結果保留在以筆數為上限的 LRU（OIAST_JOB_CACHE）。
+# 工作函數可呼叫 jobs.report(比例, 訊息) 回報進度，且必須定義在 analysis/ 等可被子行程 import 的模組
+# （不可放在 Launcher.py，import 即會執行頁面）。
+# 本身已使用行程池的工作（如 walk-forward）以 inline=True 在本行程的執行緒中協調，避免巢狀行程池。
+
+WORKERS = int(os.environ.get("OIAST_JOB_WORKERS", 2))
+CACHE_SIZE = int(os.environ.get("OIAST_JOB_CACHE", 32))
+POLL_SECONDS = float(os.environ.get("OIAST_JOB_POLL", 1.0))
+
+
+class Job:
+    __slots__ = ("key", "model", "symbol", "params", "status", "progress", "message", "result", "error",
+                 "submitted", "started", "finished")
+
+    def __init__(self, key, model, symbol, params):
+        self.key = key
+        self.model = model
+        self.symbol = symbol
+        self.params = params
+        self.status = "pending"  # pending / running / done / failed
+        self.progress = 0.0
+        self.message = None
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - (self.started or self.submitted)
+
+
+# ---- 工作端：回報進度 ----
+
+_local = threading.local()
+_channel = None
+
+
+def report(fraction, message=None):
+    reporter = getattr(_local, "reporter", None)
+    if reporter is not None:
+        reporter(min(max(float(fraction), 0.0), 1.0), message)
+
+
+def _init_channel(channel):
+    global _channel
+    _channel = channel
+
+
+def _run_in_process(key, fn, args, kwargs):
+    _channel.put((key, "started", None, None))
+    _local.reporter = lambda fraction, message: _channel.put((key, "progress", fraction, message))
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.reporter = None
+
+
+def _run_inline(job, fn, args, kwargs):
+    job.status, job.started = "running", time.time()
+    _local.reporter = lambda fraction, message: _update(job, fraction, message)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.reporter = None
+
+
+def _update(job, fraction, message):
+    job.progress = fraction
+    if message is not None:
+        job.message = message
+
+
+# ---- 佇列端 ----
+
+_jobs = {}
+_results = OrderedDict()
+_guard = threading.Lock()
+_progress = None
+_threads = None
+
+
+# 子行程的進度經由同一條 multiprocessing.Queue 回傳，由背景執行緒寫回 Job
+def _listen(channel):
+    while True:
+        key, event, fraction, message = channel.get()
+        job = _jobs.get(key)
+        if job is None:
+            continue
+        if event == "started":
+            job.status, job.started = "running", time.time()
+        else:
+            _update(job, fraction, message)
+
+
+def _pool():
+    global _progress
+    with _guard:
+        if _progress is None:
+            _progress = pools.spawn.Queue()
+            threading.Thread(target=_listen, args=(_progress,), name="job-progress", daemon=True).start()
+    _, n_threads = pools.plan(WORKERS, WORKERS)
+    return pools.get_pool("jobs", WORKERS, n_threads, initializer=_init_channel, initargs=(_progress,))
+
+
+def _thread_pool():
+    global _threads
+    with _guard:
+        if _threads is None:
+            _threads = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="job")
+        return _threads
+
+
+# 資料版本：輸入資料內容的雜湊，資料更新（例如多了一根 K 棒）時工作鍵隨之改變
+def data_version(*objs):
+    h = hashlib.sha1()
+    for obj in objs:
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            labels = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+            h.update(repr((obj.shape, labels)).encode())
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            h.update(repr((obj.shape, obj.dtype.str)).encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+        else:
+            h.update(repr(obj).encode())
+    return h.hexdigest()[:16]
+
+
+def job_key(model, symbol, params, version):
+    raw = json.dumps([model, symbol, sorted((params or {}).items()), version], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def get(key):
+    with _guard:
+        job = _jobs.get(key)
+        if job is None and key in _results:
+            _results.move_to_end(key)
+            job = _results[key]
+        return job
+
+
+# 送出工作；params 為工作鍵的參數（預設即傳給 fn 的 kwargs）
+def submit(model, symbol, fn, *args, params=None, version=None, inline=False, **kwargs):
+    key = job_key(model, symbol, kwargs if params is None else params, version)
+    with _guard:
+        job = _jobs.get(key)
+        if job is None and key in _results and _results[key].status == "done":
+            _results.move_to_end(key)
+            job = _results[key]
+        if job is not None:
+            return job
+        job = _jobs[key] = Job(key, model, symbol, kwargs if params is None else params)
+    try:
+        if inline:
+            future = _thread_pool().submit(_run_inline, job, fn, args, kwargs)
+        else:
+            future = _pool().submit(_run_in_process, key, fn, args, kwargs)
+    except BaseException as e:
+        # 送不出去（例如行程池已損壞）時不能留下永遠 pending 的工作，否則之後相同的工作都會等它
+        _fail(job, e)
+        raise
+    future.add_done_callback(lambda f: _finish(job, f))
+    return job
+
+
+def _finish(job, future):
+    try:
+        job.result = future.result()
+    except BaseException as e:
+        _fail(job, e)
+        return
+    job.status, job.progress = "done", 1.0
+    job.finished = time.time()
+    _remember(job)
+
+
+def _fail(job, error):
+    job.error = f"{type(error).__name__}: {error}"
+    job.status = "failed"
+    job.finished = time.time()
+    # 失敗的工作也保留，讓頁面顯示錯誤；再次送出相同工作時會重新執行
+    _remember(job)
+
+
+def _remember(job):
+    with _guard:
+        _jobs.pop(job.key, None)
+        _results[job.key] = job
+        _results.move_to_end(job.key)
+        while len(_results) > CACHE_SIZE:
+            _results.popitem(last=False)
+
+
+# 登錄已在別處取得的結果（例如模型登錄中的既有模型）為已完成的工作，之後 track / follow 與一般工作相同
+def put(model, symbol, result, params=None, version=None):
+    job = Job(job_key(model, symbol, params, version), model, symbol, params)
+    job.result, job.status, job.progress = result, "done", 1.0
+    job.started = job.finished = time.time()
+    _remember(job)
+    return job
+
+
+# ---- Streamlit 顯示 ----
+
+# 未完成時顯示進度條，並以 fragment 定期輪詢（只重跑進度條）
+# 完成後整頁 rerun 並呼叫 render(result)
+def show(job, render):
+    import streamlit as st
+
+    if job.status == "done":
+        render(job.result)
+        return
+    if job.status == "failed":
+        st.error(f"❌ 分析失敗：{job.error}")
+        return
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def poll():
+        if job.done:
+            st.rerun()
+        state = job.message or ("執行中" if job.status == "running" else "排隊中")
+        st.progress(job.progress, text=f"{job.model}（{job.symbol}）{state}… {job.elapsed:.0f} 秒")
+    poll()
+
+
+# 把工作記在 session 的 slot 中；之後的 rerun 以 follow 顯示同一個工作，不必再按一次按鈕
+def track(slot, job, render):
+    import streamlit as st
+    st.session_state[slot] = (job.key, render)
+    return job
+
+
+def follow(slot, symbol=None):
+    import streamlit as st
+
+    entry = st.session_state.get(slot)
+    if entry is None:
+        return
+    key, render = entry
+    job = get(key)
+    if job is not None and (symbol is None or job.symbol == symbol):
+        show(job, render)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis import backtest, jobs
+from settings import cache_path
+
+# ====================================
+#     XGBoost 模型登錄
+# ====================================
+# 訓練好的 booster 以 XGBoost 原生二進位格式（UBJSON）存於 models/<標的>/<特徵雜湊>-<截止日>.ubj，
+# 同名 .json 記錄準確率、特徵重要度、訓練方式與所用資料的版本。
+#   models.lookup(symbol, X, y)     # 相同資料已訓練過時直接回傳結果（只讀 JSON，毫秒級），否則 None
+#   models.train(symbol, X, y)      # 背景工作：訓練並登錄
+# 有新 K 棒（截止日往後）時，以相同特徵組合最近一次的模型為起點，以 xgb_model= 續訓，
+# 只增加 OIAST_MODEL_UPDATE_ROUNDS 棵樹；連續續訓 OIAST_MODEL_REFIT_EVERY 次後改為完整重新訓練，
+# 避免樹越疊越多而偏離完整訓練的結果。每組特徵只保留最近 OIAST_MODEL_KEEP 個模型。
+
+UPDATE_ROUNDS = int(os.environ.get("OIAST_MODEL_UPDATE_ROUNDS", 10))
+REFIT_EVERY = int(os.environ.get("OIAST_MODEL_REFIT_EVERY", 20))
+KEEP = int(os.environ.get("OIAST_MODEL_KEEP", 5))
+
+
+def _symbol_dir(symbol):
+    return cache_path("models", symbol.upper())
+
+
+# 特徵組合雜湊：特徵欄位與模型參數，任一改變即視為不同模型，不會互相續訓
+def feature_hash(X, params=None):
+    raw = json.dumps([list(X.columns), sorted((params or {}).items())], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def _cutoff(X_train):
+    stamp = pd.Timestamp(X_train.index[-1])
+    return stamp.strftime("%Y%m%d") if stamp == stamp.normalize() else stamp.strftime("%Y%m%dT%H%M")
+
+
+def _write(path, data, mode="wb"):
+    # 先寫暫存檔再置換，其他 session 不會讀到寫到一半的檔案
+    with open(path + ".tmp", mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+# 某標的已登錄的模型中繼資料，依截止日排序；fingerprint 指定時只列該特徵組合
+def entries(symbol, fingerprint=None):
+    directory = _symbol_dir(symbol)
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or (fingerprint and not name.startswith(fingerprint + "-")):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if os.path.exists(os.path.join(directory, entry["file"])):
+            found.append(entry)
+    return sorted(found, key=lambda e: (e["cutoff"], e["created"]))
+
+
+def _entry(symbol, fingerprint, cutoff):
+    path = os.path.join(_symbol_dir(symbol), f"{fingerprint}-{cutoff}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if os.path.exists(os.path.join(_symbol_dir(symbol), entry["file"])) else None
+
+
+def _result(entry):
+    return {**entry["metrics"], "importances": np.array(list(entry["importances"].values())),
+            "cutoff": entry["cutoff"], "mode": entry["mode"], "rounds": entry["rounds"],
+            "fit_seconds": entry["fit_seconds"]}
+
+
+def lookup(symbol, X, y, test_size=0.2, params=None):
+    X_train = backtest.split(X, y, test_size)[0]
+    entry = _entry(symbol, feature_hash(X, params), _cutoff(X_train))
+    if entry is not None and entry["data"] == jobs.data_version(X, y):
+        return _result(entry)
+    return None
+
+
+# 載入已登錄的模型供預測
+def load_model(symbol, entry):
+    from xgboost import XGBClassifier
+
+    model = XGBClassifier()
+    model.load_model(os.path.join(_symbol_dir(symbol), entry["file"]))
+    return model
+
+
+# 續訓的起點必須早於本次截止日；截止日相同但資料版本不同（例如修正過的 K 棒）時完整重新訓練
+def _base(symbol, fingerprint, cutoff):
+    candidates = [e for e in entries(symbol, fingerprint) if e["cutoff"] < cutoff]
+    return candidates[-1] if candidates else None
+
+
+def train(symbol, X, y, test_size=0.2, params=None):
+    import xgboost
+
+    symbol = symbol.upper()
+    params = params or {}
+    hit = lookup(symbol, X, y, test_size, params)
+    if hit is not None:
+        return hit
+
+    fingerprint = feature_hash(X, params)
+    X_train, X_test, y_train, y_test = backtest.split(X, y, test_size)
+    cutoff = _cutoff(X_train)
+    base = _base(symbol, fingerprint, cutoff)
+
+    start = time.perf_counter()
+    if base is not None and base["updates"] < REFIT_EVERY:
+        booster = xgboost.Booster(model_file=os.path.join(_symbol_dir(symbol), base["file"]))
+        model = backtest.fit_classifier(X_train, y_train, {**params, "n_estimators": UPDATE_ROUNDS}, xgb_model=booster)
+        mode, updates, rounds = "continued", base["updates"] + 1, base["rounds"] + UPDATE_ROUNDS
+    else:
+        model = backtest.fit_classifier(X_train, y_train, params)
+        mode, updates, rounds = "full", 0, params.get("n_estimators", 100)
+    fit_seconds = time.perf_counter() - start
+
+    metrics = backtest.evaluate(model, X_train, X_test, y_test)
+    importances = metrics.pop("importances")
+    name = f"{fingerprint}-{cutoff}"
+    entry = {
+        "symbol": symbol, "fingerprint": fingerprint, "features": list(X.columns), "params": params,
+        "cutoff": cutoff, "data": jobs.data_version(X, y), "file": name + ".ubj",
+        "mode": mode, "base": base["file"] if mode == "continued" else None, "updates": updates, "rounds": rounds,
+        "fit_seconds": fit_seconds, "created": time.time(), "metrics": metrics,
+        "importances": dict(zip(X.columns, map(float, importances))),
+    }
+    directory = _symbol_dir(symbol)
+    os.makedirs(directory, exist_ok=True)
+    _write(os.path.join(directory, entry["file"]), bytes(model.get_booster().save_raw(raw_format="ubj")))
+    _write(os.path.join(directory, name + ".json"), json.dumps(entry, ensure_ascii=False), mode="w")
+    _prune(symbol, fingerprint)
+    return _result(entry)
+
+
+def _prune(symbol, fingerprint):
+    directory = _symbol_dir(symbol)
+    for entry in entries(symbol, fingerprint)[:-KEEP]:
+        for name in (entry["file"], entry["file"][:-len(".ubj")] + ".json"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,72 @@
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import context
+
+_pools = {}
+_pools_guard = threading.Lock()
+_main_guard = threading.Lock()
+
+
+# Streamlit 執行頁面時把 sys.modules["__main__"] 換成頁面腳本的模組（沒有 __loader__），
+# spawn 的子行程會以 __mp_main__ 重新執行整個頁面（下載資料、啟動背景更新器）；
+# 啟動子行程的瞬間換成空的 __main__，工作函數一律定義在可 import 的模組中（見 analysis/jobs.py）
+class _SpawnProcess(context.SpawnProcess):
+    def start(self):
+        with _main_guard:
+            main = sys.modules.get("__main__")
+            page = getattr(main, "__file__", None) and getattr(main, "__loader__", None) is None
+            if page:
+                sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                if page:
+                    sys.modules["__main__"] = main
+
+
+class _SpawnContext(context.SpawnContext):
+    Process = _SpawnProcess
+
+
+spawn = _SpawnContext()
+
+
+# 子行程啟動時先限制 OpenMP 執行緒，避免多個工作同時搶滿所有核心；initializer 為呼叫端額外的初始化
+def _init_worker(n_threads, initializer=None, initargs=()):
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+# 依名稱取得可重複使用的行程池；大小或執行緒數改變，或行程池已損壞（工作行程被 OOM 終止、當掉）時重建
+# 使用 spawn，避免在 Streamlit 的多執行緒行程中 fork
+def get_pool(name, workers, n_threads=1, initializer=None, initargs=()):
+    with _pools_guard:
+        pool, shape = _pools.get(name, (None, None))
+        # ProcessPoolExecutor 偵測到工作行程異常結束後會設定 _broken，之後的 submit 一律丟出 BrokenProcessPool
+        if pool is None or shape != (workers, n_threads) or getattr(pool, "_broken", False):
+            if pool is not None:
+                pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=spawn,
+                                       initializer=_init_worker, initargs=(n_threads, initializer, initargs))
+            _pools[name] = (pool, (workers, n_threads))
+        return pool
+
+
+# 平行工作數與每個工作可用的執行緒數，總和不超過 CPU 核心數
+def plan(n_tasks, max_workers=None):
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(n_tasks, max_workers or cpus))
+    return workers, max(1, cpus // workers)
+
+
+# 關閉所有行程池；在行程池的工作行程（例如壓力測試的 session 行程）結束前呼叫，
+# 否則結束時會一直等待仍在待命的子行程
+def shutdown():
+    with _pools_guard:
+        for pool, _ in _pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _pools.clear()
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+# ====================================
+#     向量化 Black-Scholes 定價與 Greeks
+# ====================================
+# 所有函數接受可廣播的 NumPy 陣列，一次處理整條（或多條）期權鏈。
+# S 現價、K 履約價、T 年化到期時間、r 無風險利率、q 股息殖利率、is_call 布林陣列
+
+RISK_FREE_RATE = 0.04
+DAYS_PER_YEAR = 365.0
+
+_MIN_VOL, _MAX_VOL = 1e-4, 5.0
+
+
+def _ndtr(x):
+    from scipy.special import ndtr
+    return ndtr(x)
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def _d1_d2(S, K, T, r, q, sigma):
+    sqrt_t = np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma ** 2) * T) / (sigma * sqrt_t)
+    return d1, d1 - sigma * sqrt_t
+
+
+def bs_price(S, K, T, sigma, is_call, r=RISK_FREE_RATE, q=0.0):
+    d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+    disc_s, disc_k = S * np.exp(-q * T), K * np.exp(-r * T)
+    call = disc_s * _ndtr(d1) - disc_k * _ndtr(d2)
+    put = disc_k * _ndtr(-d2) - disc_s * _ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+# 以 Newton 法求隱含波動率，跳出區間或 vega 過小時改用二分法（有界 Newton）
+# 價格不在無套利區間內的合約回傳 NaN
+def implied_volatility(price, S, K, T, is_call, r=RISK_FREE_RATE, q=0.0, tol=1e-6, max_iter=50):
+    price, S, K, T, is_call = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, S, K, T)),
+                                                  np.asarray(is_call, dtype=bool))
+    T = np.maximum(T, 1e-6)
+    disc_s, disc_k = S * np.exp(-q * T), K * np.exp(-r * T)
+    lower = np.where(is_call, np.maximum(disc_s - disc_k, 0), np.maximum(disc_k - disc_s, 0))
+    upper = np.where(is_call, disc_s, disc_k)
+    solvable = np.isfinite(price) & (price > lower) & (price < upper) & (S > 0) & (K > 0)
+
+    lo = np.full(price.shape, _MIN_VOL)
+    hi = np.full(price.shape, _MAX_VOL)
+    # Brenner–Subrahmanyam 近似作為初始值
+    sigma = np.clip(np.sqrt(2 * np.pi / T) * price / np.where(S > 0, S, 1), 0.05, 2.0)
+    active = solvable.copy()
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        s = sigma[active]
+        diff = bs_price(S[active], K[active], T[active], s, is_call[active], r, q) - price[active]
+        d1, _ = _d1_d2(S[active], K[active], T[active], r, q, s)
+        vega = disc_s[active] * _npdf(d1) * np.sqrt(T[active])
+
+        converged = np.abs(diff) < tol
+
+        # 價格單調遞增於波動率，據此縮小區間
+        lo[active] = np.where(diff < 0, s, lo[active])
+        hi[active] = np.where(diff > 0, s, hi[active])
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = s - diff / vega
+        bisect = (lo[active] + hi[active]) / 2
+        inside = np.isfinite(step) & (step > lo[active]) & (step < hi[active])
+        sigma[active] = np.where(converged, s, np.where(inside, step, bisect))
+
+        done = converged | (hi[active] - lo[active] < tol)
+        idx = np.flatnonzero(active)
+        active[idx[done]] = False
+
+    return np.where(solvable, sigma, np.nan)
+
+
+# 每單位合約（非 ×100）的 Greeks；theta 以「每日」計、vega 以「每 1% 波動」計
+def greeks(S, K, T, sigma, is_call, r=RISK_FREE_RATE, q=0.0):
+    S, K, T, sigma = (np.asarray(a, dtype=float) for a in (S, K, T, sigma))
+    T = np.maximum(T, 1e-6)
+    d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+    sqrt_t = np.sqrt(T)
+    disc_q, disc_r = np.exp(-q * T), np.exp(-r * T)
+    pdf = _npdf(d1)
+
+    delta = np.where(is_call, disc_q * _ndtr(d1), disc_q * (_ndtr(d1) - 1))
+    gamma = disc_q * pdf / (S * sigma * sqrt_t)
+    vega = S * disc_q * pdf * sqrt_t / 100
+    common = -S * disc_q * pdf * sigma / (2 * sqrt_t)
+    theta_call = common - r * K * disc_r * _ndtr(d2) + q * S * disc_q * _ndtr(d1)
+    theta_put = common + r * K * disc_r * _ndtr(-d2) - q * S * disc_q * _ndtr(-d1)
+    theta = np.where(is_call, theta_call, theta_put) / DAYS_PER_YEAR
+    return {"delta": delta, "gamma": gamma, "vega": vega, "theta": theta}
+
+
+# 選擇定價基準：買賣價皆有效時取中價，否則用最後成交價
+def reference_price(chain):
+    last = pd.to_numeric(chain["lastPrice"], errors="coerce").to_numpy(dtype=float)
+    if "bid" not in chain or "ask" not in chain:
+        return last
+    bid = pd.to_numeric(chain["bid"], errors="coerce").to_numpy(dtype=float)
+    ask = pd.to_numeric(chain["ask"], errors="coerce").to_numpy(dtype=float)
+    return np.where((bid > 0) & (ask >= bid), (bid + ask) / 2, last)
+
+
+# 對整條期權鏈（需含 strike、lastPrice、type，及 expiry 或 dte 欄位）求解 IV 與 Greeks
+# 供應商 IV 缺漏的合約以自行求解的 IV 補上
+def price_chain(chain, spot, r=RISK_FREE_RATE, q=0.0, as_of=None):
+    df = chain.copy()
+    if "dte" in df:
+        days = df["dte"].to_numpy(dtype=float)
+    else:
+        as_of = pd.Timestamp(as_of or pd.Timestamp.today().normalize())
+        days = (pd.to_datetime(df["expiry"]) - as_of).dt.days.to_numpy(dtype=float)
+    # 到期日當天仍有半天時間價值
+    T = np.maximum(days, 0.5) / DAYS_PER_YEAR
+    K = df["strike"].to_numpy(dtype=float)
+    is_call = df["type"].astype(str).str.lower().eq("call").to_numpy()
+
+    solved = implied_volatility(reference_price(df), spot, K, T, is_call, r, q)
+    df["solvedIV"] = solved
+    if "impliedVolatility" in df:
+        provided = pd.to_numeric(df["impliedVolatility"], errors="coerce").to_numpy(dtype=float)
+        df["impliedVolatility"] = np.where(np.isfinite(provided) & (provided > 0), provided, solved)
+    else:
+        df["impliedVolatility"] = solved
+
+    for name, values in greeks(spot, K, T, df["impliedVolatility"].to_numpy(dtype=float), is_call, r, q).items():
+        df[name] = values
+    return df
+
+
+# 依履約價加總 Gamma 曝險（每 1% 現價變動的美元 Gamma），買權為正、賣權為負
+def gamma_exposure(priced, spot, contract_size=100):
+    oi = pd.to_numeric(priced["openInterest"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    sign = np.where(priced["type"].astype(str).str.lower().eq("call"), 1.0, -1.0)
+    gex = sign * priced["gamma"].to_numpy(dtype=float) * oi * contract_size * spot ** 2 * 0.01
+    return pd.Series(np.nan_to_num(gex), index=priced["strike"].to_numpy()).groupby(level=0).sum()
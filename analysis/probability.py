@@ -1,3 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis import pools
+
+# 每個區塊的路徑矩陣（路徑數 × 天數 × 8 bytes）上限；區塊路徑數由天數換算，長天期時自動縮小
+CHUNK_BYTES = int(float(os.environ.get("OIAST_MC_CHUNK_MB", 64)) * 2**20)
+# 頁面上同時模擬的區塊數（每個工作各佔一個區塊的記憶體）
+WORKERS = int(os.environ.get("OIAST_MC_WORKERS", 2))
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def log_returns(close):
+    close = np.asarray(close, dtype=float)
+    close = close[np.isfinite(close) & (close > 0)]
+    return np.diff(np.log(close))
+
+
+def chunk_size(horizon, budget=CHUNK_BYTES):
+    return max(1_000, budget // (horizon * 8))
+
+
+# 模擬一個區塊的路徑，回傳期末價格與各價位的觸及次數
+def _simulate_chunk(method, returns, spot, horizon, n_paths, seed, block, levels):
+    rng = np.random.default_rng(seed)
+    if method == "gbm":
+        mu, sigma = returns.mean(), returns.std(ddof=1)
+        steps = rng.standard_normal((n_paths, horizon))
+        steps *= sigma
+        steps += mu
+    else:
+        # 區塊拔靴法：隨機抽取連續 block 天的歷史報酬串接，保留短期自相關與波動群聚
+        n_blocks = -(-horizon // block)
+        starts = rng.integers(0, len(returns) - block + 1, size=(n_paths, n_blocks))
+        idx = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+        steps = returns[idx]
+
+    paths = np.cumsum(steps, axis=1, out=steps)
+    terminal = (spot * np.exp(paths[:, -1])).astype(np.float32)
+
+    thresholds = np.log(np.asarray(levels, dtype=float) / spot)
+    above = thresholds >= 0
+    hits = np.zeros(len(levels), dtype=np.int64)
+    if above.any():
+        hits[above] = (paths.max(axis=1)[:, None] >= thresholds[above]).sum(axis=0)
+    if (~above).any():
+        hits[~above] = (paths.min(axis=1)[:, None] <= thresholds[~above]).sum(axis=0)
+    return terminal, hits
+
+
+# Monte Carlo 股價機率：method 為 "gbm" 或 "bootstrap"
+# 以 SeedSequence 為每個區塊產生獨立種子，結果與是否平行、工作數無關
+def simulate(close, horizon=20, n_paths=1_000_000, levels=(), method="gbm", block=5,
+             seed=42, workers=1, chunk_paths=None):
+    chunk_paths = chunk_paths or chunk_size(horizon)
+    returns = log_returns(close)
+    if len(returns) < max(block, 2) + 1:
+        raise ValueError("歷史資料不足，無法模擬")
+    spot = float(np.asarray(close, dtype=float)[-1])
+    levels = [float(x) for x in levels]
+
+    sizes = [chunk_paths] * (n_paths // chunk_paths)
+    if n_paths % chunk_paths:
+        sizes.append(n_paths % chunk_paths)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(method, returns, spot, horizon, size, s, block, levels) for size, s in zip(sizes, seeds)]
+
+    workers, _ = pools.plan(len(tasks), workers)
+    if workers == 1:
+        results = [_simulate_chunk(*task) for task in tasks]
+    else:
+        results = list(pools.get_pool("probability", workers).map(_simulate_chunk, *zip(*tasks)))
+
+    terminal = np.concatenate([r[0] for r in results])
+    hits = np.sum([r[1] for r in results], axis=0) if levels else np.zeros(0)
+    return {"spot": spot, "horizon": horizon, "terminal": terminal, "levels": levels, "hits": hits, "n_paths": n_paths}
+
+
+# 期末價格分位數與各價位的觸及／期末高於機率（附標準誤）
+def summarize(result):
+    terminal = result["terminal"]
+    n = result["n_paths"]
+    quantiles = pd.Series(np.quantile(terminal, QUANTILES), index=[f"{q:.0%}" for q in QUANTILES], name="Price")
+
+    rows = []
+    for level, hits in zip(result["levels"], result["hits"]):
+        touch = hits / n
+        finish = float((terminal >= level).mean()) if level >= result["spot"] else float((terminal <= level).mean())
+        rows.append({
+            "Level": level,
+            "方向": "向上" if level >= result["spot"] else "向下",
+            "觸及機率": touch,
+            "觸及 ±SE": np.sqrt(touch * (1 - touch) / n),
+            "期末越過機率": finish,
+        })
+    return quantiles, pd.DataFrame(rows)
+
+
+def _draw_distribution(fig, counts, edges, spot, bands, title):
+    ax = fig.subplots()
+    ax.stairs(counts, edges, fill=True, color="steelblue", alpha=0.8)
+    ax.axvline(spot, color="red", linestyle="--", label=f"Spot={spot:.2f}")
+    for q in bands:
+        ax.axvline(q, color="green", linestyle="--")
+    ax.set_title(title)
+    ax.legend()
+
+
 def run(symbol):
     import streamlit as st
-    st.info('🔧 股價機率分析尚未實作')
+    import rendering
+    import tracing
+    from datasource import store
+
+    st.header("🎲 股價機率分析（Monte Carlo）")
+    # 與 XGBoost 模型共用同一份日線歷史
+    close = store.fetch(symbol, period="720d", interval="1d")["Close"].dropna()
+    if len(close) < 60:
+        st.warning("找不到足夠的歷史股價資料")
+        return
+    spot = float(close.iloc[-1])
+
+    method = st.radio("模擬方法", ["GBM", "Block Bootstrap"], horizontal=True)
+    horizon = st.slider("預測天數（交易日）", 5, 252, 20)
+    n_paths = st.select_slider("路徑數", options=[10_000, 100_000, 1_000_000, 5_000_000], value=1_000_000)
+    seed = int(st.number_input("Seed", value=42, step=1))
+    default_levels = ", ".join(f"{spot * m:.2f}" for m in (0.9, 0.95, 1.05, 1.1))
+    levels_text = st.text_input(f"目標價位（現價 {spot:.2f}，以逗號分隔）", value=default_levels)
+
+    if not st.button("開始模擬"):
+        return
+    try:
+        levels = [float(x) for x in levels_text.split(",") if x.strip()]
+    except ValueError:
+        st.error("目標價位格式錯誤")
+        return
+
+    with tracing.span("probability.simulate", "compute", paths=n_paths, horizon=horizon) as s:
+        result = simulate(close.to_numpy(), horizon=horizon, n_paths=n_paths, levels=levels,
+                          method="gbm" if method == "GBM" else "bootstrap", seed=seed, workers=WORKERS)
+        quantiles, table = summarize(result)
+        s.record(result["terminal"])
+
+    st.subheader(f"{horizon} 個交易日後的價格分布")
+    st.table(quantiles.to_frame().T.style.format("{:.2f}"))
+    # 直方圖先在此算好，快取鍵只需雜湊 200 個 bin 而非全部期末價格
+    counts, edges = np.histogram(result["terminal"], bins=200)
+    rendering.show(_draw_distribution, counts, edges, spot, (float(quantiles.iloc[0]), float(quantiles.iloc[-1])),
+                   f"{symbol} Terminal Price Distribution ({n_paths:,} paths)")
+
+    if not table.empty:
+        st.subheader("價位觸及機率")
+        st.dataframe(table.style.format({"Level": "{:.2f}", "觸及機率": "{:.2%}", "觸及 ±SE": "{:.3%}",
+                                         "期末越過機率": "{:.2%}"}))
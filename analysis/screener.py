@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from analysis import technical
+from datasource import store
+
+
+# 將多檔 OHLCV 對齊成同一組交易日，回傳 (symbols, dates, panel)
+# panel 形狀為 標的 × 日期 × 特徵，特徵順序同 technical.PCA_FEATURES
+def build_panel(frames):
+    frames = {s: df for s, df in frames.items() if not df.empty}
+    symbols = list(frames)
+    if not symbols:
+        return symbols, pd.DatetimeIndex([]), np.empty((0, 0, len(technical.PCA_FEATURES)))
+
+    dates = frames[symbols[0]].index
+    for s in symbols[1:]:
+        dates = dates.union(frames[s].index)
+
+    # 個別標的停牌或交易日不同時以前值補價格、成交量補 0，避免缺值吃掉整個滾動視窗
+    def column(name, fill):
+        aligned = [frames[s][name].reindex(dates) for s in symbols]
+        aligned = [a.ffill() if fill == "ffill" else a.fillna(fill) for a in aligned]
+        return np.column_stack([a.to_numpy(dtype=float) for a in aligned])
+
+    close = column("Close", "ffill")
+    values = technical.pca_features(close, column("High", "ffill"), column("Low", "ffill"), column("Volume", 0.0))
+    return symbols, dates, np.moveaxis(values, 1, 0)
+
+
+# 整份觀察清單一次計算 PCA 特徵與共用投影，回傳依 PC1 排序的結果表
+def screen(symbols, period="180d", n_components=2):
+    from sklearn.decomposition import PCA
+
+    frames = store.fetch_many(symbols, period=period)
+    symbols, dates, panel = build_panel(frames)
+    if not symbols:
+        return pd.DataFrame(), None, None
+
+    # 各標的各自標準化，讓不同價位的股票落在同一座標系
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(panel, axis=1, keepdims=True)
+        std = np.nanstd(panel, axis=1, keepdims=True)
+        scaled = (panel - mean) / std
+    valid = np.isfinite(scaled).all(axis=2)
+
+    pca = PCA(n_components=n_components)
+    pca.fit(scaled[valid])
+    # 主成分方向取 RSI 載荷為正，分數越高代表越偏多
+    sign = np.where(pca.components_[:, 0] < 0, -1.0, 1.0)
+    pca.components_ *= sign[:, None]
+
+    projection = np.full(panel.shape[:2] + (n_components,), np.nan)
+    projection[valid] = pca.transform(scaled[valid])
+
+    rsi, k, d = (technical.PCA_FEATURES.index(f) for f in ("RSI", "K", "D"))
+    rows = []
+    for i, symbol in enumerate(symbols):
+        idx = np.flatnonzero(valid[i])
+        if idx.size == 0:
+            continue
+        last = idx[-1]
+        prev = idx[max(idx.size - 6, 0)]
+        rows.append({
+            "Symbol": symbol,
+            "Date": dates[last],
+            "Close": frames[symbol]["Close"].reindex(dates).ffill().iloc[last],
+            "PC1": projection[i, last, 0],
+            "PC2": projection[i, last, 1] if n_components > 1 else np.nan,
+            "ΔPC1 (5d)": projection[i, last, 0] - projection[i, prev, 0],
+            "RSI": panel[i, last, rsi],
+            "K": panel[i, last, k],
+            "D": panel[i, last, d],
+        })
+
+    table = pd.DataFrame(rows).sort_values("PC1", ascending=False).reset_index(drop=True)
+    table.index += 1
+    return table, pca, projection
@@ -0,0 +1,379 @@
+import numpy as np
+
+from analysis import technical
+
+# ====================================
+#     串流技術指標（新 K 棒 O(1) 更新）
+# ====================================
+# 與 technical 的批次函數同語意：warm(歷史) 以批次公式算出整段結果並建立狀態（回傳值與批次函數相同），
+# 之後每根新 K 棒呼叫 update(值)，只更新固定大小的狀態，不必重算整段視窗。
+# 輸入可為純量（單一標的）或一維陣列（觀察清單中每個標的一格），對應批次函數的一維 / 二維輸入：
+#   ma20 = streaming.SMA(20)
+#   ma20.warm(close_history)         # 形狀 (日期,) 或 (日期, 標的)
+#   ma20.update(new_close)           # 純量或 (標的,)
+# 視窗內的值存放在固定大小的環狀緩衝區；滾動和以加減方式更新，每經過一個視窗長度由緩衝區重新加總一次，
+# 浮點誤差不會隨時間累積，攤還後仍為 O(1)。
+
+
+def _scalar(x):
+    # 0 維陣列轉回 numpy 純量，單一標的時與批次結果的元素型別一致
+    return x[()] if isinstance(x, np.ndarray) and x.ndim == 0 else x
+
+
+class Ring:
+    __slots__ = ("window", "values", "pos", "filled")
+
+    def __init__(self, window, shape=()):
+        self.window = window
+        self.values = np.full((window,) + tuple(shape), np.nan)
+        self.pos = 0
+        self.filled = 0
+
+    @property
+    def full(self):
+        return self.filled == self.window
+
+    # 放入新值，回傳被擠出的舊值（視窗未滿時為 None）
+    def push(self, x):
+        old = self.values[self.pos].copy() if self.full else None
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+        return old
+
+    # 以歷史的最後 window 列填滿緩衝區
+    def load(self, history):
+        tail = history[-self.window:]
+        self.values[:len(tail)] = tail
+        self.pos = len(tail) % self.window
+        self.filled = len(tail)
+
+    def contents(self):
+        return self.values[:self.filled]
+
+
+# ---- 滾動視窗 ----
+
+class _Rolling:
+    __slots__ = ("window", "ring", "nans", "steps")
+
+    def __init__(self, window):
+        self.window = window
+        self.ring = None
+
+    def _reset(self, shape):
+        self.ring = Ring(self.window, shape)
+        self.steps = 0
+        self._resync()
+
+    def warm(self, history):
+        history = np.asarray(history, dtype=float)
+        self._reset(history.shape[1:])
+        self.ring.load(history)
+        self._resync()
+        return self._batch(history)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.ring is None:
+            self._reset(x.shape)
+        old = self.ring.push(x)
+        self._add(x, 1)
+        if old is not None:
+            self._add(old, -1)
+        self.steps += 1
+        if self.steps >= self.window:
+            self._resync()
+        return self.value
+
+    @property
+    def ready(self):
+        # 視窗已滿且不含 NaN（與 pandas rolling 相同，含 NaN 的視窗輸出 NaN）
+        return self.ring is not None and self.ring.full and self.nans == 0
+
+    def _resync(self):
+        self.nans = np.isnan(self.ring.contents()).sum(axis=0)
+        self.steps = 0
+
+    def _add(self, x, sign):
+        self.nans = self.nans + sign * np.isnan(x)
+
+
+class RollingSum(_Rolling):
+    __slots__ = ("total",)
+
+    def _batch(self, history):
+        return technical.rolling_sum(history, self.window)
+
+    def _resync(self):
+        super()._resync()
+        self.total = np.nansum(self.ring.contents(), axis=0)
+
+    def _add(self, x, sign):
+        super()._add(x, sign)
+        self.total = self.total + sign * np.nan_to_num(x)
+
+    @property
+    def value(self):
+        return _scalar(np.where(self.ready, self.total, np.nan))
+
+
+class SMA(RollingSum):
+    __slots__ = ()
+
+    def _batch(self, history):
+        return technical.sma(history, self.window)
+
+    @property
+    def value(self):
+        return _scalar(np.where(self.ready, self.total / self.window, np.nan))
+
+
+# 滾動標準差：累加相對於平移點的一次、二次和，平移點在每次重新加總時移到視窗平均，避免大數相減失去精度
+class RollingStd(_Rolling):
+    __slots__ = ("ddof", "shift", "s1", "s2")
+
+    def __init__(self, window, ddof=1):
+        super().__init__(window)
+        self.ddof = ddof
+
+    def _batch(self, history):
+        return technical.rolling_std(history, self.window, ddof=self.ddof)
+
+    def _resync(self):
+        super()._resync()
+        values = self.ring.contents()
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(values, axis=0) if len(values) else np.zeros(values.shape[1:])
+        self.shift = np.nan_to_num(mean)
+        d = np.nan_to_num(values - self.shift)
+        self.s1 = d.sum(axis=0)
+        self.s2 = (d * d).sum(axis=0)
+
+    def _add(self, x, sign):
+        super()._add(x, sign)
+        d = np.nan_to_num(x - self.shift)
+        self.s1 = self.s1 + sign * d
+        self.s2 = self.s2 + sign * d * d
+
+    @property
+    def value(self):
+        n = self.window
+        var = np.maximum(self.s2 - self.s1 * self.s1 / n, 0.0) / (n - self.ddof)
+        return _scalar(np.where(self.ready, np.sqrt(var), np.nan))
+
+
+# 滾動最小 / 最大值：視窗固定（KD 為 9 根），每次掃描緩衝區，成本與歷史長度無關
+class RollingMin(_Rolling):
+    __slots__ = ()
+
+    def _batch(self, history):
+        return technical.rolling_min(history, self.window)
+
+    @property
+    def value(self):
+        return _scalar(np.min(self.ring.values, axis=0) if self.ring.full else np.full(self.nans.shape, np.nan))
+
+
+class RollingMax(_Rolling):
+    __slots__ = ()
+
+    def _batch(self, history):
+        return technical.rolling_max(history, self.window)
+
+    @property
+    def value(self):
+        return _scalar(np.max(self.ring.values, axis=0) if self.ring.full else np.full(self.nans.shape, np.nan))
+
+
+# ---- 指數平滑 ----
+
+# 語意等同 technical.ema：adjust=True 時分子、分母各自衰減（NaN 不計權重）；
+# adjust=False 時 y_t = a*x_t + (1-a)*y_{t-1}，中間缺值時與 pandas 相同，前值權重依缺值根數再衰減
+class EMA:
+    __slots__ = ("span", "com", "alpha", "adjust", "num", "den", "weight", "started", "value")
+
+    def __init__(self, span=None, com=None, adjust=True):
+        self.span = span
+        self.com = com
+        self.alpha = technical._alpha(span, com)
+        self.adjust = adjust
+        self.num = None
+
+    def _reset(self, shape):
+        self.num = np.zeros(shape)
+        self.den = np.zeros(shape)
+        # adjust=False：前值的權重，遇到缺值時每根再乘上 1-a
+        self.weight = np.ones(shape)
+        self.started = np.zeros(shape, dtype=bool)
+        self.value = _scalar(np.full(shape, np.nan))
+
+    def warm(self, history):
+        from scipy.signal import lfilter
+
+        history = np.asarray(history, dtype=float)
+        out = technical.ema(history, span=self.span, com=self.com, adjust=self.adjust)
+        self._reset(history.shape[1:])
+        if len(history):
+            valid = ~np.isnan(history)
+            decay = [1.0, -(1.0 - self.alpha)]
+            self.num = lfilter([1.0], decay, np.where(valid, history, 0.0), axis=0)[-1]
+            self.den = lfilter([1.0], decay, valid.astype(float), axis=0)[-1]
+            self.started = valid.any(axis=0)
+            # 尾端連續缺值的根數
+            trailing = np.argmax(valid[::-1], axis=0)
+            self.weight = (1.0 - self.alpha) ** trailing
+            self.value = _scalar(out[-1])
+        return out
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.num is None:
+            self._reset(x.shape)
+        valid = ~np.isnan(x)
+        a = self.alpha
+        if self.adjust:
+            self.num = np.where(valid, x, 0.0) + (1.0 - a) * self.num
+            self.den = valid + (1.0 - a) * self.den
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value = np.where(self.den > 0, self.num / self.den, np.nan)
+        else:
+            # 與 pandas 相同：前值權重 w 隨每根 K 棒（含缺值）乘上 1-a，與新值以 w : a 加權平均；
+            # 沒有中間缺值時 w 恆為 1-a
+            weight = self.weight * (1.0 - a)
+            with np.errstate(invalid="ignore"):
+                mixed = (weight * np.asarray(self.value) + a * x) / (weight + a)
+            value = np.where(valid, np.where(self.started, mixed, x), self.value)
+            self.weight = np.where(valid, 1.0, np.where(self.started, weight, 1.0))
+            self.started = self.started | valid
+            value = np.where(self.started, value, np.nan)
+        self.value = _scalar(value)
+        return self.value
+
+
+class MACD:
+    __slots__ = ("fast", "slow", "signal")
+
+    def __init__(self, fast=12, slow=26, signal=9, adjust=True):
+        self.fast = EMA(span=fast, adjust=adjust)
+        self.slow = EMA(span=slow, adjust=adjust)
+        self.signal = EMA(span=signal, adjust=adjust)
+
+    # 回傳 (DIF, 訊號線)
+    def warm(self, close):
+        dif = self.fast.warm(close) - self.slow.warm(close)
+        return dif, self.signal.warm(dif)
+
+    def update(self, close):
+        dif = self.fast.update(close) - self.slow.update(close)
+        return dif, self.signal.update(dif)
+
+
+# RSI：與 technical.rsi 相同，為 window 根報酬中上漲總和 / 絕對值總和 × 100
+class RSI:
+    __slots__ = ("prev", "up", "total")
+
+    def __init__(self, window=14):
+        self.prev = None
+        self.up = RollingSum(window)
+        self.total = RollingSum(window)
+
+    @staticmethod
+    def _ratio(up, total):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(total > 0, up / total * 100, np.where(np.isnan(total), np.nan, 0.0))
+
+    def warm(self, close):
+        close = np.asarray(close, dtype=float)
+        r = technical.pct_change(close)
+        up = self.up.warm(np.clip(r, 0, None))
+        total = self.total.warm(np.abs(r))
+        self.prev = close[-1] if len(close) else np.full(close.shape[1:], np.nan)
+        return self._ratio(up, total)
+
+    def update(self, close):
+        close = np.asarray(close, dtype=float)
+        prev = np.full(close.shape, np.nan) if self.prev is None else self.prev
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = close / prev - 1
+        self.prev = close
+        return _scalar(self._ratio(self.up.update(np.clip(r, 0, None)), self.total.update(np.abs(r))))
+
+
+# KD：RSV 取 window 根高低區間，K、D 為 com 的指數平滑
+class KD:
+    __slots__ = ("low", "high", "k", "d")
+
+    def __init__(self, window=9, com=2):
+        self.low = RollingMin(window)
+        self.high = RollingMax(window)
+        self.k = EMA(com=com)
+        self.d = EMA(com=com)
+
+    @staticmethod
+    def _rsv(close, low_min, high_max):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (np.asarray(close, dtype=float) - low_min) / (high_max - low_min) * 100
+
+    # 回傳 (K, D)
+    def warm(self, high, low, close):
+        rsv = self._rsv(close, self.low.warm(low), self.high.warm(high))
+        k = self.k.warm(rsv)
+        return k, self.d.warm(k)
+
+    def update(self, high, low, close):
+        rsv = self._rsv(close, self.low.update(low), self.high.update(high))
+        k = self.k.update(rsv)
+        return k, self.d.update(k)
+
+
+# ====================================
+#           模型特徵組合
+# ====================================
+# 與 technical.pca_features / xgb_features 相同排列；warm 回傳整段特徵，update 回傳最新一列
+# （單一標的為 (特徵,)，多個標的為 (標的, 特徵)）
+
+class PCAFeatures:
+    __slots__ = ("rsi", "ma5", "ma10", "ma20", "macd", "std20", "kd")
+
+    def __init__(self):
+        self.rsi = RSI()
+        self.ma5 = SMA(5)
+        self.ma10 = SMA(10)
+        self.ma20 = SMA(20)
+        self.macd = MACD()
+        self.std20 = RollingStd(20)
+        self.kd = KD()
+
+    def warm(self, close, high, low, volume):
+        return self._stack(
+            [self.rsi.warm(close), self.ma5.warm(close), self.ma10.warm(close), self.ma20.warm(close),
+             self.macd.warm(close)[0], self.std20.warm(close)], volume, self.kd.warm(high, low, close))
+
+    def update(self, close, high, low, volume):
+        return self._stack(
+            [self.rsi.update(close), self.ma5.update(close), self.ma10.update(close), self.ma20.update(close),
+             self.macd.update(close)[0], self.std20.update(close)], volume, self.kd.update(high, low, close))
+
+    @staticmethod
+    def _stack(values, volume, kd):
+        return np.stack(values + [np.asarray(volume, dtype=float), kd[0], kd[1]], axis=-1)
+
+
+class XGBFeatures:
+    __slots__ = ("ma20", "ma60", "macd")
+
+    def __init__(self):
+        self.ma20 = SMA(20)
+        self.ma60 = SMA(60)
+        self.macd = MACD(adjust=False)
+
+    def warm(self, close, volume):
+        dif, signal = self.macd.warm(close)
+        return np.stack([np.asarray(volume, dtype=float), self.ma20.warm(close), self.ma60.warm(close), dif, signal],
+                        axis=-1)
+
+    def update(self, close, volume):
+        dif, signal = self.macd.update(close)
+        return np.stack([np.asarray(volume, dtype=float), self.ma20.update(close), self.ma60.update(close), dif,
+                         signal], axis=-1)
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ====================================
+#     向量化技術指標（支援單欄或多欄）
+# ====================================
+# 所有函數接受一維（單一標的）或二維（日期 × 標的）陣列，沿第 0 軸（時間）計算，
+# 回傳與輸入同形狀的 float 陣列；視窗未滿或含 NaN 時輸出 NaN，與 pandas rolling 相同。
+
+PCA_FEATURES = ["RSI", "MA5", "MA10", "MA20", "MACD", "STD20", "Volume", "K", "D"]
+XGB_FEATURES = ["Volume", "ma20", "ma60", "macd", "macd_signal"]
+
+
+def _rolling(x, window, reducer):
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window:
+        out[window - 1:] = reducer(sliding_window_view(x, window, axis=0), axis=-1)
+    return out
+
+
+# 沿時間軸以累加和相減取得每個視窗的總和，每點 O(1)，不隨視窗長度增加
+def _windowed(a, window):
+    c = np.cumsum(a, axis=0)
+    out = np.empty((c.shape[0] - window + 1,) + c.shape[1:], dtype=c.dtype)
+    out[0] = c[window - 1]
+    np.subtract(c[window:], c[:-window], out=out[1:])
+    return out
+
+
+# 視窗內的總和、平方和（皆已減去各欄平均值 shift，降低相減的捨入誤差）；
+# 含 NaN 時另回傳各視窗是否整窗有效，無 NaN 時為 None
+def _window_sums(x, window, squares=False):
+    valid = np.isfinite(x)
+    if valid.all():
+        shift = x.mean(axis=0)
+        centered = x - shift
+        full = None
+    else:
+        shift = np.where(valid, x, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+        centered = np.where(valid, x - shift, 0.0)
+        full = _windowed(valid, window) == window
+    sums = _windowed(centered, window)
+    if squares:
+        centered *= centered
+        squares = _windowed(centered, window)
+    return shift, sums, squares, full
+
+
+def sma(x, window):
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window:
+        shift, sums, _, full = _window_sums(x, window)
+        sums /= window
+        sums += shift
+        if full is not None:
+            sums[~full] = np.nan
+        out[window - 1:] = sums
+    return out
+
+
+def rolling_std(x, window, ddof=1):
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    if x.shape[0] >= window and window > ddof:
+        _, sums, squares, full = _window_sums(x, window, squares=True)
+        sums *= sums
+        sums /= window
+        squares -= sums
+        np.maximum(squares, 0.0, out=squares)
+        squares /= window - ddof
+        np.sqrt(squares, out=squares)
+        if full is not None:
+            squares[~full] = np.nan
+        out[window - 1:] = squares
+    return out
+
+
+def rolling_min(x, window):
+    return _rolling(x, window, np.min)
+
+
+def rolling_max(x, window):
+    return _rolling(x, window, np.max)
+
+
+def rolling_sum(x, window):
+    return _rolling(x, window, np.sum)
+
+
+def pct_change(x):
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = x[1:] / x[:-1] - 1
+    return out
+
+
+def _alpha(span=None, com=None):
+    if span is not None:
+        return 2.0 / (span + 1.0)
+    if com is not None:
+        return 1.0 / (1.0 + com)
+    raise ValueError("必須指定 span 或 com")
+
+
+# 指數移動平均，語意等同 pandas ewm(...).mean()（ignore_na=False）
+# adjust=True 時 NaN 不計權重但仍隨時間衰減；adjust=False 時 NaN 位置輸出前值，
+# 缺值之後的第一個有效值與前值以 a : (1-a)^(缺值數+1) 加權平均
+def ema(x, span=None, com=None, adjust=True):
+    from scipy.signal import lfilter
+
+    x = np.asarray(x, dtype=float)
+    alpha = _alpha(span, com)
+    decay = [1.0, -(1.0 - alpha)]
+    valid = ~np.isnan(x)
+
+    if adjust:
+        num = lfilter([1.0], decay, np.where(valid, x, 0.0), axis=0)
+        den = lfilter([1.0], decay, valid.astype(float), axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(den > 0, num / den, np.nan)
+
+    seen = np.cumsum(valid, axis=0)
+    started = seen > 0
+    # 開始後中間有缺值時權重不再是固定的 a : 1-a，改用 pandas 的遞迴（少見，仍為 C 實作）
+    if (started & ~valid).any():
+        flat = pd.DataFrame(x.reshape(len(x), -1)).ewm(alpha=alpha, adjust=False).mean()
+        return flat.to_numpy().reshape(x.shape)
+    # 第一個有效值除以 alpha，使 y0 = x0、之後 y_t = a*x_t + (1-a)*y_{t-1}
+    seed = np.where(valid & (seen == 1), x / alpha, x)
+    out = lfilter([alpha], decay, np.where(started, seed, 0.0), axis=0)
+    return np.where(started, out, np.nan)
+
+
+# RSI：14 日內上漲報酬總和 / 報酬絕對值總和 × 100（原 rolling lambda 的向量化版本）
+def rsi(close, window=14):
+    r = pct_change(close)
+    up = rolling_sum(np.clip(r, 0, None), window)
+    total = rolling_sum(np.abs(r), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, up / total * 100, np.where(np.isnan(total), np.nan, 0.0))
+
+
+def macd(close, fast=12, slow=26, signal=9, adjust=True):
+    dif = ema(close, span=fast, adjust=adjust) - ema(close, span=slow, adjust=adjust)
+    return dif, ema(dif, span=signal, adjust=adjust)
+
+
+# KD 指標：RSV 取 9 日高低區間，K、D 為 com=2 的指數平滑
+def kd(high, low, close, window=9, com=2):
+    low_min = rolling_min(low, window)
+    high_max = rolling_max(high, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsv = (np.asarray(close, dtype=float) - low_min) / (high_max - low_min) * 100
+    k = ema(rsv, com=com)
+    return k, ema(k, com=com)
+
+
+# ====================================
+#           模型特徵組合
+# ====================================
+
+# PCA 模型特徵，最後一軸依 PCA_FEATURES 排列
+def pca_features(close, high, low, volume):
+    k, d = kd(high, low, close)
+    return np.stack([
+        rsi(close),
+        sma(close, 5),
+        sma(close, 10),
+        sma(close, 20),
+        macd(close)[0],
+        rolling_std(close, 20),
+        np.asarray(volume, dtype=float),
+        k,
+        d,
+    ], axis=-1)
+
+
+# XGBoost 模型特徵，最後一軸依 XGB_FEATURES 排列
+def xgb_features(close, volume):
+    dif, signal = macd(close, adjust=False)
+    return np.stack([
+        np.asarray(volume, dtype=float),
+        sma(close, 20),
+        sma(close, 60),
+        dif,
+        signal,
+    ], axis=-1)
+
+
+def pca_feature_frame(data):
+    values = pca_features(data["Close"].to_numpy(), data["High"].to_numpy(),
+                          data["Low"].to_numpy(), data["Volume"].to_numpy())
+    return pd.DataFrame(values, index=data.index, columns=PCA_FEATURES)
+
+
+def xgb_feature_frame(data):
+    values = xgb_features(data["Close"].to_numpy(), data["Volume"].to_numpy())
+    return pd.DataFrame(values, index=data.index, columns=XGB_FEATURES)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# ====================================
+#     離線基準測試用的合成資料
+# ====================================
+# 全部以固定種子產生，相同參數每次得到完全相同的資料；日期錨定在固定日，不依賴今天。
+
+AS_OF = pd.Timestamp("2024-12-31")
+
+
+# 幾何布朗運動日線 OHLCV，欄位與 datasource.store 回傳的格式相同
+def ohlcv(n_days=720, seed=0, spot=100.0, sigma=0.02):
+    rng = np.random.default_rng(seed)
+    close = spot * np.exp(np.cumsum(rng.normal(0.0003, sigma, n_days)))
+    open_ = close * np.exp(rng.normal(0, sigma / 4, n_days))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, sigma / 2, n_days)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, sigma / 2, n_days)))
+    volume = rng.lognormal(15, 0.5, n_days).round()
+    index = pd.bdate_range(end=AS_OF, periods=n_days, name="Date")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+
+# 多檔標的：{symbol: OHLCV}
+def watchlist(n_symbols=50, n_days=180, seed=0):
+    return {f"SYM{i:03d}": ohlcv(n_days, seed=seed + i) for i in range(n_symbols)}
+
+
+# yfinance 格式的期權曲面（買權、賣權合併，含 type / expiry / dte），價格由 Black-Scholes 加微笑曲線產生
+def option_chain(n_strikes=100, n_expiries=8, seed=0, spot=100.0):
+    from analysis import pricing
+
+    rng = np.random.default_rng(seed)
+    strikes = np.round(np.linspace(spot * 0.5, spot * 1.5, n_strikes), 2)
+    dtes = np.unique(np.geomspace(3, 720, n_expiries).astype(int))
+    frames = []
+    for dte in dtes:
+        expiry = (AS_OF + pd.Timedelta(days=int(dte))).strftime("%Y-%m-%d")
+        for kind in ("Call", "Put"):
+            moneyness = np.log(strikes / spot)
+            iv = 0.25 + 0.4 * moneyness ** 2 - 0.1 * moneyness + rng.normal(0, 0.01, n_strikes)
+            price = pricing.bs_price(spot, strikes, dte / 365, iv, kind == "Call")
+            spread = np.maximum(price * 0.05, 0.01)
+            frames.append(pd.DataFrame({
+                "contractSymbol": [f"SYN{expiry.replace('-', '')}{kind[0]}{int(k * 1000):08d}" for k in strikes],
+                "strike": strikes,
+                "lastPrice": np.maximum(price + rng.normal(0, spread / 2), 0.01),
+                "bid": np.maximum(price - spread / 2, 0),
+                "ask": price + spread / 2,
+                "volume": rng.negative_binomial(1, 0.002, n_strikes).astype(float),
+                "openInterest": rng.negative_binomial(1, 0.0005, n_strikes).astype(float),
+                "impliedVolatility": np.where(rng.random(n_strikes) < 0.05, np.nan, iv),
+                "type": kind,
+                "expiry": expiry,
+                "dte": int(dte),
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# 資產負債表欄位（yfinance 目前的名稱，夾雜其他科目），供欄位對應測試
+BALANCE_ITEMS = [
+    "Total Assets", "Total Liabilities Net Minority Interest", "Stockholders Equity",
+    "Total Equity Gross Minority Interest", "Current Assets", "Current Liabilities",
+    "Cash And Cash Equivalents", "Accounts Receivable", "Inventory", "Net PPE", "Goodwill",
+    "Long Term Debt", "Current Debt", "Accounts Payable", "Retained Earnings", "Common Stock",
+    "Treasury Shares Number", "Working Capital", "Invested Capital", "Tangible Book Value",
+]
+
+
+# 科目 × 期間的財報表；數值跨越個位數到千億，涵蓋 億 / 萬 / 無單位三種格式
+def statement(n_items=len(BALANCE_ITEMS), n_periods=20, seed=0):
+    rng = np.random.default_rng(seed)
+    items = (BALANCE_ITEMS + [f"Other Item {i}" for i in range(n_items)])[:n_items]
+    values = rng.normal(0, 1, (n_items, n_periods)) * 10.0 ** rng.integers(0, 12, (n_items, n_periods))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    periods = pd.date_range(end=AS_OF, periods=n_periods, freq="QE")[::-1]
+    return pd.DataFrame(values, index=items, columns=periods)
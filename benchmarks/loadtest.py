@@ -0,0 +1,293 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import settings
+from settings import ROOT_DIR, cache_path
+
+# ====================================
+#     多 session 壓力測試
+# ====================================
+#   python -m benchmarks.loadtest --record                    # 連網跑一次所有情境，錄下供應商回應
+#   python -m benchmarks.loadtest --sessions 8 --iterations 3 # 以錄製資料重播，不連網
+#   python -m benchmarks.loadtest --sessions 16 --only pca options --latency 0
+#
+# 每個 session 是一個獨立行程，以 Streamlit AppTest 執行 Launcher.py，依情境輸入代碼、切換選項、
+# 按下按鈕；每次 rerun 為一個延遲樣本。所有 session 共用同一個本機快取目錄與錄製資料。
+# 模型交給背景工作佇列時，另記一個「done」樣本：從按下按鈕到結果出現的時間。
+# 報告各情境與整體的 p50 / p95 / p99 延遲、錯誤數，以及所有行程合計與單一行程的 RSS 峰值。
+# 預設使用全新的暫存快取目錄，第一輪即包含下載與寫入快取的成本；--warm 則沿用 .cache/。
+
+# 情境：(頁面, [每次 rerun 前要做的操作])；操作為 (元件種類, 標籤, 值)，值中的 {symbol} 會被替換。
+# 開啟頁面本身為第 0 步，不必列出
+SCENARIOS = {
+    "home": ("首頁", []),
+    "statements": ("基本分析", [
+        [("text_input", "輸入股票代碼 (如 AAPL)", "{symbol}")],
+        [("button", "產出報表", None)],
+    ]),
+    "pca": ("技術分析", [
+        [("text_input", "輸入股票代碼 (如 AAPL)", "{symbol}")],
+        [("button", "開始分析", None)],
+    ]),
+    "xgboost": ("技術分析", [
+        [("text_input", "輸入股票代碼 (如 AAPL)", "{symbol}"), ("selectbox", "選擇模型", "XGBOOST Model")],
+        [("button", "開始分析", None)],
+    ]),
+    "screener": ("技術分析", [
+        [("selectbox", "選擇模型", "PCA Screener")],
+        [("button", "開始分析", None)],
+    ]),
+    "montecarlo": ("技術分析", [
+        [("text_input", "輸入股票代碼 (如 AAPL)", "{symbol}"), ("selectbox", "選擇模型", "Monte Carlo")],
+        [("select_slider", "路徑數", 100_000), ("button", "開始模擬", None)],
+    ]),
+    "options": ("籌碼分析", [
+        [("text_input", "請輸入股票代碼（如 AAPL）", "{symbol}")],
+        [("button", "開始分析", None)],
+    ]),
+    "isolation": ("籌碼分析", [
+        [("text_input", "請輸入股票代碼（如 AAPL）", "{symbol}")],
+        [("selectbox", "選擇模型", "Isolation Forest Model")],
+        [("button", "開始分析", None)],
+    ]),
+}
+
+SYMBOLS = ("AAPL", "MSFT", "NVDA")
+POLL_SECONDS = 0.2
+
+
+def _widget(at, kind, label):
+    for widget in getattr(at, kind):
+        if widget.label == label:
+            return widget
+    # 附上頁面的警告 / 錯誤訊息，方便判斷是資料問題還是情境設定錯誤
+    notes = [e.value for e in list(at.warning) + list(at.error)]
+    raise LookupError(f"頁面上找不到 {kind}「{label}」" + (f"（{'；'.join(notes)}）" if notes else ""))
+
+
+def _apply(at, kind, label, value):
+    widget = _widget(at, kind, label)
+    if kind == "button":
+        widget.click()
+    elif kind == "text_input":
+        widget.input(value)
+    elif kind == "selectbox":
+        widget.select(value)
+    else:
+        widget.set_value(value)
+
+
+# 執行一個情境，回傳每次 rerun 的 (步驟, 毫秒, 錯誤訊息)
+def run_scenario(name, symbol, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    page, steps = SCENARIOS[name]
+    at = AppTest.from_file(os.path.join(ROOT_DIR, "Launcher.py"), default_timeout=timeout)
+    at.query_params["page"] = page
+    samples = []
+    for step, actions in enumerate([[]] + steps):
+        try:
+            for kind, label, value in actions:
+                _apply(at, kind, label, value.format(symbol=symbol) if isinstance(value, str) else value)
+            started = time.perf_counter()
+            at.run()
+            elapsed = (time.perf_counter() - started) * 1000
+            error = "; ".join(e.message for e in at.exception) or None
+        except Exception as e:
+            elapsed, error = None, f"{type(e).__name__}: {e}"
+        samples.append((step, elapsed, error))
+        if error:
+            break
+    # 模型在背景工作佇列執行時頁面只顯示進度條；持續 rerun 直到結果出現，記為「完成」步驟
+    if samples and not samples[-1][2] and at.get("progress"):
+        started = time.perf_counter()
+        while at.get("progress") and time.perf_counter() - started < timeout:
+            time.sleep(POLL_SECONDS)
+            at.run()
+        error = "; ".join(e.message for e in at.exception) or (None if not at.get("progress") else "等待背景工作逾時")
+        samples.append(("done", (time.perf_counter() - started) * 1000 + samples[-1][1], error))
+    return samples
+
+
+def _rss(pid):
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _maxrss():
+    try:
+        import resource
+    except ImportError:
+        return _rss(os.getpid())
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+# 以獨立執行緒定期取樣本行程加上各 session 行程的 RSS 總和
+class RssSampler:
+    def __init__(self, pids=lambda: (), interval=0.05):
+        self.pids = pids
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def current(self):
+        return sum(_rss(pid) for pid in {os.getpid(), *self.pids()})
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# 一個 session 行程：先以首頁暖身（載入 streamlit 等套件，不計時），再依隨機順序跑完各情境
+def _session(index, scenarios, iterations, seed, timeout):
+    rng = random.Random(seed + index)
+    run_scenario("home", SYMBOLS[0], timeout)
+    results = []
+    for _ in range(iterations):
+        order = list(scenarios)
+        rng.shuffle(order)
+        for name in order:
+            symbol = rng.choice(SYMBOLS)
+            for step, elapsed, error in run_scenario(name, symbol, timeout):
+                results.append({"session": index, "scenario": name, "symbol": symbol, "step": step,
+                                "ms": elapsed, "error": error})
+    from analysis import pools
+    pools.shutdown()
+    return results, _maxrss()
+
+
+def _percentiles(values):
+    if not values:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"n": len(values), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "max_ms": float(max(values))}
+
+
+def _stats(rows):
+    return {**_percentiles([s["ms"] for s in rows if s["ms"] is not None and not s["error"]]),
+            "errors": sum(1 for s in rows if s["error"])}
+
+
+# 頁面 rerun 延遲與背景工作完成時間分開統計（後者以「情境:done」列出）
+def summarize(samples):
+    report = {}
+    for name in dict.fromkeys(s["scenario"] for s in samples):
+        report[name] = _stats([s for s in samples if s["scenario"] == name and s["step"] != "done"])
+        done = [s for s in samples if s["scenario"] == name and s["step"] == "done"]
+        if done:
+            report[f"{name}:done"] = _stats(done)
+    report["all"] = _stats([s for s in samples if s["step"] != "done"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多 session 壓力測試（錄製 / 重播供應商回應）")
+    parser.add_argument("--record", action="store_true", help="連網執行一次所有情境並錄下供應商回應")
+    parser.add_argument("--sessions", type=int, default=4, help="同時執行的 session 數")
+    parser.add_argument("--iterations", type=int, default=2, help="每個 session 重複所有情境的次數")
+    parser.add_argument("--only", nargs="*", choices=SCENARIOS, help="只執行指定情境")
+    parser.add_argument("--tapes", help="錄製資料目錄，預設為 .cache/tapes/")
+    parser.add_argument("--latency", type=float, default=1.0, help="重播延遲倍率（錄製時耗時 × 倍率，0 為立即回應）")
+    parser.add_argument("--warm", action="store_true", help="沿用現有的本機快取，而非全新的暫存目錄")
+    parser.add_argument("--timeout", type=float, default=120, help="單次 rerun 的逾時秒數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="結果 JSON 路徑，預設為 .cache/benchmarks/loadtest-<時間>.json")
+    args = parser.parse_args(argv)
+
+    scenarios = args.only or list(SCENARIOS)
+    tapes = os.path.abspath(args.tapes or os.path.dirname(cache_path("tapes", "index.jsonl")))
+    out = args.out or cache_path("benchmarks", f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    # 供應商在第一次使用時才建立，於此之前設定模式即可
+    os.environ["OIAST_PROVIDER_MODE"] = "record" if args.record else "replay"
+    os.environ["OIAST_TAPE_DIR"] = tapes
+    os.environ["OIAST_REPLAY_LATENCY"] = str(args.latency)
+    if not args.warm:
+        # 子行程由環境變數取得同一個快取目錄，如同多個 worker 共用一份本機快取
+        os.environ["OIAST_CACHE_DIR"] = settings.CACHE_DIR = tempfile.mkdtemp(prefix="oiast-loadtest-")
+
+    if args.record:
+        sessions, iterations = 1, 1
+        print(f"錄製模式：依序執行 {len(scenarios)} 個情境 × {len(SYMBOLS)} 檔標的 → {tapes}")
+    else:
+        sessions, iterations = args.sessions, args.iterations
+        print(f"重播模式：{sessions} 個 session × {iterations} 輪，延遲倍率 {args.latency}（{tapes}）")
+
+    started = time.perf_counter()
+    if args.record:
+        # 每檔標的、每個情境都從空快取開始錄，批次下載才會包含全部標的，重播時任何快取狀態都找得到紀錄
+        samples = []
+        with RssSampler() as rss:
+            for symbol in SYMBOLS:
+                for name in scenarios:
+                    settings.CACHE_DIR = tempfile.mkdtemp(prefix="oiast-record-")
+                    samples += [{"session": 0, "scenario": name, "symbol": symbol, "step": step, "ms": elapsed,
+                                 "error": error} for step, elapsed, error in run_scenario(name, symbol, args.timeout)]
+        process_rss = [_maxrss()]
+    else:
+        # AppTest 會改動全域的 Runtime 狀態，同一行程內無法同時執行多個，因此每個 session 一個行程
+        with ProcessPoolExecutor(max_workers=sessions, mp_context=multiprocessing.get_context("spawn")) as pool:
+            with RssSampler(lambda: list(pool._processes or ())) as rss:
+                futures = [pool.submit(_session, i, scenarios, iterations, args.seed, args.timeout)
+                           for i in range(sessions)]
+                results = [f.result() for f in futures]
+        samples = [row for rows, _ in results for row in rows]
+        process_rss = [peak for _, peak in results]
+    wall = time.perf_counter() - started
+
+    report = summarize(samples)
+    print(f"\n{'情境':<16}{'n':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'錯誤':>6}   (ms)")
+    for name, stats in report.items():
+        if stats["n"]:
+            print(f"{name:<16}{stats['n']:>5}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+                  f"{stats['p99_ms']:>10.0f}{stats['max_ms']:>10.0f}{stats['errors']:>6}")
+        else:
+            print(f"{name:<16}{0:>5}{'':>40}{stats['errors']:>6}")
+    print(f"\n總耗時 {wall:.1f} s，{len(samples)} 次 rerun，RSS 峰值合計 {rss.peak / 2 ** 20:.0f} MB，"
+          f"單一 session 行程最高 {max(process_rss) / 2 ** 20:.0f} MB")
+    for error in dict.fromkeys(s["error"] for s in samples if s["error"]):
+        print(f"  !! {error}")
+
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"mode": os.environ["OIAST_PROVIDER_MODE"], "sessions": sessions, "iterations": iterations,
+                   "latency": args.latency, "wall_s": wall, "peak_rss_bytes": rss.peak,
+                   "process_peak_rss_bytes": process_rss, "summary": report,
+                   "samples": samples, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                  f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {out}")
+    return 1 if report["all"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import fixtures
+import settings
+from settings import ROOT_DIR, cache_path
+
+# ====================================
+#     離線基準測試
+# ====================================
+#   python -m benchmarks.run                          # small，結果寫入 .cache/benchmarks/
+#   python -m benchmarks.run --size medium --only "model.*" --repeat 10
+#   python -m benchmarks.run --compare .cache/benchmarks/<舊結果>.json
+#
+# 每個項目先執行一次暖身，再計時 repeat 次，記錄最小值與中位數（毫秒）。
+# 所有資料皆由 benchmarks.fixtures 以固定種子產生，不連網；
+# 執行期間快取目錄指向暫存目錄，欄位對應記錄、模型等不會寫入正式快取（結果 JSON 仍寫入 .cache/benchmarks/）。
+
+SIZES = {
+    "small": {"days": 720, "strikes": 60, "expiries": 4, "symbols": 20, "items": 20, "periods": 8, "paths": 20_000},
+    "medium": {"days": 2520, "strikes": 150, "expiries": 12, "symbols": 100, "items": 60, "periods": 20,
+               "paths": 100_000},
+    "large": {"days": 10_000, "strikes": 300, "expiries": 30, "symbols": 500, "items": 200, "periods": 40,
+              "paths": 1_000_000},
+}
+
+BENCHMARKS = {}
+
+
+# 註冊基準項目：setup(size) 準備資料並回傳要計時的無參數函數
+def bench(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@bench("indicators.pca_features")
+def _(size):
+    from analysis import technical
+    data = fixtures.ohlcv(size["days"])
+    return lambda: technical.pca_feature_frame(data)
+
+
+@bench("indicators.xgb_features")
+def _(size):
+    from analysis import technical
+    data = fixtures.ohlcv(size["days"])
+    return lambda: technical.xgb_feature_frame(data)
+
+
+# 串流指標：觀察清單暖身後，每次計時一根新 K 棒的更新
+@bench("indicators.streaming_update")
+def _(size):
+    from analysis import streaming
+    frames = fixtures.watchlist(size["symbols"])
+    close, high, low, volume = (np.column_stack([df[col].to_numpy() for df in frames.values()])
+                                for col in ("Close", "High", "Low", "Volume"))
+    features = streaming.PCAFeatures()
+    features.warm(close[:-1], high[:-1], low[:-1], volume[:-1])
+    return lambda: features.update(close[-1], high[-1], low[-1], volume[-1])
+
+
+@bench("model.pca_fit")
+def _(size):
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+    from analysis import technical
+    features = technical.pca_feature_frame(fixtures.ohlcv(size["days"])).dropna()
+    return lambda: PCA(n_components=2).fit_transform(StandardScaler().fit_transform(features))
+
+
+def _xgb_dataset(size):
+    from analysis import technical
+    data = fixtures.ohlcv(size["days"])
+    df = technical.xgb_feature_frame(data)
+    future_avg_5 = data["Close"].shift(-4).rolling(window=5).mean()
+    df["target"] = (future_avg_5 > data["Close"]).astype(int)
+    df = df.dropna()
+    return df[technical.XGB_FEATURES], df["target"]
+
+
+@bench("model.xgb_fit")
+def _(size):
+    from xgboost import XGBClassifier
+    X, y = _xgb_dataset(size)
+    return lambda: XGBClassifier(eval_metric="logloss", n_jobs=1).fit(X, y)
+
+
+@bench("model.isolation_forest")
+def _(size):
+    from sklearn.ensemble import IsolationForest
+    chain = fixtures.option_chain(size["strikes"], size["expiries"])
+    chain = chain[(chain["volume"] > 0) & chain["impliedVolatility"].notna()]
+    features = chain[["volume", "impliedVolatility", "strike", "dte"]]
+
+    def run():
+        model = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+        model.fit(features)
+        return model.predict(features)
+    return run
+
+
+@bench("screener.build_panel")
+def _(size):
+    from analysis import screener
+    frames = fixtures.watchlist(size["symbols"])
+    return lambda: screener.build_panel(frames)
+
+
+@bench("fields.resolve_cold")
+def _(size):
+    from analysis import fields
+    columns = list(fixtures.statement(size["items"]).index)
+    # 直接呼叫比對本體，不經過記憶化
+    return lambda: fields._match(columns, fields.BALANCE_FIELDS)
+
+
+@bench("fields.resolve_warm")
+def _(size):
+    from analysis import fields
+    columns = list(fixtures.statement(size["items"]).index)
+    fields.resolve(columns)
+    return lambda: fields.resolve(columns)
+
+
+@bench("format.format_frame")
+def _(size):
+    import formatting
+    df = fixtures.statement(size["items"], size["periods"])
+    return lambda: formatting.format_frame(df)
+
+
+# 財報頁交給 st.dataframe 的數值表與欄位格式
+@bench("format.table")
+def _(size):
+    import formatting
+    formatted = formatting.format_frame(fixtures.statement(size["items"], size["periods"]))
+    return formatted.table
+
+
+# 對照組：原本逐格呼叫 Python 函數的寫法
+@bench("format.per_cell_baseline")
+def _(size):
+    df = fixtures.statement(size["items"], size["periods"])
+
+    def format_number(x):
+        if not np.isfinite(x):
+            return ""
+        if abs(x) >= 1e8:
+            return f"{x / 1e8:,.1f} 億"
+        if abs(x) >= 1e4:
+            return f"{x / 1e4:,.0f} 萬"
+        return f"{x:,.0f}"
+    return lambda: df.map(format_number)
+
+
+@bench("options.pivot")
+def _(size):
+    chain = fixtures.option_chain(size["strikes"], size["expiries"])
+    data = chain[["strike", "volume", "impliedVolatility", "type", "lastPrice"]].dropna()
+    return lambda: data.pivot_table(index="strike", columns="type", values="volume", aggfunc="sum", fill_value=0)
+
+
+@bench("options.price_chain")
+def _(size):
+    from analysis import pricing
+    chain = fixtures.option_chain(size["strikes"], size["expiries"])
+    return lambda: pricing.price_chain(chain, 100.0)
+
+
+def _draw_heatmap(fig, pivot_vol):
+    import seaborn as sns
+    ax = fig.subplots()
+    sns.heatmap(pivot_vol, cmap="YlGnBu", cbar_kws={"label": "Volume"}, ax=ax)
+
+
+def _pivot(size):
+    chain = fixtures.option_chain(size["strikes"], 1)
+    return chain.pivot_table(index="strike", columns="type", values="volume", aggfunc="sum", fill_value=0)
+
+
+@bench("render.heatmap_miss")
+def _(size):
+    import rendering
+    pivot = _pivot(size)
+
+    def run():
+        rendering.cache = rendering.RenderCache()
+        return rendering.render(_draw_heatmap, pivot)
+    return run
+
+
+@bench("render.heatmap_hit")
+def _(size):
+    import rendering
+    pivot = _pivot(size)
+    rendering.render(_draw_heatmap, pivot)
+    return lambda: rendering.render(_draw_heatmap, pivot)
+
+
+@bench("probability.simulate")
+def _(size):
+    from analysis import probability
+    close = fixtures.ohlcv(size["days"])["Close"].to_numpy()
+    return lambda: probability.simulate(close, horizon=20, n_paths=size["paths"], levels=[90, 110], workers=1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import pandas as pd
+    return {"python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+            "pandas": pd.__version__, "commit": _git_commit()}
+
+
+def measure(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"min_ms": min(times), "median_ms": float(np.median(times)), "repeat": repeat}
+
+
+def run(size_name="small", repeat=5, only=None):
+    size = SIZES[size_name]
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if only and not any(fnmatch.fnmatch(name, pattern) for pattern in only):
+            continue
+        results[name] = measure(setup(size), repeat)
+        print(f"{name:<28} min {results[name]['min_ms']:10.2f} ms   median {results[name]['median_ms']:10.2f} ms",
+              flush=True)
+    return {"size": size_name, "params": size, "environment": _environment(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+
+
+# 與舊結果比較中位數，> 1 表示變慢
+def compare(report, baseline):
+    print(f"\n對照 {baseline.get('environment', {}).get('commit')}（{baseline.get('size')}）")
+    for name, result in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old:
+            ratio = result["median_ms"] / old["median_ms"]
+            print(f"{name:<28} {old['median_ms']:10.2f} → {result['median_ms']:10.2f} ms   ×{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線基準測試")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="只執行符合的項目（萬用字元，例如 'model.*'）")
+    parser.add_argument("--out", help="結果 JSON 路徑，預設為 .cache/benchmarks/<時間>-<commit>-<size>.json")
+    parser.add_argument("--compare", help="要比較的舊結果 JSON")
+    parser.add_argument("--list", action="store_true", help="列出所有項目")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    results_dir = os.path.dirname(cache_path("benchmarks", "report.json"))
+    # 子行程（行程池）由環境變數取得同一個暫存快取目錄
+    os.environ["OIAST_CACHE_DIR"] = settings.CACHE_DIR = tempfile.mkdtemp(prefix="oiast-bench-")
+    report = run(args.size, args.repeat, args.only)
+    out = args.out or os.path.join(results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-"
+                                                f"{report['environment']['commit'] or 'nogit'}-{args.size}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已寫入 {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
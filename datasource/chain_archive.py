@@ -0,0 +1,127 @@
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import tracing
+from settings import cache_path
+
+# 期權鏈快照目錄：chains/<provider>/<symbol>/expiry=<到期日>/date=<擷取日>/part-*.parquet
+# 不同資料來源的 IV 定義、報價時間不同，分開存放，百分位只在同一來源內比較
+# 每次呼叫時才由 cache_path 解析，壓力測試、基準測試改用暫存快取目錄時不會寫入正式快取
+# 同一標的、到期日在此分鐘數內只保留一份快照，避免每次 rerun 都寫檔
+SNAPSHOT_MINUTES = float(os.environ.get("OIAST_CHAIN_SNAPSHOT_MINUTES", 30))
+
+_dictionary = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("contractSymbol", _dictionary),
+    ("type", _dictionary),
+    ("strike", pa.float32()),
+    ("lastPrice", pa.float32()),
+    ("bid", pa.float32()),
+    ("ask", pa.float32()),
+    ("volume", pa.float32()),
+    ("openInterest", pa.float32()),
+    ("impliedVolatility", pa.float32()),
+    ("captured_at", pa.timestamp("s")),
+])
+
+_PARTITIONING = ds.partitioning(pa.schema([("expiry", pa.string()), ("date", pa.string())]), flavor="hive")
+
+
+def _symbol_dir(symbol, provider):
+    return cache_path("chains", provider, symbol.upper())
+
+
+def _compact(frame, captured):
+    df = pd.DataFrame(index=range(len(frame)))
+    for field in SCHEMA:
+        name = field.name
+        if name == "captured_at":
+            df[name] = captured
+        elif name in frame.columns:
+            values = frame[name].to_numpy()
+            df[name] = values if pa.types.is_dictionary(field.type) else pd.to_numeric(values, errors="coerce")
+        else:
+            df[name] = None
+    df["type"] = df["type"].astype(str).str.capitalize()
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def _recent(partition):
+    if not os.path.isdir(partition):
+        return False
+    mtimes = [os.path.getmtime(os.path.join(partition, f)) for f in os.listdir(partition) if f.startswith("part-")]
+    return bool(mtimes) and time.time() - max(mtimes) < SNAPSHOT_MINUTES * 60
+
+
+# 將一份期權鏈（需含 type 欄位）追加寫入封存；回傳是否有寫入
+def record(symbol, expiry, frame, captured=None, force=False, provider="yahoo"):
+    if frame is None or frame.empty:
+        return False
+    captured = pd.Timestamp(captured or pd.Timestamp.now()).floor("s")
+    partition = os.path.join(_symbol_dir(symbol, provider), f"expiry={expiry}", f"date={captured.date()}")
+    if not force and _recent(partition):
+        return False
+
+    os.makedirs(partition, exist_ok=True)
+    name = f"part-{captured:%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    # 先寫成底線開頭的暫存檔（讀取端會忽略），完成後再改名
+    tmp = os.path.join(partition, "_" + name)
+    pq.write_table(_compact(frame, captured), tmp)
+    os.replace(tmp, os.path.join(partition, name))
+    return True
+
+
+# 以 memory map 讀取封存，可依到期日、擷取日期區間與欄位切片
+@tracing.traced(stage="fetch", record=True)
+def load(symbol, expiry=None, start=None, end=None, columns=None, provider="yahoo"):
+    path = _symbol_dir(symbol, provider)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=[f.name for f in SCHEMA] + ["expiry", "date"])
+
+    dataset = ds.dataset(path, schema=SCHEMA.append(pa.field("expiry", pa.string())).append(pa.field("date", pa.string())),
+                         format="parquet", partitioning=_PARTITIONING,
+                         filesystem=pafs.LocalFileSystem(use_mmap=True))
+    condition = None
+    for expr in (
+        ds.field("expiry") == str(expiry) if expiry is not None else None,
+        ds.field("date") >= str(pd.Timestamp(start).date()) if start is not None else None,
+        ds.field("date") <= str(pd.Timestamp(end).date()) if end is not None else None,
+    ):
+        if expr is not None:
+            condition = expr if condition is None else condition & expr
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+# 以歷史快照計算目前每個合約（type, strike）的 IV 百分位與成交量 Z 分數
+def overlay(current, history):
+    if history.empty:
+        return current.assign(iv_percentile=float("nan"), volume_z=float("nan"), history_days=0)
+
+    # 每天只取最後一份快照；履約價以 float32 封存，比對前兩邊都四捨五入到小數三位
+    daily = (history.sort_values("captured_at")
+             .drop_duplicates(["date", "type", "strike"], keep="last")
+             .astype({"type": str, "strike": "float64", "impliedVolatility": "float64", "volume": "float64"}))
+    daily["strike"] = daily["strike"].round(3)
+    now = current.assign(type=current["type"].astype(str).str.capitalize(), strike=current["strike"].astype("float64").round(3))
+    keys = ["type", "strike"]
+
+    merged = daily.merge(now[keys + ["impliedVolatility"]], on=keys, suffixes=("", "_now"))
+    grouped = merged.assign(below=merged["impliedVolatility"] <= merged["impliedVolatility_now"]).groupby(keys)
+    stats = pd.DataFrame({
+        "iv_percentile": grouped["below"].mean() * 100,
+        "volume_mean": daily.groupby(keys)["volume"].mean(),
+        "volume_std": daily.groupby(keys)["volume"].std(),
+        "history_days": daily.groupby(keys)["date"].nunique(),
+    })
+
+    out = now.merge(stats.reset_index(), on=keys, how="left")
+    out["volume_z"] = (out["volume"] - out["volume_mean"]) / out["volume_std"].where(out["volume_std"] > 0)
+    out["history_days"] = out["history_days"].fillna(0).astype(int)
+    return out.drop(columns=["volume_mean", "volume_std"])
@@ -0,0 +1,69 @@
+import logging
+
+import pandas as pd
+
+import tracing
+from datasource import chain_archive, providers
+
+log = logging.getLogger(__name__)
+
+
+@tracing.traced(stage="fetch")
+def expirations(symbol):
+    return providers.yahoo().options(symbol)
+
+
+def _archive(symbol, expiry, chain):
+    try:
+        chain_archive.record(symbol, expiry, _stack(chain))
+    except Exception:
+        # 封存失敗（磁碟已滿、欄位型別不符等）不影響頁面，但要留下紀錄
+        log.exception("期權鏈快照封存失敗：%s %s", symbol, expiry)
+
+
+# 每次抓到的期權鏈都寫入快照封存，供日後比較 IV 與成交量分布
+def fetch_chain(symbol, expiry):
+    with tracing.span("chains.fetch_chain", "fetch", expiry=expiry) as s:
+        chain = providers.yahoo().option_chain(symbol, expiry)
+        s.record(chain.calls)
+        s.record(chain.puts)
+    _archive(symbol, expiry, chain)
+    return chain
+
+
+def _stack(chain):
+    return pd.concat([
+        chain.calls.assign(type="Call"),
+        chain.puts.assign(type="Put"),
+    ], ignore_index=True)
+
+
+# 單一到期日的買權、賣權合併成一張表，附上 type / expiry / dte 欄位
+def chain_frame(symbol, expiry, chain=None):
+    df = _stack(chain or fetch_chain(symbol, expiry))
+    df["expiry"] = expiry
+    df["dte"] = max((pd.Timestamp(expiry) - pd.Timestamp.today().normalize()).days, 0)
+    return df
+
+
+# 所有到期日同時送出（並行數與速率由 Yahoo 供應商統一控管），堆疊成整個期權曲面
+@tracing.traced(stage="fetch", record=True)
+def fetch_surface(symbol):
+    expiries = list(expirations(symbol))
+    if not expiries:
+        return pd.DataFrame()
+
+    yahoo = providers.yahoo()
+    chains = yahoo.gather([yahoo.option_chain_async(symbol, expiry) for expiry in expiries])
+    frames = []
+    for expiry, chain in zip(expiries, chains):
+        # 單一到期日失敗時略過，其餘到期日照常回傳
+        if isinstance(chain, Exception):
+            continue
+        _archive(symbol, expiry, chain)
+        frame = chain_frame(symbol, expiry, chain)
+        if not frame.empty:
+            frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+import tracing
+from datasource import providers
+from settings import cache_path
+
+# 各報表對應的 yfinance 屬性（年度, 季度）
+STATEMENTS = {
+    "income": ("financials", "quarterly_financials"),
+    "balance": ("balance_sheet", "quarterly_balance_sheet"),
+    "cashflow": ("cashflow", "quarterly_cashflow"),
+}
+
+# 最新一期之後多久才可能出現下一期：期間長度 + 申報期限
+PERIOD_MONTHS = {"annual": 12, "quarterly": 3}
+FILING_LAG_DAYS = {"annual": 90, "quarterly": 45}
+# 進入可能公布新財報的時段後，最多每隔此秒數重新確認一次
+RECHECK_SECONDS = int(os.environ.get("OIAST_FUNDAMENTALS_RECHECK", 24 * 60 * 60))
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(symbol, freq):
+    with _locks_guard:
+        return _locks.setdefault((symbol, freq), threading.Lock())
+
+
+def _base(symbol, freq):
+    return cache_path("fundamentals", re.sub(r"[^\w^.=-]", "_", symbol), freq)
+
+
+def _fetch_all(symbol, freq):
+    column = 0 if freq == "annual" else 1
+    # 三張報表同時抓取，任一張失敗即整批視為失敗
+    yahoo = providers.yahoo()
+    results = yahoo.gather([yahoo.attribute_async(symbol, attrs[column]) for attrs in STATEMENTS.values()])
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return dict(zip(STATEMENTS, results))
+
+
+def _latest_period(frames):
+    periods = [pd.Timestamp(c) for df in frames.values() if df is not None for c in df.columns]
+    return max(periods) if periods else None
+
+
+def _load(symbol, freq):
+    base = _base(symbol, freq)
+    if not os.path.exists(base + ".json"):
+        return None, {}
+    with open(base + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    frames = {}
+    for name in STATEMENTS:
+        path = f"{base}_{name}.parquet"
+        # 以「期間 × 科目」存放，讀回後轉置成與 yfinance 相同的「科目 × 期間」
+        frames[name] = pd.read_parquet(path).T if os.path.exists(path) else pd.DataFrame()
+    return frames, meta
+
+
+def _save(symbol, freq, frames, meta):
+    base = _base(symbol, freq)
+    for name, df in frames.items():
+        if df is None or df.empty:
+            # 這次抓到的報表是空的：移除上一份，避免讀回過期資料
+            if os.path.exists(f"{base}_{name}.parquet"):
+                os.remove(f"{base}_{name}.parquet")
+            continue
+        table = df.T.apply(pd.to_numeric, errors="coerce")
+        table.columns = table.columns.astype(str)
+        table.to_parquet(f"{base}_{name}.parquet.tmp")
+        os.replace(f"{base}_{name}.parquet.tmp", f"{base}_{name}.parquet")
+    with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(base + ".json.tmp", base + ".json")
+
+
+# 新一期財報在時間上尚不可能公布時不重抓；之後每 RECHECK_SECONDS 確認一次
+def _due(meta, freq):
+    latest = meta.get("latest_period")
+    if latest is None:
+        return time.time() - meta.get("checked", 0) >= RECHECK_SECONDS
+    expected = (pd.Timestamp(latest) + pd.DateOffset(months=PERIOD_MONTHS[freq])
+                + pd.Timedelta(days=FILING_LAG_DAYS[freq]))
+    if pd.Timestamp.now() < expected:
+        return False
+    return time.time() - meta.get("checked", 0) >= RECHECK_SECONDS
+
+
+# 取得三大報表 {"income", "balance", "cashflow"}，格式同 yfinance（科目 × 期間，新到舊）
+@tracing.traced(stage="fetch", record=True)
+def get_statements(symbol, quarterly=False):
+    symbol = symbol.upper()
+    freq = "quarterly" if quarterly else "annual"
+    with _lock_for(symbol, freq):
+        frames, meta = _load(symbol, freq)
+        if frames is not None and not _due(meta, freq):
+            return frames
+
+        try:
+            fresh = _fetch_all(symbol, freq)
+        except Exception:
+            if frames is not None:
+                return frames
+            raise
+
+        if not any(df is not None and not df.empty for df in fresh.values()):
+            if frames is not None:
+                meta["checked"] = time.time()
+                _save(symbol, freq, {}, meta)
+                return frames
+            return {name: pd.DataFrame() for name in STATEMENTS}
+
+        latest = _latest_period(fresh)
+        _save(symbol, freq, fresh, {"latest_period": str(latest) if latest is not None else None,
+                                    "checked": time.time()})
+        return _load(symbol, freq)[0]
+
+
+def get_statement(symbol, name, quarterly=False):
+    return get_statements(symbol, quarterly)[name]
@@ -0,0 +1,266 @@
+import logging
+import math
+import os
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from datasource import store
+
+# ====================================
+#     盤中串流：1 分 K 環狀緩衝區與即時重取樣
+# ====================================
+# 每個標的一個固定容量的 1 分 K 環狀緩衝區（OIAST_INTRADAY_MINUTES，預設 5 個交易日），
+# 新標的先下載足以填滿緩衝區的天數（yfinance 1 分 K 最多 7 天），
+# 之後背景執行緒每 OIAST_INTRADAY_REFRESH 秒批次下載所有觀察中標的「上次最後一根之後」的分 K 寫入緩衝區，
+# 不再每次重抓整個交易日；超過 OIAST_INTRADAY_IDLE 秒沒有 session 查看的標的停止更新並釋放緩衝區。
+# 5 / 15 / 60 分 K 在每根分 K 寫入時就地累加（開高低收量），不必每次 resample 整段；
+# 最後一根分 K 未收盤前會被下次輪詢修正，此時只重算它所屬的那一根聚合 K 棒。
+# 時間以交易所當地時間自午夜對齊，切法與 df.resample(f"{n}min") 相同。
+#   feed = intraday.get_feed()
+#   feed.frame("AAPL", 15)        # 15 分 K 的 OHLCV 快照 DataFrame，可直接交給 technical.pca_feature_frame
+
+CAPACITY = int(os.environ.get("OIAST_INTRADAY_MINUTES", 390 * 5))
+REFRESH_SECONDS = float(os.environ.get("OIAST_INTRADAY_REFRESH", 60))
+IDLE_SECONDS = float(os.environ.get("OIAST_INTRADAY_IDLE", 1800))
+RESOLUTIONS = (1, 5, 15, 60)
+# 一個交易日 390 根分 K；首次載入的天數依緩衝區容量
+INITIAL_PERIOD = f"{min(7, max(1, -(-CAPACITY // 390)))}d"
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+MINUTE_NS = 60 * 10**9
+
+log = logging.getLogger(__name__)
+
+
+class BarRing:
+    __slots__ = ("capacity", "time", "bars", "head", "count")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # 每筆同時寫在 i 與 i + capacity：最近 capacity 筆永遠是一段連續區間，取用時直接回傳 view
+        self.time = np.zeros(2 * capacity, dtype=np.int64)
+        self.bars = np.full((2 * capacity, len(FIELDS)), np.nan)
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def last_time(self):
+        return int(self.time[self.head - 1 + self.capacity]) if self.count else None
+
+    def last(self):
+        return self.bars[self.head - 1 + self.capacity]
+
+    def _write(self, i, t, bar):
+        self.time[i] = self.time[i + self.capacity] = t
+        self.bars[i] = self.bars[i + self.capacity] = bar
+
+    def append(self, t, bar):
+        self._write(self.head, t, bar)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def replace_last(self, bar):
+        i = (self.head - 1) % self.capacity
+        self._write(i, self.time[i], bar)
+
+    # 依時間排序的最近 n 筆（預設全部）：(時間 int64 ns, OHLCV 二維陣列)，皆為唯讀 view
+    def view(self, n=None):
+        n = self.count if n is None else min(n, self.count)
+        end = self.head + self.capacity
+        times, bars = self.time[end - n:end], self.bars[end - n:end]
+        times.flags.writeable = bars.flags.writeable = False
+        return times, bars
+
+
+# 把 bar 併入聚合 K 棒 agg（NaN 略過，與 resample 的 first / max / min / last / sum 相同）
+def _merge(agg, bar):
+    open_, high, low, close, volume = (float(v) for v in agg)
+    return (bar[0] if math.isnan(open_) else open_,
+            float(np.fmax(high, bar[1])),
+            float(np.fmin(low, bar[2])),
+            close if math.isnan(bar[3]) else bar[3],
+            (0.0 if math.isnan(volume) else volume) + (0.0 if math.isnan(bar[4]) else bar[4]))
+
+
+class Resampler:
+    __slots__ = ("minutes", "step", "ring")
+
+    def __init__(self, minutes, capacity):
+        self.minutes = minutes
+        self.step = minutes * MINUTE_NS
+        self.ring = BarRing(capacity)
+
+    def add(self, t, bar):
+        bucket = t - t % self.step
+        if self.ring.count and self.ring.last_time == bucket:
+            self.ring.replace_last(_merge(self.ring.last(), bar))
+        else:
+            self.ring.append(bucket, bar)
+
+    # 最後一根分 K 被修正：由分 K 緩衝區尾端（最多 minutes 根）重算目前這根聚合 K 棒
+    def rebuild(self, minute_ring):
+        times, bars = minute_ring.view(self.minutes)
+        bucket = times[-1] - times[-1] % self.step
+        part = bars[int(np.searchsorted(times, bucket)):]
+        opens, closes = part[:, 0][~np.isnan(part[:, 0])], part[:, 3][~np.isnan(part[:, 3])]
+        with np.errstate(invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            self.ring.replace_last((opens[0] if len(opens) else np.nan, np.nanmax(part[:, 1]),
+                                    np.nanmin(part[:, 2]), closes[-1] if len(closes) else np.nan,
+                                    np.nansum(part[:, 4])))
+
+
+class IntradayBook:
+    def __init__(self, symbol, capacity=CAPACITY, resolutions=RESOLUTIONS):
+        self.symbol = symbol
+        self.tz = None
+        self.minutes = BarRing(capacity)
+        self.resampled = {n: Resampler(n, capacity // n + 1) for n in resolutions if n > 1}
+        self._lock = threading.Lock()
+
+    # 寫入下載到的分 K（store.normalize 後的 DataFrame），回傳新增的根數；早於最後一根的重複資料略過
+    def ingest(self, df):
+        if df.empty:
+            return 0
+        index = df.index
+        if index.tz is not None:
+            self.tz = index.tz
+            index = index.tz_localize(None)
+        times = index.as_unit("ns").asi8
+        bars = df.reindex(columns=FIELDS).to_numpy(dtype=float)
+        added = 0
+        with self._lock:
+            for t, bar in zip(times, bars):
+                last = self.minutes.last_time
+                if last is not None and t < last:
+                    continue
+                if t == last:
+                    self.minutes.replace_last(bar)
+                    for resampler in self.resampled.values():
+                        resampler.rebuild(self.minutes)
+                else:
+                    self.minutes.append(t, bar)
+                    for resampler in self.resampled.values():
+                        resampler.add(t, bar)
+                    added += 1
+        return added
+
+    # 最後一根分 K 的時間（交易所時區），尚無資料時為 None
+    @property
+    def last_time(self):
+        last = self.minutes.last_time
+        if last is None:
+            return None
+        stamp = pd.Timestamp(last)
+        return stamp.tz_localize(self.tz) if self.tz is not None else stamp
+
+    def _ring(self, minutes):
+        if minutes == 1:
+            return self.minutes
+        if minutes not in self.resampled:
+            raise ValueError(f"不支援的分 K 週期：{minutes}（可用 {RESOLUTIONS}）")
+        return self.resampled[minutes].ring
+
+    # 指定週期的 OHLCV 快照；緩衝區會被背景執行緒持續寫入，因此複製一份交給呼叫端
+    def frame(self, minutes=1):
+        with self._lock:
+            times, bars = self._ring(minutes).view()
+            index = pd.DatetimeIndex(times.copy().view("datetime64[ns]"), name="Date")
+            df = pd.DataFrame(bars.copy(), index=index, columns=FIELDS)
+        if self.tz is not None:
+            df.index = df.index.tz_localize(self.tz)
+        return df
+
+
+class IntradayFeed:
+    def __init__(self, refresh_seconds=REFRESH_SECONDS, capacity=CAPACITY, idle_seconds=IDLE_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.books = {}
+        # 各標的最近一次被查看的時間（monotonic）
+        self.seen = {}
+        self.updated = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._thread = None
+
+    # 加入觀察；新標的先同步載入當日分 K，之後由背景執行緒更新
+    def watch(self, symbols):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        with self._lock:
+            new = [s for s in symbols if s not in self.books]
+            for symbol in new:
+                self.books[symbol] = IntradayBook(symbol, self.capacity)
+            now = time.monotonic()
+            self.seen.update((s, now) for s in symbols)
+            books = [self.books[s] for s in symbols]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="intraday-feed", daemon=True)
+                self._thread.start()
+        if new:
+            self.poll(new)
+        return books
+
+    # 停止更新閒置的標的；回傳移除的標的
+    def evict(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [s for s, t in self.seen.items() if t < cutoff]
+            for symbol in idle:
+                del self.seen[symbol]
+                self.books.pop(symbol, None)
+        return idle
+
+    # 批次下載：尚無資料的標的抓 INITIAL_PERIOD 整段，其餘只抓所有標的中最早的最後一根之後
+    def poll(self, symbols=None):
+        with self._poll_lock:
+            with self._lock:
+                books = [self.books[s] for s in (symbols or list(self.books)) if s in self.books]
+            empty = {b.symbol: b for b in books if b.last_time is None}
+            loaded = [b for b in books if b.last_time is not None]
+            added = 0
+            if empty:
+                for symbol, df in store._download_many(list(empty), "1m", period=INITIAL_PERIOD).items():
+                    added += empty[symbol].ingest(df)
+            if loaded:
+                start = min(b.last_time for b in loaded)
+                fresh = store._download_many([b.symbol for b in loaded], "1m", start=start)
+                for book in loaded:
+                    if book.symbol in fresh:
+                        added += book.ingest(fresh[book.symbol])
+            self.updated = time.time()
+            return added
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.evict()
+                self.poll()
+            except Exception:
+                log.exception("盤中分 K 更新失敗")
+
+    def frame(self, symbol, minutes=1):
+        book, = self.watch(symbol)
+        return book.frame(minutes)
+
+
+_feed = None
+_feed_guard = threading.Lock()
+
+
+# 整個行程共用一個更新器，所有 session 觀察的標的合併成一次批次下載
+def get_feed():
+    global _feed
+    with _feed_guard:
+        if _feed is None:
+            _feed = IntradayFeed()
+        return _feed
@@ -0,0 +1,343 @@
+import asyncio
+import atexit
+import functools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# ====================================
+#     資料供應商存取層
+# ====================================
+# 所有對外請求都經由這裡：每個供應商有自己的並行上限、token bucket 限速與帶抖動的重試。
+# 請求在單一背景 event loop 上執行，連線池與限速狀態跨 Streamlit rerun / session 共用。
+# Finnhub 走 aiohttp（keep-alive 連線池）；Yahoo 透過 yfinance，阻塞呼叫在專屬執行緒池中執行。
+# 相同的請求（同一供應商、操作與參數）同時有多個 session 發出時只送出一次（single-flight），
+# 其餘呼叫端等待同一次抓取的結果；OIAST_SINGLE_FLIGHT=0 可關閉。
+
+RETRIES = int(os.environ.get("OIAST_PROVIDER_RETRIES", 3))
+BACKOFF_SECONDS = float(os.environ.get("OIAST_PROVIDER_BACKOFF", 0.5))
+TIMEOUT_SECONDS = float(os.environ.get("OIAST_PROVIDER_TIMEOUT", 30))
+SINGLE_FLIGHT = os.environ.get("OIAST_SINGLE_FLIGHT", "1") != "0"
+
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Token bucket：平均每秒 rate 個請求，最多累積 burst 個；只在 event loop 執行緒內使用
+class TokenBucket:
+    __slots__ = ("rate", "burst", "_tokens", "_stamp")
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_loop = None
+_loop_thread = None
+_loop_guard = threading.Lock()
+
+
+def _get_loop():
+    global _loop, _loop_thread
+    with _loop_guard:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="provider-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+# 在背景 event loop 上執行 coroutine 並等待結果（供同步的 Streamlit 程式呼叫）
+def run(coro):
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("providers.run() 不可在 provider event loop 內呼叫")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+# single-flight 的鍵：操作名稱加上所有參數
+def request_key(op, *args, **kwargs):
+    return repr((op, args, sorted(kwargs.items())))
+
+
+# 共用結果分給等待者時，pandas 物件各給一份淺複本（copy-on-write，呼叫端就地修改不會互相影響）；
+# option_chain 這類由 DataFrame 組成的 namedtuple 逐欄處理，JSON 回應視為唯讀直接共用
+def _private(value):
+    if hasattr(value, "_asdict"):
+        return type(value)(*(_private(v) for v in value))
+    if isinstance(value, SimpleNamespace):
+        return SimpleNamespace(**{k: _private(v) for k, v in vars(value).items()})
+    if type(value).__module__.startswith("pandas"):
+        return value.copy(deep=False)
+    return value
+
+
+class Provider:
+    # 視為暫時性錯誤而重試的例外
+    retry_on = (RetryableError, asyncio.TimeoutError, OSError)
+
+    def __init__(self, name, concurrency, rate, burst, retries=RETRIES, backoff=BACKOFF_SECONDS,
+                 timeout=TIMEOUT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._semaphore = None
+        self._bucket = None
+        # 進行中的請求 {key: Task}，只在 event loop 執行緒內存取
+        self._inflight = {}
+        self.fetches = 0
+        self.coalesced = 0
+
+    def _limits(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._bucket = TokenBucket(self.rate, self.burst)
+        return self._semaphore, self._bucket
+
+    # 指數退避加 full jitter；供應商給了 Retry-After 時以其為下限
+    def _delay(self, attempt, error):
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        retry_after = getattr(error, "retry_after", None)
+        return max(delay, retry_after) if retry_after else delay
+
+    async def _with_retry(self, attempt_fn):
+        semaphore, bucket = self._limits()
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    await bucket.acquire()
+                    return await attempt_fn()
+            except self.retry_on as error:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self._delay(attempt, error))
+
+    # 相同 key 的請求進行中時不另外送出，等待同一次抓取（成功或失敗）的結果；key 為 None 時照常送出
+    async def single_flight(self, key, factory):
+        if key is None or not SINGLE_FLIGHT:
+            return await factory()
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(functools.partial(self._landed, key))
+            self.fetches += 1
+            # shield：某個呼叫端逾時或取消時，不影響其他等待同一結果的呼叫端
+            return await asyncio.shield(task)
+        self.coalesced += 1
+        return _private(await asyncio.shield(task))
+
+    def _landed(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已取消時，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    # 同時送出多個請求（仍受並行上限與限速約束）；失敗的項目回傳例外物件而非中斷整批
+    def gather(self, coros):
+        async def _all():
+            return await asyncio.gather(*coros, return_exceptions=True)
+        return run(_all())
+
+
+class HttpProvider(Provider):
+    def __init__(self, name, base_url, concurrency, rate, burst, auth_params=None, **kwargs):
+        super().__init__(name, concurrency, rate, burst, **kwargs)
+        self.base_url = base_url.rstrip("/")
+        self.auth_params = auth_params or (lambda: {})
+        # recorder(path, params, body, elapsed)：錄製模式下收到每個成功回應時呼叫（見 datasource/tape.py）
+        self.recorder = None
+        self._session = None
+        import aiohttp
+        self.retry_on = Provider.retry_on + (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError)
+
+    # 指向本機替身伺服器（見 datasource/standin.py）或其他相容端點
+    def configure(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    async def _get_session(self):
+        import aiohttp
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def get_json_async(self, path, **params):
+        return await self.single_flight(request_key(path, **params), lambda: self._get_json(path, params))
+
+    async def _get_json(self, path, params):
+        session = await self._get_session()
+
+        async def attempt():
+            query = {**self.auth_params(), **params}
+            started = time.perf_counter()
+            async with session.get(self.base_url + path, params=query) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    retry_after = resp.headers.get("Retry-After")
+                    raise RetryableError(f"{self.name} HTTP {resp.status}",
+                                         float(retry_after) if retry_after and retry_after.isdigit() else None)
+                resp.raise_for_status()
+                body = await resp.json()
+            if self.recorder is not None:
+                self.recorder(path, params, body, time.perf_counter() - started)
+            return body
+
+        return await self._with_retry(attempt)
+
+    def get_json(self, path, **params):
+        return run(self.get_json_async(path, **params))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class BlockingProvider(Provider):
+    # backend 為實際呼叫的函式庫模組，可替換成本機替身
+    def __init__(self, name, backend, concurrency, rate, burst, retry_on=(), **kwargs):
+        super().__init__(name, concurrency, rate, burst, **kwargs)
+        self.backend = backend
+        self.retry_on = Provider.retry_on + tuple(retry_on)
+        # 逾時的呼叫無法中斷，多留一倍執行緒避免卡住後續請求
+        self._executor = ThreadPoolExecutor(max_workers=concurrency * 2, thread_name_prefix=f"{name}-io")
+
+    async def call_async(self, fn, *args, key=None, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        async def attempt():
+            future = loop.run_in_executor(self._executor, lambda: fn(self.backend, *args, **kwargs))
+            return await asyncio.wait_for(future, self.timeout)
+
+        return await self.single_flight(key, lambda: self._with_retry(attempt))
+
+    # fn(backend, *args) 在供應商執行緒池中執行，受限速與重試保護；指定 key 時相同請求只送出一次
+    def call(self, fn, *args, key=None, **kwargs):
+        return run(self.call_async(fn, *args, key=key, **kwargs))
+
+
+class YahooProvider(BlockingProvider):
+    def download(self, tickers, **kwargs):
+        return self.call(lambda yf: yf.download(tickers, **kwargs), key=request_key("download", tickers, **kwargs))
+
+    def options(self, symbol):
+        return self.call(lambda yf: yf.Ticker(symbol).options, key=request_key("options", symbol))
+
+    def option_chain_async(self, symbol, expiry):
+        return self.call_async(lambda yf: yf.Ticker(symbol).option_chain(expiry),
+                               key=request_key("option_chain", symbol, expiry))
+
+    def option_chain(self, symbol, expiry):
+        return run(self.option_chain_async(symbol, expiry))
+
+    def history(self, symbol, **kwargs):
+        return self.call(lambda yf: yf.Ticker(symbol).history(**kwargs), key=request_key("history", symbol, **kwargs))
+
+    # 財報等 Ticker 屬性，例如 "balance_sheet"、"quarterly_financials"
+    def attribute_async(self, symbol, attr):
+        return self.call_async(lambda yf: getattr(yf.Ticker(symbol), attr), key=request_key("attribute", symbol, attr))
+
+
+class FinnhubProvider(HttpProvider):
+    def option_chain_async(self, symbol):
+        return self.get_json_async("/stock/option-chain", symbol=symbol)
+
+    def quote_async(self, symbol):
+        return self.get_json_async("/quote", symbol=symbol)
+
+    def option_chain(self, symbol):
+        return run(self.option_chain_async(symbol))
+
+    def quote(self, symbol):
+        return run(self.quote_async(symbol))
+
+
+def _yahoo():
+    import yfinance
+    from yfinance.exceptions import YFRateLimitError
+    return YahooProvider(
+        "yahoo", yfinance,
+        concurrency=int(os.environ.get("OIAST_YAHOO_CONCURRENCY", 8)),
+        rate=float(os.environ.get("OIAST_YAHOO_RATE", 4)),
+        burst=int(os.environ.get("OIAST_YAHOO_BURST", 8)),
+        retry_on=(YFRateLimitError,),
+    )
+
+
+def _finnhub():
+    # 免費方案每分鐘 60 次
+    return FinnhubProvider(
+        "finnhub", os.environ.get("OIAST_FINNHUB_URL", "https://finnhub.io/api/v1"),
+        concurrency=int(os.environ.get("OIAST_FINNHUB_CONCURRENCY", 4)),
+        rate=float(os.environ.get("OIAST_FINNHUB_RATE", 1)),
+        burst=int(os.environ.get("OIAST_FINNHUB_BURST", 5)),
+        auth_params=lambda: {"token": os.environ.get("FINNHUB_API_KEY", "")},
+    )
+
+
+_providers = {}
+_providers_guard = threading.Lock()
+_factories = {"yahoo": _yahoo, "finnhub": _finnhub}
+
+
+# 取得（行程內唯一的）供應商物件
+def get(name):
+    with _providers_guard:
+        provider = _providers.get(name)
+        if provider is None:
+            provider = _providers[name] = _factories[name]()
+            # 錄製 / 重播模式（OIAST_PROVIDER_MODE）
+            if os.environ.get("OIAST_PROVIDER_MODE", "live").lower() != "live":
+                from datasource import tape
+                tape.attach(provider)
+        return provider
+
+
+# 行程結束前關閉 HTTP 連線池
+@atexit.register
+def _shutdown():
+    for provider in list(_providers.values()):
+        if isinstance(provider, HttpProvider) and _loop is not None:
+            try:
+                run(provider.close())
+            except Exception:
+                pass
+
+
+# 各供應商的實際抓取次數、被合併（等待他人抓取結果）的請求數與目前進行中的請求數
+def stats():
+    with _providers_guard:
+        providers = dict(_providers)
+    return {name: {"fetches": p.fetches, "coalesced": p.coalesced, "inflight": len(p._inflight)}
+            for name, p in providers.items()}
+
+
+def yahoo():
+    return get("yahoo")
+
+
+def finnhub():
+    return get("finnhub")
@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from datasource import providers
+
+log = logging.getLogger(__name__)
+
+# 背景更新間隔（秒），所有 session 共用同一份快照
+REFRESH_SECONDS = float(os.environ.get("OIAST_QUOTE_REFRESH", 30))
+
+
+# 由分 K 計算現價與最近一根的漲跌，與首頁原本的算法相同
+def _summarize(close):
+    close = close.dropna()
+    if close.empty:
+        return None
+    current = float(close.iloc[-1])
+    previous = float(close.iloc[-2]) if len(close) > 1 else current
+    change = current - previous
+    pct_change = (change / previous) * 100 if previous != 0 else 0
+    return {"price": current, "change": change, "pct_change": pct_change, "time": close.index[-1]}
+
+
+class QuoteService:
+    def __init__(self, symbols, refresh_seconds=REFRESH_SECONDS):
+        self.symbols = list(symbols)
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = {}
+        self._updated = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quote-refresher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # 所有指數一次批次下載
+    def refresh(self):
+        df = providers.yahoo().download(self.symbols, period="1d", interval="1m", group_by="ticker",
+                                        progress=False, threads=True)
+        snapshot = {}
+        if df is not None and not df.empty:
+            for symbol in self.symbols:
+                if isinstance(df.columns, pd.MultiIndex):
+                    if symbol not in df.columns.get_level_values(0):
+                        continue
+                    close = df[symbol]["Close"]
+                else:
+                    close = df["Close"]
+                quote = _summarize(close)
+                if quote:
+                    snapshot[symbol] = quote
+        with self._lock:
+            # 抓取失敗的標的沿用上一份快照
+            self._snapshot = {**self._snapshot, **snapshot}
+            self._updated = time.time()
+        self._ready.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                # 更新失敗時沿用上一份快照，下一輪再試，但要留下紀錄
+                log.exception("即時報價更新失敗：%s", ", ".join(self.symbols))
+                self._ready.set()
+            time.sleep(self.refresh_seconds)
+
+    # 回傳 (快照, 更新時間)；第一次呼叫最多等待 timeout 秒讓首輪資料就緒
+    def snapshot(self, timeout=10):
+        self._ready.wait(timeout)
+        with self._lock:
+            return dict(self._snapshot), self._updated
+
+
+_services = {}
+_services_guard = threading.Lock()
+
+
+# 同一組標的在整個行程內只會有一個背景更新器
+def get_service(symbols, refresh_seconds=REFRESH_SECONDS):
+    key = tuple(symbols)
+    with _services_guard:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = QuoteService(key, refresh_seconds).start()
+        return service
@@ -0,0 +1,79 @@
+import inspect
+from contextlib import contextmanager
+
+from datasource import providers
+
+# ====================================
+#     本機替身供應商（離線測試 / 壓力測試用）
+# ====================================
+# HTTP 供應商：routes 為 {路徑: handler(query dict) -> JSON 物件 或 (狀態碼, JSON 物件)}，handler 也可以是 async 函數，
+# 在 provider event loop 上以 aiohttp.web 於 127.0.0.1 的隨機埠啟動。
+# 阻塞式供應商（Yahoo）：直接把 backend 換成提供相同介面（download / Ticker）的物件。
+
+
+class StandInServer:
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        self._runner = None
+        self.base_url = None
+
+    def _handler(self, handler):
+        from aiohttp import web
+
+        async def handle(request):
+            query = dict(request.query)
+            self.requests.append((request.path, query))
+            result = handler(query)
+            if inspect.isawaitable(result):
+                result = await result
+            status, body = result if isinstance(result, tuple) else (200, result)
+            return web.json_response(body, status=status)
+        return handle
+
+    async def _start(self):
+        from aiohttp import web
+        app = web.Application()
+        for path, handler in self.routes.items():
+            app.router.add_get(path, self._handler(handler))
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    def start(self):
+        return providers.run(self._start())
+
+    def stop(self):
+        if self._runner is not None:
+            providers.run(self._runner.cleanup())
+            self._runner = None
+
+
+# 讓指定的 HTTP 供應商在區塊內改打本機替身伺服器
+@contextmanager
+def serve(provider_name, routes):
+    provider = providers.get(provider_name)
+    server = StandInServer(routes)
+    original = provider.base_url
+    provider.configure(server.start())
+    try:
+        yield server
+    finally:
+        provider.configure(original)
+        server.stop()
+
+
+# 讓指定的阻塞式供應商在區塊內改用替身 backend
+@contextmanager
+def use_backend(provider_name, backend):
+    provider = providers.get(provider_name)
+    original = provider.backend
+    provider.backend = backend
+    try:
+        yield provider
+    finally:
+        provider.backend = original
@@ -0,0 +1,198 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+import pandas as pd
+
+import tracing
+from datasource import providers
+from settings import cache_path
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# 距離上次同步未滿此秒數就直接讀本機資料，不再詢問 Yahoo
+REFRESH_SECONDS = int(os.environ.get("OIAST_OHLCV_REFRESH", 15 * 60))
+INTRADAY_REFRESH_SECONDS = int(os.environ.get("OIAST_OHLCV_INTRADAY_REFRESH", 60))
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(symbol, interval):
+    with _locks_guard:
+        return _locks.setdefault((symbol, interval), threading.Lock())
+
+
+def _paths(symbol, interval):
+    name = re.sub(r"[^\w^.=-]", "_", f"{symbol}_{interval}")
+    base = cache_path("ohlcv", name)
+    return base + ".parquet", base + ".json"
+
+
+# 將 yfinance 的 period 字串（180d、2y、ytd、max）換算成起始日，max 回傳 None
+def period_start(period, now=None):
+    now = (now or pd.Timestamp.now()).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"無法解析的期間：{period}")
+    return now - pd.DateOffset(**{_PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _is_intraday(interval):
+    return interval.endswith("m") or interval.endswith("h")
+
+
+# 統一欄位：單層 OHLCV 欄位、依時間排序、去除重複時間戳
+def normalize(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df[[c for c in OHLCV_COLUMNS if c in df.columns]]
+    df = df.dropna(how="all")
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    df.index.name = "Date"
+    return df
+
+
+def _download(symbol, interval, period=None, start=None):
+    df = providers.yahoo().download(symbol, period=period, start=start, interval=interval, progress=False)
+    return normalize(df)
+
+
+# 多檔標的一次批次下載，回傳 {symbol: DataFrame}
+def _download_many(symbols, interval, period=None, start=None):
+    df = providers.yahoo().download(symbols, period=period, start=start, interval=interval,
+                                    group_by="ticker", progress=False, threads=True)
+    if df is None or df.empty:
+        return {}
+    if not isinstance(df.columns, pd.MultiIndex):
+        return {symbols[0]: normalize(df)}
+    tickers = df.columns.get_level_values(0)
+    return {s: normalize(df[s]) for s in symbols if s in tickers}
+
+
+def _merge(old, new):
+    if old.empty:
+        return new
+    if new.empty:
+        return old
+    merged = pd.concat([old, new])
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+def _slice(df, start):
+    if start is None or df.empty:
+        return df
+    if df.index.tz is not None:
+        start = start.tz_localize(df.index.tz)
+    return df[df.index >= start]
+
+
+def load(symbol, interval="1d"):
+    data_path, meta_path = _paths(symbol.upper(), interval)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return pd.DataFrame(columns=OHLCV_COLUMNS), {}
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return pd.read_parquet(data_path), meta
+
+
+def save(symbol, interval, df, meta):
+    data_path, meta_path = _paths(symbol.upper(), interval)
+    # 先寫暫存檔再置換，避免其他 session 讀到寫到一半的檔案
+    df.to_parquet(data_path + ".tmp")
+    os.replace(data_path + ".tmp", data_path)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _covers(meta, start):
+    covered_from = meta.get("covered_from")
+    if covered_from is None:
+        return False
+    if covered_from == "max":
+        return True
+    return start is not None and pd.Timestamp(covered_from) <= start
+
+
+# 取得 OHLCV：本機已涵蓋所需期間時只補抓最後一根之後的 K 棒
+@tracing.traced(stage="fetch", record=True)
+def fetch(symbol, period="180d", interval="1d"):
+    symbol = symbol.upper()
+    start = period_start(period)
+    refresh = INTRADAY_REFRESH_SECONDS if _is_intraday(interval) else REFRESH_SECONDS
+
+    with _lock_for(symbol, interval):
+        cached, meta = load(symbol, interval)
+
+        if cached.empty or not _covers(meta, start):
+            fresh = _download(symbol, interval, period=period)
+            if fresh.empty:
+                return _slice(cached, start)
+            data = _merge(cached, fresh)
+            meta = {"covered_from": "max" if start is None else str(start), "updated": time.time()}
+            save(symbol, interval, data, meta)
+            return _slice(data, start)
+
+        if time.time() - meta.get("updated", 0) < refresh:
+            return _slice(cached, start)
+
+        # 從最後一根（可能尚未收盤）開始補抓，覆蓋舊值後附加新 K 棒
+        fresh = _download(symbol, interval, start=cached.index[-1])
+        data = _merge(cached, fresh)
+        meta["updated"] = time.time()
+        save(symbol, interval, data, meta)
+        return _slice(data, start)
+
+
+# 批次版 fetch：缺資料的標的合併成一次完整下載，過期的標的合併成一次增量下載
+@tracing.traced(stage="fetch", record=True)
+def fetch_many(symbols, period="180d", interval="1d"):
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    start = period_start(period)
+    refresh = INTRADAY_REFRESH_SECONDS if _is_intraday(interval) else REFRESH_SECONDS
+
+    # 與 fetch 相同，讀取、合併、寫回期間持有各標的的鎖；依排序取得，多個批次同時執行也不會死結
+    with ExitStack() as locks:
+        for symbol in sorted(symbols):
+            locks.enter_context(_lock_for(symbol, interval))
+
+        now = time.time()
+        frames, metas, missing, stale = {}, {}, [], []
+        for symbol in symbols:
+            cached, meta = load(symbol, interval)
+            frames[symbol], metas[symbol] = cached, meta
+            if cached.empty or not _covers(meta, start):
+                missing.append(symbol)
+            elif now - meta.get("updated", 0) >= refresh:
+                stale.append(symbol)
+
+        covered = "max" if start is None else str(start)
+        if missing:
+            for symbol, fresh in _download_many(missing, interval, period=period).items():
+                if fresh.empty:
+                    continue
+                frames[symbol] = _merge(frames[symbol], fresh)
+                save(symbol, interval, frames[symbol], {"covered_from": covered, "updated": now})
+
+        if stale:
+            since = min(frames[s].index[-1] for s in stale)
+            downloaded = _download_many(stale, interval, start=since)
+            for symbol in stale:
+                frames[symbol] = _merge(frames[symbol], downloaded.get(symbol, pd.DataFrame()))
+                metas[symbol]["updated"] = now
+                save(symbol, interval, frames[symbol], metas[symbol])
+
+        return {s: _slice(frames[s], start) for s in symbols}
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from types import SimpleNamespace
+
+from datasource import providers
+from datasource.standin import StandInServer
+from settings import cache_path
+
+# ====================================
+#     供應商回應的錄製與重播
+# ====================================
+# OIAST_PROVIDER_MODE=record：照常連線，並把每個回應（yf.download、Ticker.history / option_chain /
+#   options / 財報屬性、Finnhub option-chain / quote）存成本機檔案。
+# OIAST_PROVIDER_MODE=replay：完全不連網，以錄下的回應作答；找不到對應紀錄時丟出 TapeMiss。
+# 錄製目錄為 OIAST_TAPE_DIR（預設 .cache/tapes/），每個供應商一個子目錄：
+#   index.jsonl 記錄呼叫內容與耗時，<sha1>.pkl 為回應本體（pickle，只應載入自己錄的檔案）。
+# 重播時依錄製當下的耗時 × OIAST_REPLAY_LATENCY（預設 1，0 表示立即回應）延遲，
+# Yahoo 直接替換 backend，Finnhub 則由本機替身伺服器回應，仍走完整的 HTTP 路徑。
+
+TAPE_DIR = os.environ.get("OIAST_TAPE_DIR")
+LATENCY = float(os.environ.get("OIAST_REPLAY_LATENCY", 1))
+
+# 會隨本機快取狀態改變的參數（增量下載的起點），完全相符找不到時忽略它們再找一次
+VOLATILE_PARAMS = ("start", "end")
+
+
+class TapeMiss(LookupError):
+    pass
+
+
+def _canonical(op, args, kwargs):
+    return json.dumps([op, list(args), sorted(kwargs.items())], ensure_ascii=False, default=str)
+
+
+# yfinance 的 option_chain 回傳函數內定義的 namedtuple，無法 pickle，改存成屬性相同的物件
+def _portable(value):
+    if hasattr(value, "_asdict"):
+        return SimpleNamespace(**value._asdict())
+    return value
+
+
+class Tape:
+    def __init__(self, directory=None):
+        self.directory = directory or TAPE_DIR or os.path.dirname(cache_path("tapes", "index.jsonl"))
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, provider):
+        path = os.path.join(self.directory, provider)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _entries(self, provider):
+        with self._lock:
+            entries = self._index.get(provider)
+            if entries is None:
+                entries = self._index[provider] = {}
+                index_path = os.path.join(self.directory, provider, "index.jsonl")
+                if os.path.exists(index_path):
+                    with open(index_path, encoding="utf-8") as f:
+                        for line in f:
+                            entry = json.loads(line)
+                            # 同一呼叫錄了多次時以最後一次為準
+                            entries[entry["key"]] = entries[entry["loose"]] = entry
+            return entries
+
+    def save(self, provider, op, args, kwargs, value, elapsed):
+        key = _canonical(op, args, kwargs)
+        loose = _canonical(op, args, {k: v for k, v in kwargs.items() if k not in VOLATILE_PARAMS})
+        name = hashlib.sha1(key.encode()).hexdigest() + ".pkl"
+        directory = self._dir(provider)
+        entry = {"key": key, "loose": loose, "file": name, "elapsed": elapsed, "recorded": time.time()}
+        with open(os.path.join(directory, name + ".tmp"), "wb") as f:
+            pickle.dump(_portable(value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(os.path.join(directory, name + ".tmp"), os.path.join(directory, name))
+        entries = self._entries(provider)
+        with self._lock:
+            with open(os.path.join(directory, "index.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            entries[key] = entries[loose] = entry
+
+    # 回傳 (回應, 錄製時耗時秒數)
+    def load(self, provider, op, args, kwargs):
+        entries = self._entries(provider)
+        entry = entries.get(_canonical(op, args, kwargs))
+        if entry is None:
+            entry = entries.get(_canonical(op, args, {k: v for k, v in kwargs.items() if k not in VOLATILE_PARAMS}))
+        if entry is None:
+            raise TapeMiss(f"{provider} 沒有錄製 {op}{tuple(args)} {kwargs}")
+        return self.read(provider, entry)
+
+    # 列出某個操作的所有紀錄：[(args, kwargs, entry)]
+    def entries(self, provider, op):
+        found = {}
+        for entry in self._entries(provider).values():
+            recorded_op, args, kwargs = json.loads(entry["key"])
+            if recorded_op == op:
+                found[entry["key"]] = (args, dict(kwargs), entry)
+        return list(found.values())
+
+    def read(self, provider, entry):
+        with open(os.path.join(self.directory, provider, entry["file"]), "rb") as f:
+            return pickle.load(f), entry["elapsed"]
+
+    def recorded(self, provider, op, args, kwargs, fn):
+        started = time.perf_counter()
+        value = fn()
+        self.save(provider, op, args, kwargs, value, time.perf_counter() - started)
+        return value
+
+
+# ---- Yahoo：與 yfinance 模組相同介面（download / Ticker）的 backend ----
+
+class _RecordingTicker:
+    def __init__(self, backend, tape, symbol):
+        self._ticker = backend.Ticker(symbol)
+        self._tape = tape
+        self._symbol = symbol
+
+    def __getattr__(self, name):
+        op = f"Ticker.{name}"
+        attr = getattr(type(self._ticker), name, None)
+        if callable(attr):
+            def method(*args, **kwargs):
+                return self._tape.recorded("yahoo", op, (self._symbol,) + args, kwargs,
+                                           lambda: getattr(self._ticker, name)(*args, **kwargs))
+            return method
+        return self._tape.recorded("yahoo", op, (self._symbol,), {}, lambda: getattr(self._ticker, name))
+
+
+class RecordingYahoo:
+    def __init__(self, backend, tape):
+        self._backend = backend
+        self._tape = tape
+
+    def download(self, tickers, **kwargs):
+        return self._tape.recorded("yahoo", "download", (tickers,), kwargs,
+                                   lambda: self._backend.download(tickers, **kwargs))
+
+    def Ticker(self, symbol):
+        return _RecordingTicker(self._backend, self._tape, symbol)
+
+
+class _ReplayTicker:
+    def __init__(self, replay, symbol):
+        self._replay = replay
+        self._symbol = symbol
+
+    def history(self, *args, **kwargs):
+        return self._replay.serve("Ticker.history", (self._symbol,) + args, kwargs)
+
+    def option_chain(self, *args, **kwargs):
+        return self._replay.serve("Ticker.option_chain", (self._symbol,) + args, kwargs)
+
+    def __getattr__(self, name):
+        return self._replay.serve(f"Ticker.{name}", (self._symbol,), {})
+
+
+class ReplayYahoo:
+    def __init__(self, tape, latency=LATENCY):
+        self._tape = tape
+        self.latency = latency
+
+    def serve(self, op, args, kwargs):
+        value, elapsed = self._tape.load("yahoo", op, args, kwargs)
+        if self.latency:
+            time.sleep(elapsed * self.latency)
+        return value
+
+    def download(self, tickers, **kwargs):
+        try:
+            return self.serve("download", (tickers,), kwargs)
+        except TapeMiss:
+            if isinstance(tickers, str):
+                raise
+            return self._download_subset(list(tickers), kwargs)
+
+    # 批次下載的標的組合取決於當下哪些標的已有本機快取，重播時改從涵蓋所需標的的批次紀錄中取出
+    def _download_subset(self, tickers, kwargs):
+        stable = {k: v for k, v in kwargs.items() if k not in VOLATILE_PARAMS}
+        for args, recorded_kwargs, entry in self._tape.entries("yahoo", "download"):
+            recorded = args[0] if isinstance(args[0], list) else [args[0]]
+            if set(tickers) <= set(recorded) and \
+                    {k: v for k, v in recorded_kwargs.items() if k not in VOLATILE_PARAMS} == stable:
+                df, elapsed = self._tape.read("yahoo", entry)
+                if self.latency:
+                    time.sleep(elapsed * self.latency)
+                level = 0 if kwargs.get("group_by") == "ticker" else 1
+                return df.loc[:, df.columns.get_level_values(level).isin(tickers)]
+        raise TapeMiss(f"yahoo 沒有涵蓋 {tickers} 的批次下載紀錄 {kwargs}")
+
+    def Ticker(self, symbol):
+        return _ReplayTicker(self, symbol)
+
+
+# ---- Finnhub：錄製 HTTP 回應，重播時由替身伺服器回應 ----
+
+def _http_recorder(tape, provider):
+    def record(path, params, body, elapsed):
+        tape.save(provider.name, path, (), _public(provider, params), body, elapsed)
+    return record
+
+
+# 驗證參數（API token）不納入紀錄
+def _public(provider, params):
+    secret = provider.auth_params()
+    return {k: v for k, v in params.items() if k not in secret}
+
+
+def _replay_routes(tape, provider, paths, latency):
+    def route(path):
+        async def handle(query):
+            try:
+                body, elapsed = tape.load(provider.name, path, (), _public(provider, query))
+            except TapeMiss as e:
+                return 404, {"error": str(e)}
+            if latency:
+                await asyncio.sleep(elapsed * latency)
+            return body
+        return handle
+    return {path: route(path) for path in paths}
+
+
+FINNHUB_PATHS = ("/stock/option-chain", "/quote")
+
+
+# 依模式替換供應商的 backend / 端點；由 providers.get 在建立供應商時呼叫，替身伺服器與行程同壽
+def attach(provider, mode=None, tape=None, latency=LATENCY):
+    mode = mode or os.environ.get("OIAST_PROVIDER_MODE", "live").lower()
+    if mode == "live":
+        return provider
+    tape = tape or Tape()
+    if mode == "record":
+        if isinstance(provider, providers.BlockingProvider):
+            provider.backend = RecordingYahoo(provider.backend, tape)
+        else:
+            provider.recorder = _http_recorder(tape, provider)
+    elif mode == "replay":
+        if isinstance(provider, providers.BlockingProvider):
+            provider.backend = ReplayYahoo(tape, latency)
+        else:
+            server = StandInServer(_replay_routes(tape, provider, FINNHUB_PATHS, latency))
+            provider.configure(server.start())
+    else:
+        raise ValueError(f"未知的 OIAST_PROVIDER_MODE：{mode}")
+    return provider
+
@@ -1,6 +1,8 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+from datasource import fundamentals
+import formatting
+import tracing
 
 key_items_balance = [
     "Total Assets",
@@ -20,18 +22,7 @@ key_items_cashflow = [
     "Financing Cash Flow"
 ]
 
-def format_number(x):
-    try:
-        if abs(x) >= 100000000:
-            return f"{x/100000000:,.1f} 億"
-        elif abs(x) >= 10000:
-            return f"{x/10000:,.0f} 萬"
-        else:
-            return f"{x:,.0f}"
-    except:
-        return x
-
-
+@tracing.traced()
 def launcher_1(symbol):
     period_type = st.radio(
         "選擇報表期間",
@@ -39,19 +30,12 @@ def launcher_1(symbol):
         horizontal=True
     )
     if st.button("產出報表"): 
-        ticker = yf.Ticker(symbol)
-        if period_type == "年度 (Yearly)":
-            fin_data = {
-                "Income Statement": ticker.financials,
-                "Balance Sheet": ticker.balance_sheet,
-                "Cash Flow": ticker.cashflow
-            }
-        else:
-            fin_data = {
-                "Income Statement": ticker.quarterly_financials,
-                "Balance Sheet": ticker.quarterly_balance_sheet,
-                "Cash Flow": ticker.quarterly_cashflow
-            }
+        statements = fundamentals.get_statements(symbol, quarterly=period_type != "年度 (Yearly)")
+        fin_data = {
+            "Income Statement": statements["income"],
+            "Balance Sheet": statements["balance"],
+            "Cash Flow": statements["cashflow"]
+        }
         df = pd.concat(fin_data.values()).T
         df_balance = df[key_items_balance].dropna(axis=0, how="all")
         df_revenue = df[key_items_revenue].dropna(axis=0, how="all")
@@ -69,21 +53,23 @@ def launcher_1(symbol):
                 column="Debt Ratio %",
                 value=total_liab_percentage
             )
-        df_formatted = df_balance.applymap(format_number)
-        df_formatted_2 = df_revenue.applymap(format_number)
-        df_formatted_3 = df_cashflow.applymap(format_number)
+        # 整張表一次向量化處理；表格內容仍為數值（依欄位單位縮放），點欄位標題依數值排序
+        with tracing.span("financial_statement.format", "compute") as s:
+            df_formatted = formatting.format_frame(s.record(df_balance))
+            df_formatted_2 = formatting.format_frame(s.record(df_revenue))
+            df_formatted_3 = formatting.format_frame(s.record(df_cashflow))
         if df_formatted.empty:
             st.warning("⚠️ 無法取得資料，可能是 Yahoo Finance 未提供。")
         else:
-            st.dataframe(df_formatted)
-            st.dataframe(df_formatted_2)
-            st.dataframe(df_formatted_3)
+            for formatted in (df_formatted, df_formatted_2, df_formatted_3):
+                data, config = formatted.table()
+                st.dataframe(data, column_config=config)
 
+@tracing.traced()
 def launcher_2(symbol):
     period_type = st.radio("選擇報表期間", ["年度 (Yearly)", "季度 (Quarterly)"], horizontal=True)
     if st.button("產出報表"):
-        ticker = yf.Ticker(symbol)
-        income = ticker.financials.T if period_type == "年度 (Yearly)" else ticker.quarterly_financials.T
+        income = fundamentals.get_statement(symbol, "income", quarterly=period_type != "年度 (Yearly)").T
 
         if "Gross Profit" in income.columns and "Total Revenue" in income.columns:
             income["Gross Margin (%)"] = (income["Gross Profit"] / income["Total Revenue"] * 100).round(2)
@@ -100,8 +86,6 @@ def launcher_2(symbol):
         else:
             st.warning("⚠️ 無法取得毛利或營收資料，無法計算毛利率。")
 
-        income = ticker.financials.T if period_type == "年度 (Yearly)" else ticker.quarterly_financials.T
-
         eps_col = None
         for col_name in ["Diluted EPS"]:
             if col_name in income.columns:
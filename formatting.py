@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# 數值縮寫規則：(門檻, 單位, 小數位數)，由大到小比對
+UNITS = [
+    (1e8, " 億", 1),
+    (1e4, " 萬", 0),
+    (1.0, "", 0),
+]
+
+
+_TEXT = np.dtypes.StringDType()
+_THRESHOLDS = np.array([threshold for threshold, _, _ in UNITS])
+_UNIT_TEXT = np.array([unit for _, unit, _ in UNITS], dtype=_TEXT)
+_FACTORS = np.array([10 ** decimals for _, _, decimals in UNITS], dtype=np.int64)
+
+
+# 非負整數轉成含千分位逗號的字串；只對 ≥ 1000 的子集合遞迴處理高位數
+def _int_text(ip):
+    text = ip.astype(_TEXT)
+    big = ip >= 1000
+    if big.any():
+        head = np.strings.add(_int_text(ip[big] // 1000), ",")
+        text[big] = np.strings.add(head, np.strings.zfill((ip[big] % 1000).astype(_TEXT), 3))
+    return text
+
+
+# 將整個數值陣列轉成「億 / 萬」縮寫字串：依量級決定每個元素的單位與小數位數，
+# 之後縮放、四捨五入、千分位、小數與單位各做一次陣列運算；NaN 顯示為空字串
+def format_numbers(values):
+    x = np.asarray(values, dtype=float)
+    out = np.full(x.shape, "", dtype=_TEXT)
+    finite = np.isfinite(x)
+    v = x[finite]
+    bucket = np.select([np.abs(v) >= threshold for threshold in _THRESHOLDS[:-1]],
+                       range(len(UNITS) - 1), len(UNITS) - 1)
+    factor = _FACTORS[bucket]
+    scaled = np.rint(np.abs(v) / _THRESHOLDS[bucket] * factor).astype(np.int64)
+    text = _int_text(scaled // factor)
+    for decimals in {d for _, _, d in UNITS if d}:
+        mask = factor == 10 ** decimals
+        if mask.any():
+            fraction = np.strings.zfill((scaled[mask] % factor[mask]).astype(_TEXT), decimals)
+            text[mask] = np.strings.add(np.strings.add(text[mask], "."), fraction)
+    text = np.strings.add(text, _UNIT_TEXT[bucket])
+    negative = v < 0
+    text[negative] = np.strings.add("-", text[negative])
+    out[finite] = text
+    return out.astype(object)
+
+
+def format_number(value):
+    return format_numbers([value])[0]
+
+
+# 原始數值與顯示字串並存：計算、畫圖用 values，文字表格用 display
+class FormattedFrame:
+    __slots__ = ("values", "display")
+
+    def __init__(self, values, display):
+        self.values = values
+        self.display = display
+
+    @property
+    def empty(self):
+        return self.values.empty
+
+    # 交給 st.dataframe 的 (資料, column_config)：每欄依最大絕對值選一個單位（億 / 萬 / 元），
+    # 資料以該單位縮放後仍是數值，點欄位標題依數值排序；單位與小數位數由 printf 格式顯示，沒有逐格的 Python 函數
+    def table(self):
+        import streamlit as st
+
+        values = self.values.to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            magnitude = np.nanmax(np.abs(np.where(np.isfinite(values), values, np.nan)), axis=0, initial=0.0)
+        bucket = np.select([magnitude >= threshold for threshold in _THRESHOLDS[:-1]],
+                           range(len(UNITS) - 1), len(UNITS) - 1)
+        scaled = pd.DataFrame(values / _THRESHOLDS[bucket], index=self.values.index, columns=self.values.columns)
+        config = {str(column): st.column_config.NumberColumn(format=f"%.{UNITS[b][2]}f{UNITS[b][1]}")
+                  for column, b in zip(self.values.columns, bucket)}
+        return scaled, config
+
+
+def format_frame(df):
+    numeric = all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes)
+    values = df if numeric else df.apply(pd.to_numeric, errors="coerce")
+    display = pd.DataFrame(format_numbers(values.to_numpy(dtype=float)), index=df.index, columns=df.columns,
+                           dtype=object)
+    return FormattedFrame(values, display)
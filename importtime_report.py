@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# ====================================
+#     冷啟動 import 時間報告
+# ====================================
+# 以全新的直譯器執行 `python -X importtime`，彙整各套件的累計載入時間。
+# 匯入 Launcher 會以 bare mode 執行首頁，其自身時間（self）即首頁腳本本體的耗時。
+#
+#   python importtime_report.py                      # 首頁冷啟動
+#   python importtime_report.py analysis.backtest --top 15 --json startup.json
+#
+# 首頁不應載入的重量級套件列在 FORBIDDEN；若被載入則以結束碼 1 回報，可放進 CI 追蹤回歸。
+# （plotly 由 streamlit 本身載入，無法避免，故不列入）
+
+FORBIDDEN = ("sklearn", "xgboost", "seaborn", "matplotlib", "scipy")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def measure(module):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    code = f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); import {module}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({"module": name, "depth": (len(indent) - 1) // 2,
+                            "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return proc.returncode, entries
+
+
+def summarize(module, entries, top):
+    target = next((e for e in reversed(entries) if e["module"] == module), None)
+    # 各頂層套件（如 pandas、sklearn）的累計時間，取其最外層的那次載入
+    packages = {}
+    for e in entries:
+        root = e["module"].split(".")[0]
+        if root == module.split(".")[0]:
+            continue
+        packages[root] = max(packages.get(root, 0), e["cumulative_ms"])
+    loaded = {e["module"].split(".")[0] for e in entries}
+    return {
+        "module": module,
+        "total_ms": target["cumulative_ms"] if target else None,
+        "self_ms": target["self_ms"] if target else None,
+        "packages": dict(sorted(packages.items(), key=lambda kv: -kv[1])[:top]),
+        "forbidden_loaded": sorted(loaded & set(FORBIDDEN)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="冷啟動 import 時間報告")
+    parser.add_argument("modules", nargs="*", default=["Launcher"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="將結果寫入 JSON 檔")
+    parser.add_argument("--allow-heavy", action="store_true", help="不檢查 FORBIDDEN 套件")
+    args = parser.parse_args(argv)
+
+    reports, failed = [], False
+    for module in args.modules:
+        returncode, entries = measure(module)
+        if returncode != 0 or not entries:
+            print(f"{module}: import 失敗（returncode={returncode}）")
+            failed = True
+            continue
+        report = summarize(module, entries, args.top)
+        reports.append(report)
+
+        print(f"== {module}: 總計 {report['total_ms']:.0f} ms（模組本身 {report['self_ms']:.0f} ms）")
+        for name, ms in report["packages"].items():
+            print(f"   {ms:9.1f} ms  {name}")
+        if report["forbidden_loaded"] and not args.allow_heavy:
+            print(f"   !! 冷啟動載入了重量級套件：{', '.join(report['forbidden_loaded'])}")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
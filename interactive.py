@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+import tracing
+
+# ====================================
+#     互動式 WebGL 圖表（Plotly）
+# ====================================
+# 樣式陣列一次以向量運算產生；點數超過上限時在伺服器端抽樣，
+# 異常點全部保留，只稀疏化一般點，瀏覽器端只需繪製上限內的點數。
+
+MAX_POINTS = int(os.environ.get("OIAST_PLOT_MAX_POINTS", 5000))
+
+
+# 回傳抽樣後的列位置（遞增）；keep 為必須保留的布林陣列
+def downsample(n, keep=None, max_points=MAX_POINTS, seed=0):
+    keep = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    if n <= max_points:
+        return np.arange(n)
+    kept = np.flatnonzero(keep)
+    others = np.flatnonzero(~keep)
+    budget = max(max_points - len(kept), 0)
+    if budget < len(others):
+        others = np.random.default_rng(seed).choice(others, size=budget, replace=False)
+    return np.sort(np.concatenate([kept, others]))
+
+
+def _is_call(df):
+    return df["type"].astype(str).str.lower().eq("call").to_numpy()
+
+
+def _hover(df, columns):
+    columns = [c for c in columns if c in df]
+    if not columns:
+        return None
+    text = df[columns[0]].astype(str)
+    for column in columns[1:]:
+        text = text + " " + df[column].astype(str)
+    return text.to_numpy()
+
+
+def _caption(shown, total):
+    import streamlit as st
+    if shown < total:
+        st.caption(f"顯示 {shown:,} / {total:,} 個合約（異常點全部保留，一般點抽樣）")
+
+
+# 3D 異常偵測散佈圖：需含 volume、impliedVolatility、strike、type、anomaly 欄位
+def anomalies_3d(df, title, max_points=MAX_POINTS):
+    import plotly.graph_objects as go
+
+    total = len(df)
+    anomaly = df["anomaly"].to_numpy() == -1
+    rows = downsample(total, anomaly, max_points)
+    df, anomaly = df.iloc[rows], anomaly[rows]
+    is_call = _is_call(df)
+    hover = _hover(df, ["contractSymbol", "expiry"])
+    x, y, z = (df[c].to_numpy() for c in ("volume", "impliedVolatility", "strike"))
+
+    # 每種樣式一條 trace，顏色、大小皆為純量，避免 Plotly 逐點驗證顏色字串
+    styles = (
+        (~anomaly & is_call, "Call", "lightblue", 3, "circle", 0.4),
+        (~anomaly & ~is_call, "Put", "orange", 3, "circle", 0.4),
+        (anomaly & is_call, "Call Anomaly", "red", 6, "diamond", 0.9),
+        (anomaly & ~is_call, "Put Anomaly", "purple", 6, "diamond", 0.9),
+    )
+    fig = go.Figure()
+    for mask, name, color, size, symbol, opacity in styles:
+        fig.add_trace(go.Scatter3d(
+            x=x[mask], y=y[mask], z=z[mask],
+            mode="markers",
+            name=name,
+            opacity=opacity,
+            hovertext=None if hover is None else hover[mask],
+            marker=dict(size=size, color=color, symbol=symbol, line=dict(width=0)),
+        ))
+    fig.update_layout(title=title, height=650, margin=dict(l=0, r=0, t=40, b=0),
+                      scene=dict(xaxis_title="Volume", yaxis_title="Implied Volatility", zaxis_title="Strike Price"))
+    return fig, len(rows), total
+
+
+# Volume vs IV 散佈圖（Scattergl），買權、賣權各一條 trace
+def volume_iv(df, title=None, max_points=MAX_POINTS):
+    import plotly.graph_objects as go
+
+    total = len(df)
+    # 抽樣時成交量最大的合約（佔上限的一半）一律保留，只稀疏化低量合約
+    keep = None
+    if total > max_points:
+        volume = df["volume"].to_numpy(dtype=float)
+        keep = volume >= np.nanquantile(volume, 1 - 0.5 * max_points / total)
+    rows = downsample(total, keep, max_points)
+    df = df.iloc[rows]
+    is_call = _is_call(df)
+    hover = _hover(df, ["contractSymbol", "expiry"])
+
+    fig = go.Figure()
+    for mask, name, color in ((is_call, "Call", "#1f77b4"), (~is_call, "Put", "#ff7f0e")):
+        fig.add_trace(go.Scattergl(
+            x=df["volume"].to_numpy()[mask],
+            y=df["impliedVolatility"].to_numpy()[mask],
+            mode="markers",
+            name=name,
+            hovertext=None if hover is None else hover[mask],
+            marker=dict(size=8, color=color, opacity=0.7),
+        ))
+    fig.update_layout(title=title, xaxis_title="volume", yaxis_title="impliedVolatility", height=450)
+    return fig, len(rows), total
+
+
+def show(builder, *args, **kwargs):
+    import streamlit as st
+    with tracing.span(f"render.{builder.__name__}", "render") as s:
+        fig, shown, total = builder(*args, **kwargs)
+        st.plotly_chart(fig, width="stretch")
+        s.rows = shown
+    _caption(shown, total)
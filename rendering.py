@@ -0,0 +1,123 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import tracing
+
+# ====================================
+#     圖表渲染快取
+# ====================================
+# 以「繪圖函數 + 輸入資料 + 參數」的雜湊為鍵，快取輸出的 PNG / SVG bytes。
+# 未命中時在獨立的 matplotlib Figure 上繪製（不經過 pyplot 的全域圖表登錄），
+# 存成 bytes 後立即釋放，長時間執行的 worker 不會因圖表累積而耗盡記憶體。
+# 繪圖函數 draw(fig, *data, **params) 只能使用傳入的參數，否則快取鍵不完整。
+
+MAX_BYTES = int(float(os.environ.get("OIAST_RENDER_CACHE_MB", 64)) * 1024 * 1024)
+
+
+def _feed(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr((obj.shape, list(obj.columns), list(obj.dtypes.astype(str)))).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        h.update(repr((type(obj).__name__, obj.shape, obj.dtype.name, getattr(obj, "name", None))).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=isinstance(obj, pd.Series)).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.shape, obj.dtype.str)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _feed(h, item)
+    elif isinstance(obj, dict):
+        h.update(f"dict{len(obj)}".encode())
+        for k in sorted(obj, key=repr):
+            _feed(h, k)
+            _feed(h, obj[k])
+    else:
+        h.update(repr(obj).encode())
+
+
+def chart_key(draw, data, params):
+    h = hashlib.sha1(f"{draw.__module__}.{draw.__qualname__}".encode())
+    _feed(h, data)
+    _feed(h, params)
+    return h.hexdigest()
+
+
+# 以總位元組數為上限的 LRU，行程內所有 session 共用
+class RenderCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+cache = RenderCache()
+
+
+# 回傳圖表的 PNG / SVG bytes；figsize、fmt、dpi 與其他參數皆納入快取鍵
+def render(draw, *data, figsize=(10, 5), fmt="png", dpi=100, **params):
+    from matplotlib.figure import Figure
+
+    with tracing.span(f"render.{draw.__name__}", "render") as s:
+        key = chart_key(draw, data, (figsize, fmt, dpi, params))
+        image = cache.get(key)
+        s.attrs["cache"] = "hit" if image is not None else "miss"
+        if image is None:
+            fig = Figure(figsize=figsize)
+            try:
+                draw(fig, *data, **params)
+                buf = io.BytesIO()
+                fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight")
+            finally:
+                fig.clear()
+            image = buf.getvalue()
+            cache.put(key, image)
+        s.record(image)
+        return image
+
+
+# 在 Streamlit 中顯示快取的圖表
+def show(draw, *data, **kwargs):
+    import streamlit as st
+
+    image = render(draw, *data, **kwargs)
+    if kwargs.get("fmt") == "svg":
+        st.image(image.decode("utf-8"), width="stretch")
+    else:
+        st.image(image, width="stretch")
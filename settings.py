@@ -0,0 +1,11 @@
+import os
+
+# 專案根目錄與本機快取目錄（可用環境變數 OIAST_CACHE_DIR 覆寫）
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("OIAST_CACHE_DIR", os.path.join(ROOT_DIR, ".cache"))
+
+
+def cache_path(*parts):
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
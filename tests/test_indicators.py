@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import streaming, technical
+
+
+@pytest.fixture
+def ohlc():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))
+    # 中間缺值：批次、串流與 pandas 的處理必須一致
+    close[[120, 121, 200]] = np.nan
+    high = close * (1 + rng.uniform(0, 0.01, close.size))
+    low = close * (1 - rng.uniform(0, 0.01, close.size))
+    return pd.DataFrame({"Close": close, "High": high, "Low": low})
+
+
+def _stream(indicator, history, rest):
+    # warm 前段、之後逐根 update，接成完整序列
+    head = indicator.warm(*history)
+    tail = [indicator.update(*values) for values in zip(*rest)]
+    if isinstance(head, tuple):
+        return tuple(np.r_[h, [t[i] for t in tail]] for i, h in enumerate(head))
+    return np.r_[head, tail]
+
+
+def _split(df, columns, at=150):
+    return [df[c].to_numpy()[:at] for c in columns], [df[c].to_numpy()[at:] for c in columns]
+
+
+@pytest.mark.parametrize("window", [5, 20])
+def test_rolling_matches_pandas(ohlc, window):
+    close = ohlc["Close"]
+    np.testing.assert_allclose(technical.sma(close, window), close.rolling(window).mean())
+    np.testing.assert_allclose(technical.rolling_std(close, window), close.rolling(window).std())
+    np.testing.assert_allclose(_stream(streaming.SMA(window), *_split(ohlc, ["Close"])),
+                               close.rolling(window).mean())
+    np.testing.assert_allclose(_stream(streaming.RollingStd(window), *_split(ohlc, ["Close"])),
+                               close.rolling(window).std())
+
+
+@pytest.mark.parametrize("adjust", [True, False])
+@pytest.mark.parametrize("at", [121, 150])
+def test_ema_matches_pandas(ohlc, adjust, at):
+    close = ohlc["Close"]
+    expected = close.ewm(span=12, adjust=adjust).mean()
+    np.testing.assert_allclose(technical.ema(close, span=12, adjust=adjust), expected)
+    np.testing.assert_allclose(_stream(streaming.EMA(span=12, adjust=adjust), *_split(ohlc, ["Close"], at)),
+                               expected)
+
+
+@pytest.mark.parametrize("adjust", [True, False])
+def test_macd_matches_pandas(ohlc, adjust):
+    close = ohlc["Close"]
+    dif = close.ewm(span=12, adjust=adjust).mean() - close.ewm(span=26, adjust=adjust).mean()
+    signal = dif.ewm(span=9, adjust=adjust).mean()
+    for result in (technical.macd(close, adjust=adjust),
+                   _stream(streaming.MACD(adjust=adjust), *_split(ohlc, ["Close"]))):
+        np.testing.assert_allclose(result[0], dif)
+        np.testing.assert_allclose(result[1], signal)
+
+
+def test_rsi_matches_pandas(ohlc):
+    close = ohlc["Close"]
+    expected = close.pct_change().rolling(14).apply(lambda x: (x[x > 0].sum() / abs(x).sum() * 100)
+                                                    if abs(x).sum() > 0 else 0)
+    np.testing.assert_allclose(technical.rsi(close), expected)
+    np.testing.assert_allclose(_stream(streaming.RSI(), *_split(ohlc, ["Close"])), expected)
+
+
+def test_kd_matches_pandas(ohlc):
+    low_min, high_max = ohlc["Low"].rolling(9).min(), ohlc["High"].rolling(9).max()
+    k = ((ohlc["Close"] - low_min) / (high_max - low_min) * 100).ewm(com=2).mean()
+    d = k.ewm(com=2).mean()
+    for result in (technical.kd(ohlc["High"], ohlc["Low"], ohlc["Close"]),
+                   _stream(streaming.KD(), *_split(ohlc, ["High", "Low", "Close"]))):
+        np.testing.assert_allclose(result[0], k)
+        np.testing.assert_allclose(result[1], d)
+
+
+def test_multi_symbol_columns(ohlc):
+    # 二維輸入（日期 × 標的）逐欄與一維結果相同
+    panel = np.column_stack([ohlc["Close"], ohlc["Close"].shift(3)])
+    for adjust in (True, False):
+        wide = technical.ema(panel, span=12, adjust=adjust)
+        for j in range(panel.shape[1]):
+            np.testing.assert_allclose(wide[:, j], technical.ema(panel[:, j], span=12, adjust=adjust))
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import aiohttp
+import pytest
+
+from datasource import providers, standin
+
+
+def _fast(monkeypatch, provider, rate=1000, burst=1000, retries=3):
+    # 測試用的限速與退避參數；限速狀態重新建立
+    monkeypatch.setattr(provider, "rate", rate)
+    monkeypatch.setattr(provider, "burst", burst)
+    monkeypatch.setattr(provider, "retries", retries)
+    monkeypatch.setattr(provider, "backoff", 0.01)
+    monkeypatch.setattr(provider, "_semaphore", None)
+    monkeypatch.setattr(provider, "_bucket", None)
+    return provider
+
+
+@pytest.fixture
+def finnhub(monkeypatch):
+    return _fast(monkeypatch, providers.finnhub())
+
+
+def test_rate_limit_paces_requests(monkeypatch, finnhub):
+    _fast(monkeypatch, finnhub, rate=20, burst=1)
+    arrivals = []
+
+    def quote(query):
+        arrivals.append(time.monotonic())
+        return {"c": float(query["symbol"][1:])}
+
+    with standin.serve("finnhub", {"/quote": quote}):
+        results = finnhub.gather([finnhub.quote_async(f"S{i}") for i in range(5)])
+    assert [r["c"] for r in results] == [0, 1, 2, 3, 4]
+    # 每秒 20 次、不累積：5 個請求至少相隔 4 個間隔
+    assert arrivals[-1] - arrivals[0] >= 4 / 20 * 0.9
+
+
+def test_retries_on_429_and_5xx(finnhub):
+    replies = iter([(429, {}), (503, {}), (200, {"c": 1.5})])
+
+    with standin.serve("finnhub", {"/quote": lambda query: next(replies)}) as server:
+        assert finnhub.quote("AAPL") == {"c": 1.5}
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_retries(monkeypatch, finnhub):
+    _fast(monkeypatch, finnhub, retries=2)
+
+    with standin.serve("finnhub", {"/quote": lambda query: (500, {})}) as server:
+        with pytest.raises(providers.RetryableError):
+            finnhub.quote("AAPL")
+    assert len(server.requests) == 3
+
+
+def test_client_errors_are_not_retried(finnhub):
+    with standin.serve("finnhub", {"/quote": lambda query: (403, {})}) as server:
+        with pytest.raises(aiohttp.ClientResponseError):
+            finnhub.quote("AAPL")
+    assert len(server.requests) == 1
+
+
+def test_identical_requests_fetch_once(finnhub):
+    async def chain(query):
+        await asyncio.sleep(0.2)
+        return {"data": [{"expirationDate": "2026-11-20"}]}
+
+    before = finnhub.coalesced
+    with standin.serve("finnhub", {"/stock/option-chain": chain}) as server:
+        results = finnhub.gather([finnhub.option_chain_async("AAPL") for _ in range(8)])
+    assert len(server.requests) == 1
+    assert all(r == results[0] for r in results)
+    assert finnhub.coalesced - before == 7
+
+
+class _Backend:
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self._guard = threading.Lock()
+
+    def fetch(self, symbol):
+        with self._guard:
+            self.calls += 1
+            failing = self.calls <= self.failures
+        if failing:
+            raise OSError("connection reset")
+        time.sleep(0.2)
+        return symbol
+
+
+def test_blocking_identical_requests_fetch_once(monkeypatch):
+    backend = _Backend()
+    results = []
+    with standin.use_backend("yahoo", backend) as yahoo:
+        _fast(monkeypatch, yahoo)
+        # 多個 session（執行緒）同時發出相同請求
+        threads = [threading.Thread(target=lambda: results.append(
+            yahoo.call(lambda b: b.fetch("AAPL"), key=providers.request_key("fetch", "AAPL"))))
+            for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert results == ["AAPL"] * 6
+    assert backend.calls == 1
+
+
+def test_blocking_retries_transient_errors(monkeypatch):
+    backend = _Backend(failures=2)
+    with standin.use_backend("yahoo", backend) as yahoo:
+        _fast(monkeypatch, yahoo)
+        assert yahoo.call(lambda b: b.fetch("MSFT")) == "MSFT"
+    assert backend.calls == 3
@@ -0,0 +1,252 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from settings import cache_path
+
+# ====================================
+#     分段計時（fetch / compute / render）
+# ====================================
+# with tracing.span("pca.fetch", "fetch") as s: ...; s.record(df)
+# 每個 span 記錄牆鐘時間、CPU 時間（本執行緒）、處理列數與資料位元組數，
+# 結束時寫入輪替的 JSON lines 記錄檔，並保留在本次 rerun 的清單中供側邊欄顯示。
+#
+# OIAST_TRACE_LOG=0 關閉記錄檔；OIAST_TRACE_LOG_MB / OIAST_TRACE_LOG_BACKUPS 控制輪替。
+# OIAST_PROFILE=cprofile 或 pyinstrument 時，下一次執行（單一 request）會被完整剖析，
+# 結果存於 .cache/trace/；側邊欄可再次啟用。
+
+LOG_ENABLED = os.environ.get("OIAST_TRACE_LOG", "1") != "0"
+LOG_MAX_BYTES = int(float(os.environ.get("OIAST_TRACE_LOG_MB", 10)) * 1024 * 1024)
+LOG_BACKUPS = int(os.environ.get("OIAST_TRACE_LOG_BACKUPS", 5))
+PROFILER = os.environ.get("OIAST_PROFILE", "").lower()
+
+_run = contextvars.ContextVar("tracing_run", default=None)
+_parent = contextvars.ContextVar("tracing_parent", default=None)
+
+_logger = None
+_logger_guard = threading.Lock()
+
+
+def _get_logger():
+    global _logger
+    with _logger_guard:
+        if _logger is None:
+            _logger = logging.getLogger("oiast.trace")
+            _logger.propagate = False
+            _logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(cache_path("trace", "spans.jsonl"), maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+        return _logger
+
+
+# 估計資料量：DataFrame / Series 取記憶體用量，bytes 取長度，ndarray 取 nbytes
+def size_of(obj):
+    if obj is None:
+        return 0
+    if hasattr(obj, "memory_usage"):
+        usage = obj.memory_usage(index=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    return int(getattr(obj, "nbytes", 0))
+
+
+class Span:
+    __slots__ = ("name", "stage", "id", "parent", "run", "start", "wall_ms", "cpu_ms", "rows", "bytes", "attrs",
+                 "error")
+
+    def __init__(self, name, stage, parent, run, attrs):
+        self.name = name
+        self.stage = stage
+        self.id = uuid.uuid4().hex[:8]
+        self.parent = parent
+        self.run = run
+        self.start = time.time()
+        self.wall_ms = self.cpu_ms = None
+        self.rows = None
+        self.bytes = None
+        self.attrs = attrs
+        self.error = None
+
+    # 以結果物件填入列數與位元組數（可多次呼叫累加）
+    def record(self, obj, rows=None):
+        if isinstance(obj, dict):
+            for value in obj.values():
+                self.record(value)
+            return obj
+        if rows is None and hasattr(obj, "__len__") and not isinstance(obj, (bytes, str)):
+            rows = len(obj)
+        if rows is not None:
+            self.rows = (self.rows or 0) + rows
+        self.bytes = (self.bytes or 0) + size_of(obj)
+        return obj
+
+    def to_dict(self):
+        return {"run": self.run, "id": self.id, "parent": self.parent, "name": self.name, "stage": self.stage,
+                "start": self.start, "wall_ms": self.wall_ms, "cpu_ms": self.cpu_ms, "rows": self.rows,
+                "bytes": self.bytes, "error": self.error, **self.attrs}
+
+
+@contextmanager
+def span(name, stage=None, **attrs):
+    run = _run.get()
+    parent = _parent.get()
+    s = Span(name, stage, parent.id if parent else None, run["id"] if run else None, attrs)
+    token = _parent.set(s)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.wall_ms = (time.perf_counter() - wall) * 1000
+        s.cpu_ms = (time.thread_time() - cpu) * 1000
+        _parent.reset(token)
+        if run is not None:
+            run["spans"].append(s)
+        if LOG_ENABLED:
+            try:
+                _get_logger().info(json.dumps(s.to_dict(), ensure_ascii=False, default=str))
+            except OSError:
+                pass
+
+
+# 裝飾器版本：整個函數為一個 span，名稱預設為模組.函數；record=True 時以回傳值填入列數與位元組數
+def traced(name=None, stage=None, record=False):
+    def decorate(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, stage) as s:
+                result = fn(*args, **kwargs)
+                if record:
+                    s.record(result)
+                return result
+        return wrapper
+    return decorate
+
+
+_profile_armed = bool(PROFILER)
+_profile_guard = threading.Lock()
+_last_profile = None
+
+
+def arm_profiler():
+    global _profile_armed
+    _profile_armed = bool(PROFILER)
+
+
+def _take_profile_slot():
+    global _profile_armed
+    with _profile_guard:
+        armed, _profile_armed = _profile_armed, False
+        return armed
+
+
+# 一次 Streamlit 執行（request）的開始與結束：收集該次所有 span，必要時以 cProfile / pyinstrument 剖析
+def start_request(page):
+    run = {"id": uuid.uuid4().hex[:12], "page": page, "spans": [], "profile": None, "started": time.perf_counter()}
+    run["token"] = _run.set(run)
+    run["profiler"] = _start_profiler() if _take_profile_slot() else None
+    return run
+
+
+def finish_request(run):
+    global _last_profile
+    if run.get("profiler") is not None:
+        run["profile"] = _last_profile = _stop_profiler(run.pop("profiler"), run["id"])
+    run["wall_ms"] = (time.perf_counter() - run["started"]) * 1000
+    try:
+        _run.reset(run.pop("token"))
+    except (KeyError, ValueError):
+        pass
+    return run
+
+
+@contextmanager
+def request(page):
+    run = start_request(page)
+    try:
+        yield run
+    finally:
+        finish_request(run)
+
+
+def _start_profiler():
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        except ImportError:
+            pass
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, run_id):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    if hasattr(profiler, "output_html"):
+        profiler.stop()
+        path = cache_path("trace", f"profile-{stamp}-{run_id}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path = cache_path("trace", f"profile-{stamp}-{run_id}.prof")
+        profiler.dump_stats(path)
+    return path
+
+
+def current_spans():
+    run = _run.get()
+    return list(run["spans"]) if run else []
+
+
+# 側邊欄效能面板（預設關閉）：顯示本次執行的各段耗時
+def sidebar(run):
+    import pandas as pd
+    import streamlit as st
+
+    if not st.sidebar.checkbox("⏱️ 顯示效能追蹤", value=False):
+        return
+    spans = [s.to_dict() for s in run["spans"]]
+    # 在 request() 區塊內呼叫時本次尚未結束，以目前為止的耗時顯示
+    wall_ms = run.get("wall_ms", (time.perf_counter() - run["started"]) * 1000)
+    st.sidebar.caption(f"{run['page']}：總計 {wall_ms:.0f} ms")
+    if spans:
+        df = pd.DataFrame(spans)
+        # 各階段以「扣除子 span 後」的時間加總，巢狀的 fetch / render 不會被重複計入外層
+        children = df.groupby("parent")["wall_ms"].sum()
+        df["self_ms"] = df["wall_ms"] - df["id"].map(children).fillna(0)
+        by_stage = df.groupby(df["stage"].fillna("other"))["self_ms"].sum()
+        df = df[["name", "stage", "wall_ms", "cpu_ms", "rows", "bytes"]]
+        if not by_stage.empty:
+            st.sidebar.bar_chart(by_stage)
+        st.sidebar.dataframe(df.style.format({"wall_ms": "{:.1f}", "cpu_ms": "{:.1f}"}, na_rep=""),
+                             hide_index=True)
+    # 外部資料來源：實際抓取次數與被合併的重複請求數（整個行程累計）
+    from datasource import providers
+
+    counts = {name: f"{s['fetches']} 次抓取、{s['coalesced']} 次合併" for name, s in providers.stats().items()}
+    if counts:
+        st.sidebar.caption("；".join(f"{name}：{text}" for name, text in counts.items()))
+    # 剖析在本次執行結束時才寫出，面板顯示最近一次的結果
+    if run.get("profile") or _last_profile:
+        st.sidebar.caption(f"剖析結果：{run.get('profile') or _last_profile}")
+    if PROFILER and st.sidebar.button("剖析下一次執行"):
+        arm_profiler()